@@ -0,0 +1,335 @@
+"""In-process agency index: the search API's filtering and match scoring, vectorized.
+
+A snapshot of the agency catalog (a JSON file, or one bulk fetch from the
+Next.js search API) is held column-wise. Specializations, category tags
+and service areas are packed bitsets over each field's vocabulary, and
+min_budget, rating and rank are NumPy arrays. So a search filters and
+scores the whole catalog in a few array operations and takes the top k
+with argpartition, instead of a round trip to the web app.
+
+Term mapping and scoring follow src/lib/agencies.ts (mapUserInput,
+searchAgencies) - keep the two in step.
+"""
+
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from models import AgencyMatch
+
+# User terms -> database values, as SPECIALIZATION_MAP / CATEGORY_MAP / REGION_MAP in agencies.ts
+SPECIALIZATION_MAP: dict[str, list[str]] = {
+    "demand gen": ["Demand Generation", "B2B Demand Generation"],
+    "demand generation": ["Demand Generation", "B2B Demand Generation"],
+    "abm": ["ABM", "Account-Based Marketing", "ABM strategy"],
+    "account based": ["ABM", "Account-Based Marketing"],
+    "content": ["Content Marketing", "B2B Content Marketing"],
+    "content marketing": ["Content Marketing", "B2B Content Marketing"],
+    "plg": ["Product-Led Growth", "PLG"],
+    "product led": ["Product-Led Growth", "PLG"],
+    "brand": ["B2B Branding", "Brand Strategy"],
+    "branding": ["B2B Branding", "Brand Strategy"],
+    "seo": ["SEO", "B2B SEO"],
+    "paid media": ["Paid Media", "Performance Marketing"],
+    "social": ["Social Media Marketing", "LinkedIn Marketing"],
+    "linkedin": ["LinkedIn Marketing", "Social Media Marketing"],
+    "email": ["Email Marketing", "Marketing Automation"],
+    "automation": ["Marketing Automation", "Email Marketing"],
+    "analytics": ["Marketing Analytics", "Growth Analytics"],
+    "growth": ["Growth Marketing", "B2B Growth"],
+}
+
+CATEGORY_MAP: dict[str, list[str]] = {
+    "b2b saas": ["B2B Marketing Agency", "GTM Agency", "SaaS Marketing Agency"],
+    "saas": ["B2B Marketing Agency", "GTM Agency", "SaaS Marketing Agency"],
+    "b2b": ["B2B Marketing Agency", "GTM Agency"],
+    "dtc": ["DTC Marketing Agency", "Growth Marketing Agency"],
+    "consumer": ["DTC Marketing Agency", "Growth Marketing Agency"],
+    "enterprise": ["B2B Marketing Agency", "Account-Based Marketing Agency"],
+    "startup": ["Growth Marketing Agency", "GTM Agency"],
+    "fintech": ["B2B Marketing Agency", "FinTech Marketing Agency"],
+    "healthtech": ["B2B Marketing Agency", "Healthcare Marketing Agency"],
+}
+
+REGION_MAP: dict[str, list[str]] = {
+    "us": ["United States", "USA", "North America"],
+    "usa": ["United States", "USA", "North America"],
+    "uk": ["United Kingdom", "UK", "London", "Europe"],
+    "europe": ["Europe", "EMEA", "UK", "Germany"],
+    "apac": ["APAC", "Asia Pacific", "Singapore", "Australia"],
+    "global": ["Global", "Worldwide"],
+    "remote": ["Global", "Remote"],
+}
+
+
+def map_user_input(value: str, mapping: dict[str, list[str]]) -> list[str]:
+    """Map a user term to database values: exact key, then partial match, else as-is."""
+    lower = value.lower().strip()
+    if lower in mapping:
+        return mapping[lower]
+    for key, values in mapping.items():
+        if key in lower or lower in key:
+            return values
+    return [value]
+
+
+def _map_terms(values: Optional[list[str]], mapping: dict[str, list[str]]) -> tuple[str, ...]:
+    return tuple(term for value in values or () for term in map_user_input(value, mapping))
+
+
+# A query mask: (word, bits) for each bitset word it has bits in
+Mask = tuple[tuple[int, np.uint64], ...]
+
+
+class TermColumn:
+    """A multi-valued text field as packed bitsets, one bit per vocabulary term.
+
+    Bit i of an agency's bitset is set when it has term i. A query becomes
+    a mask over the vocabulary, so overlap and match counts for every
+    agency are an AND plus a popcount, over only the words the mask uses.
+    """
+
+    # Distinct queries whose masks are kept (each costs one pass over the vocabulary)
+    MAX_CACHED_QUERIES = 1024
+
+    def __init__(self, rows: list[list[str]]):
+        self.rows = rows
+        self._ids: dict[str, int] = {}
+        for terms in rows:
+            for term in terms:
+                self._ids.setdefault(term, len(self._ids))
+        self._lower = [term.lower() for term in self._ids]
+        words = max(1, (len(self._ids) + 63) // 64)
+
+        row_index, term_ids = [], []
+        for i, terms in enumerate(rows):
+            for term in terms:
+                row_index.append(i)
+                term_ids.append(self._ids[term])
+        term_ids = np.asarray(term_ids, dtype=np.uint64)
+        bits = np.zeros((words, len(rows)), dtype=np.uint64)
+        np.bitwise_or.at(
+            bits,
+            ((term_ids >> np.uint64(6)).astype(np.intp), np.asarray(row_index, dtype=np.intp)),
+            np.left_shift(np.uint64(1), term_ids & np.uint64(63)),
+        )
+        # Word-major: each word is one contiguous array over all agencies
+        self.bits = bits
+        self._queries: dict[tuple[str, ...], tuple[Mask, Mask, frozenset[str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @staticmethod
+    def _mask(ids) -> Mask:
+        words: dict[int, int] = {}
+        for i in ids:
+            words[i >> 6] = words.get(i >> 6, 0) | (1 << (i & 63))
+        return tuple((word, np.uint64(value)) for word, value in sorted(words.items()))
+
+    def query(self, terms: tuple[str, ...]) -> tuple[Mask, Mask, frozenset[str]]:
+        """(exact mask, similar mask, similar terms) for query terms.
+
+        Exact is what the API's SQL filter uses (array overlap); similar is
+        what its scoring uses (either string contains the other, ignoring case).
+        """
+        cached = self._queries.get(terms)
+        if cached is not None:
+            return cached
+        lowered = {term.lower() for term in terms}
+        exact = [self._ids[term] for term in set(terms) if term in self._ids]
+        similar = [
+            i for i, value in enumerate(self._lower)
+            if any(value in term or term in value for term in lowered)
+        ]
+        vocabulary = list(self._ids)
+        cached = (self._mask(exact), self._mask(similar), frozenset(vocabulary[i] for i in similar))
+        if len(self._queries) >= self.MAX_CACHED_QUERIES:
+            self._queries.clear()
+        self._queries[terms] = cached
+        return cached
+
+    def overlaps(self, mask: Mask) -> np.ndarray:
+        """Per agency: has any term in mask."""
+        hits = np.zeros(len(self.rows), dtype=np.uint64)
+        for word, bits in mask:
+            hits |= self.bits[word] & bits
+        return hits != 0
+
+    def counts(self, mask: Mask) -> np.ndarray:
+        """Per agency: how many of its terms are in mask."""
+        counts = np.zeros(len(self.rows), dtype=np.int64)
+        for word, bits in mask:
+            counts += np.bitwise_count(self.bits[word] & bits)
+        return counts
+
+    def has_any(self, i: int, mask: Mask) -> bool:
+        """Whether agency i has any term in mask."""
+        return any(self.bits[word, i] & bits for word, bits in mask)
+
+
+class AgencyIndex:
+    """Columnar agency catalog that answers searches in-process.
+
+    Filtering matches the search API (array overlap on the mapped terms,
+    min_budget within max_budget) and match_score is computed the same
+    way. One difference: the API takes the best-ranked `limit` agencies
+    that pass the filter and then orders them by score, while this ranks
+    the whole filtered catalog by score, global rank breaking ties.
+    """
+
+    def __init__(self, rows: list[dict]):
+        self.agencies = [
+            (
+                int(row["id"]),
+                row["name"],
+                row.get("slug") or "",
+                row.get("description") or "",
+                row.get("headquarters") or "",
+                row.get("website"),
+            )
+            for row in rows
+        ]
+        self.specializations = TermColumn([list(row.get("specializations") or ()) for row in rows])
+        self.category_tags = TermColumn([list(row.get("category_tags") or ()) for row in rows])
+        self.service_areas = TermColumn([list(row.get("service_areas") or ()) for row in rows])
+
+        def column(name: str) -> np.ndarray:
+            return np.array([np.nan if row.get(name) is None else row[name] for row in rows], dtype=np.float64)
+
+        # NaN where the agency has no value
+        self.min_budget = column("min_budget")
+        self.rating = column("avg_rating")
+        self.global_rank = column("global_rank")
+
+        # Position in ORDER BY global_rank NULLS LAST, as a tie-break weight
+        order = np.lexsort((np.arange(len(rows)), np.nan_to_num(self.global_rank, nan=np.inf)))
+        self._rank_weight = np.empty(len(rows), dtype=np.int64)
+        self._rank_weight[order] = np.arange(len(rows) - 1, -1, -1)
+        self.searches = 0
+
+    @classmethod
+    def from_file(cls, path: Path) -> "AgencyIndex":
+        """Load an index from a JSON list of agency records (a catalog snapshot)."""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self.agencies)
+
+    def scores(
+        self,
+        specializations: tuple[str, ...],
+        category_tags: tuple[str, ...],
+        service_areas: tuple[str, ...],
+        max_budget: Optional[int],
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """(passes filter, match_score) for every agency, for already-mapped terms."""
+        spec_exact, spec_similar, _ = self.specializations.query(specializations)
+        cat_exact, cat_similar, _ = self.category_tags.query(category_tags)
+        area_exact, area_similar, _ = self.service_areas.query(service_areas)
+
+        keep = np.ones(len(self), dtype=bool)
+        if specializations:
+            keep &= self.specializations.overlaps(spec_exact)
+        if category_tags:
+            keep &= self.category_tags.overlaps(cat_exact)
+        if service_areas:
+            keep &= self.service_areas.overlaps(area_exact)
+
+        no_budget = np.isnan(self.min_budget)
+        if max_budget is not None:
+            keep &= no_budget | (self.min_budget <= max_budget)
+        # Scoring treats a 0 min_budget as none, and a 0 max_budget as unset
+        budget_fit = no_budget | (self.min_budget == 0)
+        if max_budget:
+            budget_fit |= self.min_budget <= max_budget
+
+        score = np.minimum(40, 15 * self.specializations.counts(spec_similar))
+        score += 25 * self.category_tags.overlaps(cat_similar)
+        score += 20 * self.service_areas.overlaps(area_similar)
+        score += 15 * budget_fit
+        return keep, score
+
+    def search(
+        self,
+        specializations: Optional[list[str]],
+        category_tags: Optional[list[str]] = None,
+        service_areas: Optional[list[str]] = None,
+        max_budget: Optional[int] = None,
+        limit: int = 5,
+    ) -> list[AgencyMatch]:
+        """Search with user terms, as a POST to /api/agencies/search would."""
+        specs = _map_terms(specializations, SPECIALIZATION_MAP)
+        categories = _map_terms(category_tags, CATEGORY_MAP)
+        areas = _map_terms(service_areas, REGION_MAP)
+        self.searches += 1
+
+        keep, score = self.scores(specs, categories, areas, max_budget)
+        candidates = np.flatnonzero(keep)
+        if limit <= 0 or not len(candidates):
+            return []
+        # One sort key: score first, then rank
+        key = score[candidates] * len(self) + self._rank_weight[candidates]
+        if len(candidates) > limit:
+            top = np.argpartition(-key, limit - 1)[:limit]
+            candidates, key = candidates[top], key[top]
+        best = candidates[np.argsort(-key, kind="stable")]
+
+        _, _, similar_specs = self.specializations.query(specs)
+        cat_similar = self.category_tags.query(categories)[1]
+        area_similar = self.service_areas.query(areas)[1]
+        return [
+            self._match(int(i), int(score[i]), similar_specs, cat_similar, area_similar, max_budget)
+            for i in best
+        ]
+
+    def _match(
+        self,
+        i: int,
+        score: int,
+        similar_specs: frozenset[str],
+        cat_similar: Mask,
+        area_similar: Mask,
+        max_budget: Optional[int],
+    ) -> AgencyMatch:
+        agency_id, name, slug, description, headquarters, website = self.agencies[i]
+        specializations = self.specializations.rows[i]
+        min_budget = None if np.isnan(self.min_budget[i]) else int(self.min_budget[i])
+
+        # match_reasons, worded as the search API words them
+        reasons = []
+        spec_matches = [s for s in specializations if s in similar_specs]
+        if spec_matches:
+            reasons.append(f"Specializes in: {', '.join(spec_matches[:2])}")
+        if self.category_tags.has_any(i, cat_similar):
+            reasons.append("Matches your business type")
+        if self.service_areas.has_any(i, area_similar):
+            reasons.append("Serves your target regions")
+        if min_budget and max_budget and min_budget <= max_budget:
+            reasons.append(f"Budget from ${min_budget:,}/mo")
+
+        return AgencyMatch(
+            id=agency_id,
+            name=name,
+            slug=slug,
+            description=description,
+            headquarters=headquarters,
+            specializations=specializations,
+            min_budget=min_budget,
+            match_score=score,
+            match_reasons=reasons,
+            website=website,
+        )
+
+    def stats(self) -> dict:
+        """Catalog size, vocabulary sizes and searches served."""
+        return {
+            "agencies": len(self),
+            "specializations": len(self.specializations),
+            "category_tags": len(self.category_tags),
+            "service_areas": len(self.service_areas),
+            "searches": self.searches,
+        }
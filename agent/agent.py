@@ -1,26 +1,36 @@
 """GTM Strategy Agent - Pydantic AI with HITL confirmations."""
 
+import asyncio
+import hashlib
+import multiprocessing
 import os
 import re
+import threading
+import time
 import uuid
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncContextManager, Callable, Iterable, Optional
 from dotenv import load_dotenv
-from pydantic_ai import Agent
 
-from models import GTMState, GTMRequirements, ConfirmationRequest
-from tools import recognize_tools, get_industry_data, search_agencies
+from models import GTMState, GTMRequirements, ConfirmationRequest, AgencyMatch
+from tools import (
+    INDUSTRY_INDEX, REFERENCE_PAYLOADS, TOOL_REGISTRY, AgencySearchUnavailable, ToolMention, agency_query_key,
+    find_agencies, get_industry_data,
+)
+from encoding import dumps
 from memory import ConversationMemory
+from matcher import KeywordMatcher, KeywordStream, group_hits
 
 from pathlib import Path
 
+if TYPE_CHECKING:
+    from pydantic_ai import Agent
+
 # Load env from parent directory
 env_path = Path(__file__).parent.parent / ".env.local"
 load_dotenv(env_path)
 
-# Verify API key is set
-if not os.getenv("GOOGLE_API_KEY"):
-    raise ValueError(f"GOOGLE_API_KEY not found. Checked: {env_path}")
-
 # System prompt for the agent
 SYSTEM_PROMPT = """You are an expert GTM strategist helping users build their go-to-market plan.
 
@@ -66,19 +76,397 @@ Who's your target customer - casual gamers, hardcore, or developers?"
 """
 
 
-class GTMAgent:
-    """GTM Strategy Agent with state management and HITL."""
-
-    def __init__(self, user_id: Optional[str] = None, thread_id: Optional[str] = None):
-        self.state = GTMState()
-        self.agent = Agent(
+# Keyword tables for extraction. Order matters where only one value is
+# picked: the first entry that appears in the message wins. Industry
+# keywords come from the industry index (aliases, in catalog order).
+CATEGORY_TERMS = ["b2b", "saas", "dtc", "direct to consumer", "enterprise",
+                  "marketplace", "consumer"]
+
+STAGE_KEYWORDS = {
+    "idea": ["idea", "concept", "thinking about"],
+    "pre_launch": ["pre-launch", "pre launch", "about to launch", "launching soon"],
+    "early": ["early stage", "just launched", "seed", "pre-seed"],
+    "growth": ["growth", "series a", "series b", "scaling"],
+    "scale": ["scale", "enterprise", "series c", "mature"],
+}
+
+SPECIALIZATION_KEYWORDS = {
+    "demand gen": ["demand gen", "demand generation", "lead gen"],
+    "abm": ["abm", "account based", "account-based"],
+    "content": ["content", "content marketing", "blog"],
+    "plg": ["plg", "product led", "product-led", "self-serve"],
+    "brand": ["brand", "branding", "positioning"],
+    "seo": ["seo", "search engine", "organic search"],
+    "paid": ["paid", "ppc", "ads", "advertising"],
+}
+
+STRATEGY_TERMS = ["product led", "plg", "self-serve", "sales", "led", "driven",
+                  "hybrid", "product"]
+
+REGION_KEYWORDS = {
+    "us": ["us", "usa", "united states", "america"],
+    "uk": ["uk", "united kingdom", "britain"],
+    "europe": ["europe", "eu", "emea"],
+    "apac": ["apac", "asia", "pacific"],
+    "global": ["global", "worldwide", "international"],
+}
+
+# Budget detection - require $ sign or explicit budget context
+# Look for patterns like $50k, $50,000, "budget of 50k", "50k/month"
+BUDGET_PATTERNS = [
+    re.compile(r'\$(\d{1,3}(?:,\d{3})*|\d+)\s*(?:k|K)?', re.IGNORECASE),  # $50k, $50,000
+    re.compile(r'budget\s*(?:of|is|:)?\s*\$?(\d{1,3}(?:,\d{3})*|\d+)\s*(?:k|K)?', re.IGNORECASE),  # budget of 50k
+    re.compile(r'(\d{1,3}(?:,\d{3})*|\d+)\s*(?:k|K)\s*(?:per|\/|a)?\s*(?:month|mo)', re.IGNORECASE),  # 50k/month
+]
+THOUSANDS_PATTERN = re.compile(r'\d+\s*[kK]')
+
+_keyword_matcher: Optional[KeywordMatcher] = None
+
+
+def get_keyword_matcher() -> KeywordMatcher:
+    """Get the extraction keyword automaton, building it on first use."""
+    global _keyword_matcher
+
+    if _keyword_matcher is None:
+        entries = INDUSTRY_INDEX.alias_entries("industry")
+        entries += [(term, "category", term) for term in CATEGORY_TERMS]
+        entries += [(term, "strategy", term) for term in STRATEGY_TERMS]
+        for category, table in (
+            ("stage", STAGE_KEYWORDS),
+            ("specialization", SPECIALIZATION_KEYWORDS),
+            ("region", REGION_KEYWORDS),
+        ):
+            entries += [(kw, category, label) for label, kws in table.items() for kw in kws]
+        entries += TOOL_REGISTRY.alias_entries("tool")
+        _keyword_matcher = KeywordMatcher(entries)
+
+    return _keyword_matcher
+
+
+def fields_from_hits(found: dict[str, set[str]]) -> dict:
+    """Turn keyword hits (labels grouped by category) into requirement fields."""
+    extracted = {}
+
+    # Industry detection
+    industry = INDUSTRY_INDEX.first(found.get("industry", ()))
+    if industry:
+        extracted["industry"] = industry
+
+    # Category detection
+    terms = found.get("category", ())
+    if "b2b" in terms and "saas" in terms:
+        extracted["category"] = "b2b_saas"
+    elif "dtc" in terms or "direct to consumer" in terms:
+        extracted["category"] = "dtc"
+    elif "enterprise" in terms:
+        extracted["category"] = "enterprise"
+    elif "marketplace" in terms:
+        extracted["category"] = "marketplace"
+    elif "consumer" in terms:
+        extracted["category"] = "consumer"
+
+    # Stage/maturity detection
+    stages = found.get("stage", ())
+    for stage in STAGE_KEYWORDS:
+        if stage in stages:
+            extracted["maturity"] = stage
+            break
+
+    # Specialization needs
+    specs = found.get("specialization", ())
+    found_specs = [spec for spec in SPECIALIZATION_KEYWORDS if spec in specs]
+    if found_specs:
+        extracted["needed_specializations"] = found_specs
+
+    # Strategy type hints
+    terms = found.get("strategy", ())
+    if "product led" in terms or "plg" in terms or "self-serve" in terms:
+        extracted["strategy_type"] = "plg"
+    elif "sales" in terms and ("led" in terms or "driven" in terms):
+        extracted["strategy_type"] = "sales_led"
+    elif "hybrid" in terms or ("product" in terms and "sales" in terms):
+        extracted["strategy_type"] = "hybrid"
+
+    # Region detection
+    regions = found.get("region", ())
+    found_regions = [region.upper() for region in REGION_KEYWORDS if region in regions]
+    if found_regions:
+        extracted["target_regions"] = found_regions
+
+    # Tool recognition
+    tools = TOOL_REGISTRY.ordered(found.get("tool", ()))
+    if tools:
+        extracted["tech_stack"] = [tool.name for tool in tools]
+
+    return extracted
+
+
+def extract_budget(message: str) -> Optional[int]:
+    """Extract a monthly budget in USD from a message, if one is mentioned."""
+    for pattern in BUDGET_PATTERNS:
+        budget_match = pattern.search(message)
+        if budget_match:
+            amount = budget_match.group(1).replace(",", "")
+            # Only accept if it's a reasonable budget number (> 100 or has k/K)
+            has_k = bool(THOUSANDS_PATTERN.search(message))
+            if has_k:
+                return int(amount) * 1000
+            elif int(amount) >= 1000:  # Only accept raw numbers >= 1000
+                return int(amount)
+            return None
+    return None
+
+
+_llm_agent: Optional["Agent"] = None
+
+
+def get_llm_agent() -> "Agent":
+    """Get the shared LLM agent, creating it and its model client on first use.
+
+    pydantic-ai and the Google provider are only imported here, so importing
+    this module (and starting the server) does not pay for them.
+    """
+    global _llm_agent
+
+    if _llm_agent is None:
+        # Verify API key is set
+        if not os.getenv("GOOGLE_API_KEY"):
+            raise ValueError(f"GOOGLE_API_KEY not found. Checked: {env_path}")
+
+        from pydantic_ai import Agent
+
+        _llm_agent = Agent(
             "google-gla:gemini-2.0-flash",
             system_prompt=SYSTEM_PROMPT,
         )
+
+    return _llm_agent
+
+
+class UtteranceExtractor:
+    """Incremental extraction over one growing utterance.
+
+    Keeps the keyword scan state between calls, so each update only scans
+    the newly appended text and keywords split across updates are still
+    found. A keyword at the very end of partial text is held back until
+    the next update shows whether the word goes on ("us" in "We sell to
+    us" + "ers"); it counts once the utterance is final or finished.
+    """
+
+    # Chars kept from the end of the utterance, to find budgets that
+    # straddle an update
+    TAIL = 64
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the current utterance."""
+        self._stream = KeywordStream(get_keyword_matcher())
+        self._found: dict[str, set[str]] = {}
+        self._budget: Optional[int] = None
+        self.text = ""
+        # How much of text has been written to memory
+        self._recorded = 0
+        self.fields: dict = {}
+        self.appended = ""
+        self.mentions: list[ToolMention] = []
+
+    def continues(self, text: str) -> bool:
+        """Whether text extends the utterance seen so far."""
+        return text.startswith(self.text)
+
+    def update(self, text: str, final: bool = False) -> dict:
+        """Take the latest utterance text and return the fields that changed.
+
+        With final=True the utterance is complete, so keywords at its end
+        count. Text that doesn't continue the utterance starts a new one;
+        call finish() first so the old one's held-back keywords aren't lost.
+        """
+        if not self.continues(text):
+            self.reset()
+        new_text = text[len(self.text):]
+        self.appended = new_text
+        hits = self._stream.feed(new_text, final=final)
+        self.mentions = TOOL_REGISTRY.mentions_from_hits(hits)
+        if not hits and not new_text:
+            return {}
+
+        group_hits(hits, into=self._found)
+        budget = extract_budget(self.text[-self.TAIL:] + new_text)
+        if budget is not None:
+            self._budget = budget
+        self.text = text
+
+        fields = fields_from_hits(self._found)
+        if self._budget is not None:
+            fields["budget"] = self._budget
+        delta = {k: v for k, v in fields.items() if self.fields.get(k) != v}
+        self.fields = fields
+        return delta
+
+    def finish(self) -> dict:
+        """End the utterance as it stands: count keywords held back at its end and return the fields that changed."""
+        return self.update(self.text, final=True)
+
+    def unrecorded(self) -> str:
+        """The utterance text not yet written to memory, now counted as written."""
+        text, self._recorded = self.text[self._recorded:], len(self.text)
+        return text
+
+
+@dataclass
+class StateView:
+    """The client-facing form of one version of a session's state."""
+    state: GTMState
+    version: int
+    data: dict[str, Any]
+    body: Optional[bytes] = None
+    etag: Optional[str] = None
+
+
+# How many recent versions a session remembers the changed paths of
+CHANGE_LOG_SIZE = 64
+
+
+# Interned path sets: most changes touch one of a few combinations
+_PATH_SETS: dict[frozenset, frozenset] = {}
+
+
+@dataclass
+class ChangeLog:
+    """The state paths (JSON Pointers) changed by each recent version.
+
+    Belongs to one GTMState object; when a session's state is replaced
+    (e.g. restored from the store) a new log with a new id starts, so
+    cursors from before can no longer be answered with a delta.
+    """
+    state: GTMState
+    base: int
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    entries: list = field(default_factory=list)
+
+    def add(self, version: int, paths: Iterable[str]) -> None:
+        paths = frozenset(paths)
+        paths = _PATH_SETS.setdefault(paths, paths)
+        if len(self.entries) == CHANGE_LOG_SIZE:
+            self.base = self.entries.pop(0)[0]
+        self.entries.append((version, paths))
+
+    def changed_since(self, version: int) -> Optional[set[str]]:
+        """Paths changed after version, or None if the log doesn't reach back that far."""
+        if version < self.base or version > self.state.version:
+            return None
+        changed = set()
+        for entry_version, paths in self.entries:
+            if entry_version > version:
+                changed |= paths
+        return changed
+
+
+def json_patch(document: dict, paths: Iterable[str]) -> list[dict]:
+    """RFC 6902 replace operations setting each path to its value in document."""
+    ops = []
+    for path in sorted(paths):
+        value = document
+        for key in path.split("/")[1:]:
+            value = value[key]
+        ops.append({"op": "replace", "path": path, "value": value})
+    return ops
+
+
+# Time a message may spend waiting on the agency search
+AGENCY_SEARCH_BUDGET_SECONDS = float(os.getenv("AGENCY_SEARCH_BUDGET_SECONDS", "3"))
+
+
+@dataclass
+class AgencySearchCounters:
+    """Agency searches made, skipped or unavailable after a message (process-wide)."""
+    searched: int = 0
+    skipped: int = 0
+    unavailable: int = 0
+
+    def stats(self) -> dict:
+        total = self.searched + self.skipped
+        return {
+            "searched": self.searched,
+            "skipped": self.skipped,
+            "skip_rate": round(self.skipped / total, 4) if total else 0.0,
+            "unavailable": self.unavailable,
+        }
+
+
+AGENCY_SEARCHES = AgencySearchCounters()
+
+
+class GTMAgent:
+    """GTM Strategy Agent with state management and HITL.
+
+    One instance per conversation, so construction is kept cheap: the LLM
+    agent is shared (see get_llm_agent) and nothing touches the network.
+    """
+
+    __slots__ = (
+        "state", "user_id", "thread_id", "memory", "_utterance", "tool_mentions", "journal", "_view", "_changes",
+        "_last_search", "agency_search", "_agency_search_key",
+    )
+
+    def __init__(self, user_id: Optional[str] = None, thread_id: Optional[str] = None):
         # Initialize memory if ZEP_API_KEY is set
-        self.user_id = user_id or f"user_{uuid.uuid4().hex[:8]}"
-        self.thread_id = thread_id or f"thread_{uuid.uuid4().hex[:8]}"
-        self.memory = ConversationMemory(self.user_id, self.thread_id)
+        user_id = user_id or f"user_{uuid.uuid4().hex[:8]}"
+        thread_id = thread_id or f"thread_{uuid.uuid4().hex[:8]}"
+        self._setup(user_id, thread_id, ConversationMemory(user_id, thread_id))
+
+    def _setup(self, user_id: Optional[str], thread_id: Optional[str], memory: Optional[ConversationMemory]) -> None:
+        """Set every slot (for __init__ and offline())."""
+        self.state = GTMState()
+        self.user_id = user_id
+        self.thread_id = thread_id
+        self.memory = memory
+        self._utterance: Optional[UtteranceExtractor] = None
+        self.tool_mentions: list[ToolMention] = []
+        # Durable record of state changes (see store.SessionJournal)
+        self.journal = None
+        self._view: Optional[StateView] = None
+        self._changes: Optional[ChangeLog] = None
+        # (query key, the matched_agencies list it produced) for the last search
+        self._last_search: Optional[tuple[tuple, list[AgencyMatch]]] = None
+        # Agency search running in the background (see start_agency_search)
+        self.agency_search: Optional[asyncio.Task] = None
+        self._agency_search_key: Optional[tuple] = None
+
+    @property
+    def agent(self) -> "Agent":
+        """The LLM agent (shared by every session)."""
+        return get_llm_agent()
+
+    @classmethod
+    def offline(cls) -> "GTMAgent":
+        """Create an agent for extraction only - no LLM client and no Zep memory."""
+        agent = cls.__new__(cls)
+        agent._setup(None, None, None)
+        return agent
+
+    @classmethod
+    def extract_batch(
+        cls,
+        conversations: list[list[str]],
+        max_workers: int = 1,
+        chunksize: int = 16,
+    ) -> list[GTMRequirements]:
+        """Run extraction over many conversations and return their requirements.
+
+        Each conversation is a list of user messages, applied in order. There
+        are no Zep writes or agency searches. With max_workers > 1 the work is
+        spread over up to that many processes of the shared pool (see
+        open_extract_pool).
+        """
+        if max_workers <= 1 or len(conversations) <= 1:
+            return [extract_conversation(messages) for messages in conversations]
+
+        # No more chunks than max_workers, so no more processes are kept busy
+        chunksize = max(chunksize, -(-len(conversations) // max_workers))
+        return list(open_extract_pool().map(extract_conversation, conversations, chunksize=chunksize))
 
     def calculate_progress(self) -> int:
         """Calculate how complete the requirements are."""
@@ -97,129 +485,57 @@ class GTMAgent:
 
     def extract_from_message(self, message: str) -> dict:
         """Extract GTM requirements from a user message."""
-        extracted = {}
-        message_lower = message.lower()
-
-        # Industry detection
-        industries = ["gaming", "games", "fintech", "healthcare", "healthtech",
-                     "edtech", "saas", "b2b saas", "ecommerce", "ai"]
-        for ind in industries:
-            if ind in message_lower:
-                extracted["industry"] = ind
-                # Get industry data
-                data = get_industry_data(ind)
-                if data:
-                    self.state.industry_data = data
-                break
-
-        # Category detection
-        if "b2b" in message_lower and "saas" in message_lower:
-            extracted["category"] = "b2b_saas"
-        elif "dtc" in message_lower or "direct to consumer" in message_lower:
-            extracted["category"] = "dtc"
-        elif "enterprise" in message_lower:
-            extracted["category"] = "enterprise"
-        elif "marketplace" in message_lower:
-            extracted["category"] = "marketplace"
-        elif "consumer" in message_lower:
-            extracted["category"] = "consumer"
-
-        # Stage/maturity detection
-        stages = {
-            "idea": ["idea", "concept", "thinking about"],
-            "pre_launch": ["pre-launch", "pre launch", "about to launch", "launching soon"],
-            "early": ["early stage", "just launched", "seed", "pre-seed"],
-            "growth": ["growth", "series a", "series b", "scaling"],
-            "scale": ["scale", "enterprise", "series c", "mature"],
-        }
-        for stage, keywords in stages.items():
-            if any(kw in message_lower for kw in keywords):
-                extracted["maturity"] = stage
-                break
-
-        # Budget detection - require $ sign or explicit budget context
-        # Look for patterns like $50k, $50,000, "budget of 50k", "50k/month"
-        budget_patterns = [
-            r'\$(\d{1,3}(?:,\d{3})*|\d+)\s*(?:k|K)?',  # $50k, $50,000
-            r'budget\s*(?:of|is|:)?\s*\$?(\d{1,3}(?:,\d{3})*|\d+)\s*(?:k|K)?',  # budget of 50k
-            r'(\d{1,3}(?:,\d{3})*|\d+)\s*(?:k|K)\s*(?:per|\/|a)?\s*(?:month|mo)',  # 50k/month
-        ]
-        for pattern in budget_patterns:
-            budget_match = re.search(pattern, message, re.IGNORECASE)
-            if budget_match:
-                amount = budget_match.group(1).replace(",", "")
-                # Only accept if it's a reasonable budget number (> 100 or has k/K)
-                has_k = bool(re.search(r'\d+\s*[kK]', message))
-                if has_k:
-                    extracted["budget"] = int(amount) * 1000
-                elif int(amount) >= 1000:  # Only accept raw numbers >= 1000
-                    extracted["budget"] = int(amount)
-                break
+        hits = get_keyword_matcher().find_all(message)
+        self.tool_mentions = TOOL_REGISTRY.mentions_from_hits(hits)
+        extracted = fields_from_hits(group_hits(hits))
 
-        # Tool recognition - avoid duplicates
-        tools = recognize_tools(message)
-        if tools:
-            existing_names = {t.name for t in self.state.recognized_tools}
-            new_tools = [t for t in tools if t.name not in existing_names]
-            self.state.recognized_tools.extend(new_tools)
-            extracted["tech_stack"] = [t.name for t in tools]
-
-        # Specialization needs
-        specs = {
-            "demand gen": ["demand gen", "demand generation", "lead gen"],
-            "abm": ["abm", "account based", "account-based"],
-            "content": ["content", "content marketing", "blog"],
-            "plg": ["plg", "product led", "product-led", "self-serve"],
-            "brand": ["brand", "branding", "positioning"],
-            "seo": ["seo", "search engine", "organic search"],
-            "paid": ["paid", "ppc", "ads", "advertising"],
-        }
-        found_specs = []
-        for spec, keywords in specs.items():
-            if any(kw in message_lower for kw in keywords):
-                found_specs.append(spec)
-        if found_specs:
-            extracted["needed_specializations"] = found_specs
-
-        # Strategy type hints
-        if "product led" in message_lower or "plg" in message_lower or "self-serve" in message_lower:
-            extracted["strategy_type"] = "plg"
-        elif "sales" in message_lower and ("led" in message_lower or "driven" in message_lower):
-            extracted["strategy_type"] = "sales_led"
-        elif "hybrid" in message_lower or ("product" in message_lower and "sales" in message_lower):
-            extracted["strategy_type"] = "hybrid"
-
-        # Region detection
-        regions = {
-            "us": ["us", "usa", "united states", "america"],
-            "uk": ["uk", "united kingdom", "britain"],
-            "europe": ["europe", "eu", "emea"],
-            "apac": ["apac", "asia", "pacific"],
-            "global": ["global", "worldwide", "international"],
-        }
-        found_regions = []
-        for region, keywords in regions.items():
-            if any(kw in message_lower for kw in keywords):
-                found_regions.append(region.upper())
-        if found_regions:
-            extracted["target_regions"] = found_regions
+        budget = extract_budget(message)
+        if budget is not None:
+            extracted["budget"] = budget
 
         return extracted
 
+    def _note_extraction(self, extracted: dict) -> None:
+        """Attach industry data and recognized tools for newly extracted fields."""
+        # Industry data for the detected industry
+        if "industry" in extracted:
+            data = get_industry_data(extracted["industry"])
+            if data:
+                self.state.industry_data = data
+
+        # Tool recognition - avoid duplicates
+        if extracted.get("tech_stack"):
+            existing_names = {t.name for t in self.state.recognized_tools}
+            for name in extracted["tech_stack"]:
+                tool = TOOL_REGISTRY.get_by_name(name)
+                if tool and tool.name not in existing_names:
+                    self.state.recognized_tools.append(tool)
+                    existing_names.add(tool.name)
+
     def update_requirements(self, extracted: dict) -> list[ConfirmationRequest]:
         """Update requirements and return confirmation requests."""
+        state = self.state
+        before = (state.industry_data, len(state.recognized_tools), state.progress_percent)
+        self._note_extraction(extracted)
         confirmations = []
-        req = self.state.requirements
+        req = state.requirements
+        changed = set()
+        applied = {}
 
         for field, value in extracted.items():
-            if field == "tech_stack":
-                req.tech_stack = list(set((req.tech_stack or []) + value))
-            elif field == "needed_specializations":
-                req.needed_specializations = list(set((req.needed_specializations or []) + value))
-            elif field == "target_regions":
-                req.target_regions = list(set((req.target_regions or []) + value))
-            else:
-                setattr(req, field, value)
+            old = getattr(req, field, None)
+            try:
+                if field in ("tech_stack", "needed_specializations", "target_regions"):
+                    setattr(req, field, list(set((old or []) + value)))
+                else:
+                    setattr(req, field, value)
+            except (TypeError, ValueError) as e:
+                # Not a valid value for the field (e.g. from an LLM tool call): leave it out
+                print(f"Ignoring {field}={value!r}: {e}")
+                continue
+            applied[field] = value
+            if getattr(req, field, None) != old:
+                changed.add(f"/requirements/{field}")
 
             # Create soft confirmation for important fields
             if field in ["industry", "category", "budget", "strategy_type"]:
@@ -230,11 +546,30 @@ class GTMAgent:
                     confidence=0.9
                 ))
 
-        self.state.progress_percent = self.calculate_progress()
+        state.progress_percent = self.calculate_progress()
+        after = (state.industry_data, len(state.recognized_tools), state.progress_percent)
+        for path, old, new in zip(("/industry_data", "/recognized_tools", "/progress_percent"), before, after):
+            if new != old:
+                changed.add(path)
+        self._record("update", {"fields": applied}, changed)
         return confirmations
 
-    async def process_message(self, message: str) -> dict:
-        """Process a user message and return state updates."""
+    async def process_message(
+        self,
+        message: str,
+        session: Optional[Callable[[], AsyncContextManager["GTMAgent"]]] = None,
+        deadline: Optional[float] = None,
+    ) -> dict:
+        """Process a user message and return state updates.
+
+        Pass session (exclusive access to this agent, as the server's
+        locked_session gives) to run the agency search in the background
+        rather than wait for it: see start_agency_search. The search gives
+        up at deadline (a time.monotonic() time, by default
+        AGENCY_SEARCH_BUDGET_SECONDS from now).
+        """
+        if deadline is None:
+            deadline = time.monotonic() + AGENCY_SEARCH_BUDGET_SECONDS
         # Store user message in Zep memory
         await self.memory.add_user_message(
             content=message,
@@ -243,26 +578,161 @@ class GTMAgent:
 
         # Extract info from message
         extracted = self.extract_from_message(message)
-
+        return await self._apply_extraction(extracted, session, deadline)
+
+    async def process_utterance(self, text: str, final: bool = False) -> dict:
+        """Process the latest text of a growing utterance (e.g. a voice transcript).
+
+        Only text appended since the previous call is scanned, and "extracted"
+        holds just the fields that changed. Pass final=True once the
+        utterance is complete. Text that does not continue the previous
+        utterance starts a new one, and the previous one counts as finished.
+        Each utterance is written to memory once, when it is complete.
+        """
+        deadline = time.monotonic() + AGENCY_SEARCH_BUDGET_SECONDS
+        utterance = self._utterance
+        if utterance is None:
+            utterance = self._utterance = UtteranceExtractor()
+        extracted = {}
+        if not utterance.continues(text):
+            # The previous utterance is over: keep what it held back, and record it
+            extracted = utterance.finish()
+            await self._record_utterance(utterance)
+        for field, value in utterance.update(text, final).items():
+            if isinstance(value, list) and isinstance(extracted.get(field), list):
+                value = extracted[field] + [v for v in value if v not in extracted[field]]
+            extracted[field] = value
+        self.tool_mentions = utterance.mentions
+
+        if final:
+            await self._record_utterance(utterance)
+
+        return await self._apply_extraction(extracted, deadline=deadline)
+
+    async def _record_utterance(self, utterance: UtteranceExtractor) -> None:
+        content = utterance.unrecorded()
+        if content.strip():
+            await self.memory.add_user_message(content=content, metadata={"type": "user_input"})
+
+    def agency_query(self) -> Optional[tuple]:
+        """The agency search the requirements call for (see agency_query_key), or None before 40%."""
+        if self.state.progress_percent < 40:
+            return None
+        req = self.state.requirements
+        specs = req.needed_specializations or []
+        if not specs and req.category == "b2b_saas":
+            specs = ["B2B Marketing", "GTM"]
+        category_tags = ["B2B Marketing Agency"] if req.category == "b2b_saas" else []
+        return agency_query_key(specs, category_tags, max_budget=req.budget, limit=5)
+
+    async def _search(self, key: tuple, deadline: Optional[float]) -> list[AgencyMatch]:
+        specializations, category_tags, service_areas, max_budget, limit = key
+        AGENCY_SEARCHES.searched += 1
+        try:
+            return await find_agencies(
+                specializations=list(specializations),
+                category_tags=list(category_tags),
+                service_areas=list(service_areas),
+                max_budget=max_budget,
+                limit=limit,
+                deadline=deadline,
+            )
+        except AgencySearchUnavailable:
+            AGENCY_SEARCHES.unavailable += 1
+            raise
+
+    def _apply_search(self, key: tuple, agencies: list[AgencyMatch]) -> None:
+        self.set_matched_agencies(agencies)
+        self._last_search = (key, agencies)
+
+    def start_agency_search(
+        self,
+        key: tuple,
+        session: Callable[[], AsyncContextManager["GTMAgent"]],
+        deadline: Optional[float] = None,
+    ) -> asyncio.Task:
+        """Search agencies for key in a background task, cancelling the search it supersedes.
+
+        The task searches without holding the session, then takes it
+        through session() to apply the matches. It returns ("found",
+        matches), or ("unavailable", the session's current matches) if the
+        search failed or ran past deadline - they stay as the last good
+        result. It returns None, without changing anything, if a newer
+        search has replaced it in the meantime.
+        """
+        self.cancel_agency_search()
+
+        async def run() -> Optional[tuple[str, list[AgencyMatch]]]:
+            try:
+                agencies = await self._search(key, deadline)
+            except AgencySearchUnavailable:
+                agencies = None
+            async with session() as agent:
+                if agent is not self or self.agency_search is not task:
+                    return None
+                self.agency_search = None
+                if agencies is None:
+                    return "unavailable", self.state.matched_agencies
+                self._apply_search(key, agencies)
+            return "found", agencies
+
+        task = asyncio.ensure_future(run())
+        self.agency_search, self._agency_search_key = task, key
+        return task
+
+    def cancel_agency_search(self) -> None:
+        """Cancel the background agency search, if one is running."""
+        if self.agency_search is not None:
+            self.agency_search.cancel()
+            self.agency_search = None
+
+    async def _apply_extraction(
+        self,
+        extracted: dict,
+        session: Optional[Callable[[], AsyncContextManager["GTMAgent"]]] = None,
+        deadline: Optional[float] = None,
+    ) -> dict:
+        """Apply extracted fields, search agencies if ready, and build the response.
+
+        With session, a needed search is left running in the background and
+        the response has "agency_search": "pending". If the search is
+        unavailable the matches are left as they were (the last good
+        result) and the response has "agency_search": "unavailable".
+        """
         # Update requirements and get confirmations
         confirmations = self.update_requirements(extracted)
-        self.state.pending_confirmations = confirmations
+        self.set_pending_confirmations(confirmations)
 
         # Search agencies if we have enough info
-        agencies = []
-        if self.state.progress_percent >= 40:
-            req = self.state.requirements
-            specs = req.needed_specializations or []
-            if not specs and req.category == "b2b_saas":
-                specs = ["B2B Marketing", "GTM"]
-
-            agencies = await search_agencies(
-                specializations=specs,
-                category_tags=["B2B Marketing Agency"] if req.category == "b2b_saas" else [],
-                max_budget=req.budget,
-                limit=5
-            )
-            self.state.matched_agencies = agencies
+        query = self.agency_query()
+        running = self.agency_search is not None and not self.agency_search.done()
+        search_status = None
+        if query is None:
+            pass
+        elif session is not None and running and self._agency_search_key == query:
+            # The same search is already running for an earlier message
+            AGENCY_SEARCHES.skipped += 1
+            search_status = "pending"
+        elif (
+            # Nothing that feeds the search changed (and the matches are still
+            # the ones it returned), so keep them rather than search again
+            self._last_search is not None
+            and self._last_search[0] == query
+            and self._last_search[1] is self.state.matched_agencies
+        ):
+            AGENCY_SEARCHES.skipped += 1
+            # A search still running is for inputs that have since changed back
+            self.cancel_agency_search()
+        elif session is not None:
+            self.start_agency_search(query, session, deadline)
+            search_status = "pending"
+        else:
+            # Searching inline: a background search would only overwrite this one
+            self.cancel_agency_search()
+            try:
+                self._apply_search(query, await self._search(query, deadline))
+            except AgencySearchUnavailable:
+                search_status = "unavailable"
 
         # Store assistant response summary in memory
         await self.memory.add_assistant_message(
@@ -270,36 +740,173 @@ class GTMAgent:
             metadata={"type": "extraction_result", "fields": list(extracted.keys())}
         )
 
+        view = self.state_snapshot()
         return {
             "extracted": extracted,
-            "confirmations": [c.model_dump() for c in confirmations],
-            "state": {
-                "requirements": self.state.requirements.model_dump(),
-                "progress_percent": self.state.progress_percent,
-                "industry_data": self.state.industry_data.model_dump() if self.state.industry_data else None,
-                "recognized_tools": [t.model_dump() for t in self.state.recognized_tools],
-                "matched_agencies": [a.model_dump() for a in self.state.matched_agencies],
-            },
+            "confirmations": [c.to_dict() for c in confirmations],
+            "tool_mentions": [
+                {"name": m.tool.name, "start": m.start, "end": m.end}
+                for m in self.tool_mentions
+            ],
+            "state": {key: view[key] for key in (
+                "requirements", "progress_percent", "industry_data", "recognized_tools", "matched_agencies", "version",
+            )},
             "memory": {
                 "user_id": self.user_id,
                 "thread_id": self.thread_id,
-            }
+            },
+            **({"agency_search": search_status} if search_status else {}),
         }
 
+    def set_pending_confirmations(self, confirmations: list[ConfirmationRequest]) -> None:
+        """Replace the confirmations waiting on the user."""
+        if confirmations == self.state.pending_confirmations:
+            return
+        self.state.pending_confirmations = confirmations
+        self._record(
+            "pending", {"confirmations": [c.to_dict() for c in confirmations]}, ("/pending_confirmations",)
+        )
+
+    def set_matched_agencies(self, agencies: list[AgencyMatch]) -> None:
+        """Replace the matched agencies."""
+        if agencies == self.state.matched_agencies:
+            return
+        self.state.matched_agencies = agencies
+        self._record("agencies", {"agencies": [a.to_dict() for a in agencies]}, ("/matched_agencies",))
+
     def confirm_field(self, field: str) -> None:
         """Confirm a field (user accepted the extraction)."""
+        self._record("confirm", {"field": field}, self._confirm(field))
+
+    def _confirm(self, field: str) -> set[str]:
+        """Mark field confirmed; returns the JSON Pointers that changed."""
+        changed = set()
         if field not in self.state.confirmed_fields:
             self.state.confirmed_fields.append(field)
+            changed.add("/confirmed_fields")
         # Remove from pending
-        self.state.pending_confirmations = [
-            c for c in self.state.pending_confirmations if c.field != field
-        ]
-
-    def correct_field(self, field: str, new_value: str) -> None:
-        """Correct a field (user provided different value)."""
-        if hasattr(self.state.requirements, field):
-            setattr(self.state.requirements, field, new_value)
-        self.confirm_field(field)
+        pending = [c for c in self.state.pending_confirmations if c.field != field]
+        if len(pending) != len(self.state.pending_confirmations):
+            self.state.pending_confirmations = pending
+            changed.add("/pending_confirmations")
+        return changed
+
+    def correct_field(self, field: str, new_value: Any) -> None:
+        """Correct a field (user provided different value).
+
+        Raises ValueError, changing nothing, if new_value isn't valid for the field.
+        """
+        changed = set()
+        req = self.state.requirements
+        if field in GTMRequirements.model_fields:
+            old = getattr(req, field)
+            setattr(req, field, new_value)
+            if getattr(req, field) != old:
+                changed.add(f"/requirements/{field}")
+        changed |= self._confirm(field)
+        self._record("correct", {"field": field, "value": new_value}, changed)
+
+    def _state_view(self) -> StateView:
+        view = self._view
+        if view is None or view.state is not self.state or view.version != self.state.version:
+            state = self.state
+            view = self._view = StateView(state, state.version, {
+                "requirements": state.requirements.model_dump(),
+                "progress_percent": state.progress_percent,
+                "industry_data": REFERENCE_PAYLOADS.dump(state.industry_data) if state.industry_data else None,
+                "recognized_tools": [REFERENCE_PAYLOADS.dump(t) for t in state.recognized_tools],
+                "matched_agencies": [a.to_dict() for a in state.matched_agencies],
+                "pending_confirmations": [c.to_dict() for c in state.pending_confirmations],
+                "confirmed_fields": list(state.confirmed_fields),
+                "version": state.version,
+            })
+        return view
+
+    def state_snapshot(self) -> dict[str, Any]:
+        """The client-facing state, rebuilt only when the version changes.
+
+        The dict is shared between callers until then, so don't modify it.
+        """
+        return self._state_view().data
+
+    def state_json(self) -> tuple[bytes, str]:
+        """The client-facing state as JSON bytes, with an ETag for them.
+
+        Both are computed once per state version. Industry data and tools
+        are embedded from their pre-encoded JSON.
+        """
+        view = self._state_view()
+        if view.body is None:
+            state = view.state
+            view.body = dumps({
+                **view.data,
+                "industry_data": REFERENCE_PAYLOADS.encoded(state.industry_data) if state.industry_data else None,
+                "recognized_tools": [REFERENCE_PAYLOADS.encoded(t) for t in state.recognized_tools],
+            })
+            view.etag = f'"{hashlib.blake2b(view.body, digest_size=12).hexdigest()}"'
+        return view.body, view.etag
+
+    def _change_log(self) -> ChangeLog:
+        log = self._changes
+        if log is None or log.state is not self.state:
+            log = self._changes = ChangeLog(self.state, self.state.version)
+        return log
+
+    def state_cursor(self) -> str:
+        """Opaque position of the current state, for state_delta()."""
+        return f"{self._change_log().id}:{self.state.version}"
+
+    def state_delta(self, cursor: Optional[str]) -> Optional[list[dict]]:
+        """JSON Patch (RFC 6902) from the state at cursor to the current one.
+
+        None if the cursor is missing, from another state or too old, in
+        which case the client needs a full snapshot instead.
+        """
+        log = self._change_log()
+        log_id, _, version = (cursor or "").partition(":")
+        if log_id != log.id or not version.isdigit():
+            return None
+        changed = log.changed_since(int(version))
+        if changed is None:
+            return None
+        if int(version) != self.state.version:
+            changed.add("/version")
+        return json_patch(self.state_snapshot(), changed)
+
+    def _record(self, kind: str, payload: dict, changed: Iterable[str] = ()) -> None:
+        """Bump the state version for an applied change and journal it.
+
+        changed lists the JSON Pointers of the parts of state_snapshot()
+        the change touched; with none, nothing changed and nothing is
+        recorded.
+        """
+        changed = tuple(changed)
+        if not changed:
+            return
+        log = self._change_log()
+        self.state.version += 1
+        log.add(self.state.version, changed)
+        if self.journal is not None:
+            self.journal.record(kind, payload, self)
+
+    def apply_event(self, kind: str, payload: dict) -> None:
+        """Replay a recorded state change (without recording it again)."""
+        journal, self.journal = self.journal, None
+        try:
+            if kind == "update":
+                self.update_requirements(payload["fields"])
+            elif kind == "pending":
+                self.set_pending_confirmations(
+                    [ConfirmationRequest(**c) for c in payload["confirmations"]]
+                )
+            elif kind == "agencies":
+                self.set_matched_agencies([AgencyMatch(**a) for a in payload["agencies"]])
+            elif kind == "confirm":
+                self.confirm_field(payload["field"])
+            elif kind == "correct":
+                self.correct_field(payload["field"], payload["value"])
+        finally:
+            self.journal = journal
 
     async def get_conversation_history(self, last_n: int = 10) -> str:
         """Get recent conversation history from memory."""
@@ -310,5 +917,44 @@ class GTMAgent:
         return await self.memory.search(query, limit)
 
 
-# Global agent instance
-gtm_agent = GTMAgent()
+# Process pool for GTMAgent.extract_batch (see open_extract_pool)
+_extract_pool: Optional[ProcessPoolExecutor] = None
+_extract_pool_lock = threading.Lock()
+
+
+def open_extract_pool() -> ProcessPoolExecutor:
+    """Create the shared process pool for batch extraction.
+
+    EXTRACT_WORKERS processes at most (default: one per CPU), started as
+    work arrives and then kept. They are spawned, not forked, since the
+    server process runs threads. The server opens the pool at start-up and
+    closes it at shutdown; anything else gets one on first use.
+    """
+    global _extract_pool
+
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            _extract_pool = ProcessPoolExecutor(
+                max_workers=int(os.getenv("EXTRACT_WORKERS", "0")) or os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _extract_pool
+
+
+def close_extract_pool() -> None:
+    """Shut down the shared pool and its worker processes."""
+    global _extract_pool
+
+    with _extract_pool_lock:
+        pool, _extract_pool = _extract_pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def extract_conversation(messages: list[str]) -> GTMRequirements:
+    """Extract the requirements from one conversation's user messages."""
+    agent = GTMAgent.offline()
+    for message in messages:
+        if message:
+            agent.update_requirements(agent.extract_from_message(message))
+    return agent.state.requirements
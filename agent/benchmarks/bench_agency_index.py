@@ -0,0 +1,132 @@
+"""Benchmark: in-process agency search over the columnar index.
+
+    python benchmarks/bench_agency_index.py [agencies] [searches]
+
+Builds a synthetic catalog and runs a mix of searches two ways: a
+row-by-row Python port of searchAgencies in src/lib/agencies.ts (filter
+every agency, score every survivor, sort), and AgencyIndex.search. Each
+query's results are checked to agree (same agencies, scores and reasons)
+before anything is timed.
+"""
+
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from agency_index import (  # noqa: E402
+    CATEGORY_MAP, REGION_MAP, SPECIALIZATION_MAP, AgencyIndex, map_user_input,
+)
+
+SPECIALIZATIONS = sorted({v for values in SPECIALIZATION_MAP.values() for v in values}) + [
+    f"Niche Service {i}" for i in range(150)
+]
+CATEGORIES = sorted({v for values in CATEGORY_MAP.values() for v in values})
+REGIONS = sorted({v for values in REGION_MAP.values() for v in values})
+
+QUERIES = [
+    (["demand gen", "abm"], ["b2b saas"], ["us"], 25000),
+    (["content"], [], ["uk", "europe"], 10000),
+    (["seo", "paid media", "analytics"], ["fintech"], [], None),
+    (["B2B Marketing", "GTM"], ["B2B Marketing Agency"], [], 15000),
+    (["plg"], ["startup"], ["global"], 5000),
+    ([], ["dtc"], [], 50000),
+    (["linkedin", "brand"], [], ["apac"], None),
+    (["growth"], [], [], 0),
+]
+
+
+def catalog(count: int) -> list[dict]:
+    rng = random.Random(7)
+    return [
+        {
+            "id": i + 1,
+            "name": f"Agency {i}",
+            "slug": f"agency-{i}",
+            "description": "B2B marketing agency.",
+            "headquarters": "London, UK",
+            "specializations": rng.sample(SPECIALIZATIONS, rng.randint(1, 6)),
+            "category_tags": rng.sample(CATEGORIES, rng.randint(0, 3)),
+            "service_areas": rng.sample(REGIONS, rng.randint(0, 4)),
+            "min_budget": rng.choice([None, 0, 2000, 5000, 10000, 20000, 40000]),
+            "avg_rating": rng.choice([None, 4.1, 4.5, 4.9]),
+            "global_rank": rng.choice([None, *range(1, count + 1)]),
+        }
+        for i in range(count)
+    ]
+
+
+def similar(a: str, b: str) -> bool:
+    return a.lower() in b.lower() or b.lower() in a.lower()
+
+
+def row_search(rows: list[dict], specs, cats, areas, max_budget, limit=5) -> list[tuple]:
+    """searchAgencies row by row, ranking the whole filtered catalog like the index does."""
+    specs = [t for s in specs for t in map_user_input(s, SPECIALIZATION_MAP)]
+    cats = [t for c in cats for t in map_user_input(c, CATEGORY_MAP)]
+    areas = [t for a in areas for t in map_user_input(a, REGION_MAP)]
+    results = []
+    for position, row in enumerate(rows):
+        if specs and not set(row["specializations"]) & set(specs):
+            continue
+        if cats and not set(row["category_tags"]) & set(cats):
+            continue
+        if areas and not set(row["service_areas"]) & set(areas):
+            continue
+        if max_budget is not None and row["min_budget"] is not None and row["min_budget"] > max_budget:
+            continue
+        score, reasons = 0, []
+        spec_matches = [s for s in row["specializations"] if any(similar(s, q) for q in specs)]
+        if spec_matches:
+            score += min(40, 15 * len(spec_matches))
+            reasons.append(f"Specializes in: {', '.join(spec_matches[:2])}")
+        if any(similar(c, q) for c in row["category_tags"] for q in cats):
+            score += 25
+            reasons.append("Matches your business type")
+        if any(similar(a, q) for a in row["service_areas"] for q in areas):
+            score += 20
+            reasons.append("Serves your target regions")
+        if not row["min_budget"] or (max_budget and row["min_budget"] <= max_budget):
+            score += 15
+            if row["min_budget"]:
+                reasons.append(f"Budget from ${row['min_budget']:,}/mo")
+        rank = row["global_rank"] if row["global_rank"] is not None else float("inf")
+        results.append((-score, rank, position, row["id"], score, reasons))
+    results.sort()
+    return [(r[3], r[4], r[5]) for r in results[:limit]]
+
+
+def per_search_us(fn, searches: int) -> float:
+    start = time.perf_counter()
+    for i in range(searches):
+        fn(*QUERIES[i % len(QUERIES)])
+    return (time.perf_counter() - start) / searches * 1e6
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    searches = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+
+    rows = catalog(count)
+    start = time.perf_counter()
+    index = AgencyIndex(rows)
+    build_ms = (time.perf_counter() - start) * 1e3
+
+    for query in QUERIES:
+        expected = row_search(rows, *query)
+        got = [(a.id, a.match_score, a.match_reasons) for a in index.search(*query)]
+        assert got == expected, (query, got, expected)
+
+    row_us = per_search_us(lambda *q: row_search(rows, *q), max(1, searches // 10))
+    index_us = per_search_us(index.search, searches)
+    print(f"catalog: {count} agencies, index built in {build_ms:.1f} ms ({index.stats()})")
+    print(f"row-by-row search   {row_us:9.1f} us/search")
+    print(f"columnar index      {index_us:9.1f} us/search  ({row_us / index_us:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
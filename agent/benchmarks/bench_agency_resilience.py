@@ -0,0 +1,110 @@
+"""Benchmark: agency search against a failing or slow search API.
+
+    python benchmarks/bench_agency_resilience.py [turns]
+
+The search API is replaced in-process (an httpx mock transport) whose
+behaviour each scenario sets. Times are scaled down so a run is quick:
+the HTTP timeout stands at HANG_SECONDS and the per-turn budget at
+BUDGET_SECONDS.
+
+  hanging API  every call hangs until the HTTP timeout. Turns without a
+               deadline or breaker (as before) against find_agencies with
+               both.
+  tail latency most calls are fast, TAIL_RATE of them slow. Call latency
+               with hedging off and on.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ["AGENCY_CACHE_TTL_SECONDS"] = "0"  # every search goes upstream
+
+import tools  # noqa: E402
+from resilience import CircuitBreaker, Hedger  # noqa: E402
+
+HANG_SECONDS = 2.0
+BUDGET_SECONDS = 0.3
+FAST_SECONDS = 0.005
+SLOW_SECONDS = 0.2
+TAIL_RATE = 0.05
+
+ROW = {
+    "id": 1, "name": "Agency", "slug": "agency", "description": "", "headquarters": "",
+    "specializations": ["Demand Generation"], "match_score": 90, "match_reasons": [],
+}
+
+
+def use_upstream(latency) -> None:
+    """Point the shared client at a stand-in API whose latency() picks each call's delay (None: hang)."""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        delay = latency()
+        if delay is None:
+            await asyncio.sleep(HANG_SECONDS)
+            raise httpx.ReadTimeout("timed out", request=request)
+        await asyncio.sleep(delay)
+        return httpx.Response(200, json=[ROW])
+
+    tools._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://standin")
+
+
+def summary(name: str, samples: list[float]) -> None:
+    ordered = sorted(samples)
+    p = lambda pct: ordered[min(len(ordered) - 1, int(len(ordered) * pct))] * 1e3  # noqa: E731
+    print(f"{name:34s} p50 {p(0.5):7.1f} ms  p99 {p(0.99):7.1f} ms  max {ordered[-1] * 1e3:7.1f} ms"
+          f"  total {sum(samples):6.2f} s")
+
+
+async def turns(count: int, deadline_seconds=None) -> list[float]:
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        try:
+            await tools.find_agencies(["demand gen"], max_budget=1000 + i, deadline=deadline)
+        except tools.AgencySearchUnavailable:
+            pass
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def hanging(count: int) -> None:
+    print("hanging API")
+    use_upstream(lambda: None)
+    tools.AGENCY_BREAKER = CircuitBreaker("bench", failure_threshold=10**9)
+    summary("no deadline, no breaker (before)", await turns(max(3, count // 10)))
+
+    tools.AGENCY_BREAKER = CircuitBreaker("bench", reset_seconds=60)
+    samples = await turns(count, BUDGET_SECONDS)
+    summary("deadline + breaker", samples)
+    print(f"  breaker: {tools.AGENCY_BREAKER.stats()['state']}, "
+          f"{tools.AGENCY_BREAKER.rejected} of {count} turns failed fast")
+
+
+async def tail(count: int) -> None:
+    print("tail latency")
+    rng = random.Random(3)
+    use_upstream(lambda: SLOW_SECONDS if rng.random() < TAIL_RATE else FAST_SECONDS)
+    tools.AGENCY_BREAKER = CircuitBreaker("bench")
+    for enabled in (False, True):
+        tools.AGENCY_HEDGER = Hedger(enabled=enabled)
+        samples = await turns(count)
+        summary(f"hedging {'on' if enabled else 'off'}", samples[20:])
+        if enabled:
+            print(f"  hedged {tools.AGENCY_HEDGER.hedged} of {count} calls")
+
+
+async def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    await hanging(min(count, 60))
+    await tail(count)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
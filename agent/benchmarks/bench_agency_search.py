@@ -0,0 +1,129 @@
+"""Load test: agency search through the pooled client vs a client per call.
+
+    python benchmarks/bench_agency_search.py [searches] [concurrency]
+
+Starts a local stand-in for the Next.js agency search API (the `standin`
+app below, with AGENCY_STANDIN_DELAY_MS of simulated query time) and runs
+the same searches three ways: a new httpx.AsyncClient per search, as
+search_agencies used to; the shared keep-alive client with no cache; and
+tools.search_agencies, which adds the result cache, over a mix of
+QUERY_VARIANTS distinct queries.
+"""
+
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+STANDIN_PORT = int(os.getenv("AGENCY_STANDIN_PORT", "8799"))
+STANDIN_URL = f"http://127.0.0.1:{STANDIN_PORT}"
+os.environ["AGENCY_SEARCH_URL"] = STANDIN_URL
+
+import tools  # noqa: E402
+
+standin = FastAPI()
+
+
+@standin.post("/api/agencies/search")
+async def standin_search(body: dict):
+    """Fixed results after a simulated query delay."""
+    await asyncio.sleep(float(os.getenv("AGENCY_STANDIN_DELAY_MS", "2")) / 1000)
+    return [
+        {
+            "id": i + 1,
+            "name": f"Agency {i}",
+            "slug": f"agency-{i}",
+            "description": "Full-funnel B2B demand generation and ABM programs.",
+            "headquarters": "London, UK",
+            "specializations": body.get("specializations") or ["Demand Generation"],
+            "min_budget": 10000,
+            "match_score": 95 - i,
+            "match_reasons": ["Specializes in Demand Generation"],
+        }
+        for i in range(body.get("limit", 5))
+    ]
+
+
+def start_standin() -> subprocess.Popen:
+    """Run the stand-in search API and wait until it answers."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "bench_agency_search:standin",
+         "--port", str(STANDIN_PORT), "--log-level", "warning"],
+        cwd=Path(__file__).parent,
+    )
+    for _ in range(200):
+        try:
+            httpx.post(f"{STANDIN_URL}/api/agencies/search", json={"limit": 1})
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.05)
+    proc.terminate()
+    raise RuntimeError("stand-in search server did not start")
+
+
+QUERY = {"specializations": ["Demand Generation", "ABM"], "category_tags": [], "service_areas": [], "max_budget": 25000}
+QUERY_VARIANTS = 50
+
+
+async def per_call_client() -> None:
+    """The old search_agencies: a new client, and so a new connection, per search."""
+    async with httpx.AsyncClient() as client:
+        response = await client.post(f"{STANDIN_URL}/api/agencies/search", json={**QUERY, "limit": 5}, timeout=10.0)
+        tools.parse_agencies(response.json())
+
+
+async def load(name: str, search, searches: int, concurrency: int) -> None:
+    latencies = []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with gate:
+            t0 = time.perf_counter()
+            await search()
+            latencies.append(time.perf_counter() - t0)
+
+    await search()  # warm up
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(searches)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e3
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3
+    print(f"{name:22s} {searches / elapsed:8.0f} searches/s  p50 {p50:7.2f} ms  p99 {p99:7.2f} ms")
+
+
+async def main() -> None:
+    searches = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    proc = start_standin()
+    try:
+        await load("client per search", per_call_client, searches, concurrency)
+        key = tools.agency_query_key(**QUERY)
+        await load("pooled client", lambda: tools._fetch_agencies(key), searches, concurrency)
+
+        budgets = itertools.cycle(range(1000, 1000 * (QUERY_VARIANTS + 1), 1000))
+        await load(
+            "pooled client + cache",
+            lambda: tools.search_agencies(**{**QUERY, "max_budget": next(budgets)}),
+            searches,
+            concurrency,
+        )
+        stats = tools.AGENCY_CACHE.stats()
+        print(f"cache: {stats['hits']} hits, {stats['coalesced']} coalesced, {stats['misses']} misses")
+        await tools.close_http_client()
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""Benchmark: memory held per session.
+
+    python benchmarks/bench_memory.py [sessions]
+
+Builds sessions the way the server does (a GTMAgent per thread), takes each
+through a short conversation and an agency search result, and measures the
+Python heap they hold with tracemalloc. Reports bytes per session next to
+the registry's own estimate, and how many such sessions fit in a worker
+with the default SESSION_MAX_BYTES.
+"""
+
+import gc
+import os
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from agent import GTMAgent  # noqa: E402
+from sessions import estimate_session_bytes  # noqa: E402
+from tools import parse_agencies  # noqa: E402
+
+MESSAGES = [
+    "We're a B2B SaaS fintech startup called Ledgerly",
+    "We use HubSpot, Salesforce, Clay, Apollo, Gong and Outreach",
+    "Budget is around $25k per month, targeting US and UK enterprise buyers",
+    "We need demand gen, ABM and content help",
+]
+
+AGENCIES = [
+    {
+        "id": i + 1,
+        "name": f"Agency {i}",
+        "slug": f"agency-{i}",
+        "description": "Full-funnel B2B demand generation and ABM programs for SaaS companies.",
+        "headquarters": "London, UK",
+        "specializations": ["Demand Generation", "ABM", "Content Marketing", "Paid Media"],
+        "min_budget": 10000,
+        "match_score": 95 - i,
+        "match_reasons": ["Specializes in Demand Generation", "Serves North America", "Within budget"],
+        "website": f"https://agency-{i}.example.com",
+    }
+    for i in range(5)
+]
+
+
+def build_session(i: int) -> GTMAgent:
+    agent = GTMAgent(user_id=f"user_{i}", thread_id=f"thread_{i}")
+    for message in MESSAGES:
+        agent.set_pending_confirmations(agent.update_requirements(agent.extract_from_message(message)))
+    agent.set_matched_agencies(parse_agencies(AGENCIES))
+    agent.state_snapshot()  # the cached client view is part of what a session holds
+    return agent
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    build_session(-1)  # load catalogs, automata and lazy imports first
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = [build_session(i) for i in range(count)]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    per_session = (after - before) / count
+    estimate = sum(estimate_session_bytes(s) for s in sessions) / count
+    max_bytes = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024)))
+    print(f"measured per session:  {per_session:9.0f} B  ({count} sessions)")
+    print(f"registry estimate:     {estimate:9.0f} B")
+    print(f"sessions per {max_bytes / 2**20:.0f} MiB:  {max_bytes / per_session:9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Benchmark: /memory/history reads from the in-process history buffers.
+
+    python benchmarks/bench_memory_history.py [turns] [rtt_ms]
+
+Zep is replaced by a stand-in client whose calls take rtt_ms, which
+keeps each thread's messages and counts the calls. Conversations on a
+set of threads write a user and an assistant message per turn and read
+the last 10 messages after each, first with the history buffers off
+(ZEP_HISTORY_MESSAGES=0: every read flushes the thread and asks Zep, as
+before) and then on. The threads start with messages already in Zep, so
+the first read of each is a cold miss. Each read is checked against
+what Zep holds.
+
+Then footprint: many threads written through a cache with a small
+byte budget, to show it stays within it.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+os.environ["ZEP_API_KEY"] = "benchmark-placeholder"
+
+import memory  # noqa: E402
+from memory import ConversationMemory, HistoryCache  # noqa: E402
+
+THREADS = 20
+LAST_N = 10
+
+
+class StandInThreads:
+    """Zep's memory API over in-process threads, with a fixed round trip per call."""
+
+    def __init__(self, zep: "StandInZep"):
+        self.zep = zep
+        self.threads: dict[str, list] = {}
+
+    async def get(self, thread_id, lastn=None, **kwargs):
+        await self.zep._call()
+        messages = self.threads.get(thread_id, [])
+        return SimpleNamespace(messages=messages[-lastn:] if lastn else messages)
+
+    async def add(self, thread_id, messages=None, **kwargs):
+        await self.zep._call()
+        self.threads.setdefault(thread_id, []).extend(
+            SimpleNamespace(role_type=m.role_type, content=m.content) for m in messages or []
+        )
+
+    async def add_session(self, *args, **kwargs):
+        await self.zep._call()
+
+
+class StandInUsers:
+    def __init__(self, zep: "StandInZep"):
+        self.zep = zep
+
+    async def get(self, *args, **kwargs):
+        await self.zep._call()
+
+
+class StandInZep:
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.calls = 0
+        self.user = StandInUsers(self)
+        self.memory = StandInThreads(self)
+
+    async def _call(self) -> None:
+        self.calls += 1
+        await asyncio.sleep(self.rtt)
+
+    def expected(self, thread_id: str) -> str:
+        messages = self.memory.threads.get(thread_id, [])[-LAST_N:]
+        return "\n".join(f"{m.role_type.upper()}: {m.content}" for m in messages)
+
+
+async def run(name: str, turns: int, rtt: float, history: HistoryCache) -> None:
+    zep = StandInZep(rtt)
+    memory._zep_client = zep
+    memory.HISTORY = history
+    memory.PROVISIONED.invalidate()
+    # Earlier conversations, from before this process started
+    for t in range(THREADS):
+        zep.memory.threads[f"thread_{t}"] = [
+            SimpleNamespace(role_type="user" if i % 2 == 0 else "assistant", content=f"earlier message {i}")
+            for i in range(30)
+        ]
+    memories = [ConversationMemory(f"user_{t}", f"thread_{t}") for t in range(THREADS)]
+    for m in memories:
+        await m.initialize()
+    zep.calls = 0
+
+    latencies = []
+    for i in range(turns):
+        m = memories[i % THREADS]
+        await m.add_user_message(f"turn {i}: what should we do about pipeline?")
+        await m.add_assistant_message(f"turn {i}: start with ABM on your top 50 accounts.")
+        start = time.perf_counter()
+        context = await m.get_context(LAST_N)
+        latencies.append(time.perf_counter() - start)
+        await memory.MESSAGE_WRITER.flush(m.thread_id)
+        assert context == zep.expected(m.thread_id), (name, i)
+    await memory.MESSAGE_WRITER.close()
+
+    latencies.sort()
+    stats = history.stats()
+    print(
+        f"{name:12s} read p50 {latencies[len(latencies) // 2] * 1e3:7.3f} ms"
+        f"  p99 {latencies[int(len(latencies) * 0.99)] * 1e3:7.3f} ms"
+        f"  Zep calls {zep.calls:5d}  ({stats['hits']} hits, {stats['misses']} misses)"
+    )
+
+
+def footprint(threads: int = 5000, max_bytes: int = 1024 * 1024) -> None:
+    memory._zep_client = None
+    history = HistoryCache(messages_per_thread=50, max_bytes=max_bytes)
+    for t in range(threads):
+        for i in range(20):
+            history.append(f"thread_{t}", "user", f"message {i} " + "x" * 200)
+    stats = history.stats()
+    print(
+        f"footprint: {threads} threads x 20 messages into a {max_bytes // 1024} KiB budget: "
+        f"{stats['threads']} threads, {stats['bytes'] // 1024} KiB held, {stats['evictions']} evicted"
+    )
+
+
+async def main() -> None:
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    rtt = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.03
+
+    await run("Zep (before)", turns, rtt, HistoryCache(messages_per_thread=0))
+    await run("buffered", turns, rtt, HistoryCache())
+    footprint()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
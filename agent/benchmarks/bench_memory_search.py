@@ -0,0 +1,123 @@
+"""Benchmark: memory search through Zep vs the in-process index.
+
+    python benchmarks/bench_memory_search.py [messages] [searches] [rtt_ms]
+
+One thread is filled with a synthetic sales conversation: filler turns
+plus a few messages each search is meant to find. The searches run
+three ways:
+- against a stand-in for Zep's search, with only the rtt_ms round trip,
+  which gives the latency floor of any remote search;
+- MEMORY_INDEX with BM25 alone;
+- MEMORY_INDEX with hashed embeddings blended in.
+For the local runs it reports how often the intended message ranked
+first and in the top 5, and what indexing a message costs.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+import memory  # noqa: E402
+from memory import ConversationMemory  # noqa: E402
+from memory_index import MemoryIndex  # noqa: E402
+
+FILLER = [
+    "Thanks, that makes sense.",
+    "Can you say more about the next steps for the team?",
+    "We have a small marketing team and a couple of SDRs.",
+    "Our sales cycle is usually a few months for larger deals.",
+    "Let me check with my co-founder and come back to you.",
+    "We tried some outbound last year but it didn't really work.",
+    "The board wants to see more pipeline by the end of the quarter.",
+    "I think the product is strong, the go-to-market is the problem.",
+]
+
+# (message planted in the thread, search meant to find it)
+PLANTED = [
+    ("Our annual budget for agencies is about $300k, roughly 25k per month.", "agency budget per month"),
+    ("We sell to CFOs and finance teams at mid-market companies.", "who is the buyer persona"),
+    ("HubSpot is our CRM and we use Clay and Apollo for enrichment.", "which CRM do we use"),
+    ("Competitors are Ramp, Brex and Navan; Ramp wins most deals on price.", "main competitors pricing"),
+    ("We want to expand into the UK and Germany next year.", "expansion markets europe UK"),
+    ("Churn is around 8% annually, mostly small customers.", "customer churn rate"),
+    ("LinkedIn ads have the best cost per opportunity for us so far.", "best paid channel linkedin ads"),
+    ("The pricing page converts at 3% and trials convert at 18%.", "trial conversion"),
+]
+
+
+class StandInSearch:
+    """Zep's memory search with only its round trip: the latency floor of a remote search."""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.memory = self
+
+    async def search(self, thread_id, text=None, limit=5, **kwargs):
+        await asyncio.sleep(self.rtt)
+        return [SimpleNamespace(message=SimpleNamespace(content=text, metadata={}), score=1.0)]
+
+
+def conversation(count: int) -> list[str]:
+    rng = random.Random(5)
+    messages = [f"{rng.choice(FILLER)} (turn {i})" for i in range(count)]
+    for i, (planted, _) in enumerate(PLANTED):
+        messages[(i + 1) * count // (len(PLANTED) + 1)] = planted
+    return messages
+
+
+async def timed(search, searches: int) -> tuple[float, float]:
+    latencies = []
+    for i in range(searches):
+        start = time.perf_counter()
+        await search(PLANTED[i % len(PLANTED)][1])
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies[len(latencies) // 2] * 1e3, latencies[int(len(latencies) * 0.99)] * 1e3
+
+
+async def local(name: str, messages: list[str], searches: int, dimensions: int) -> None:
+    memory._memory_index = MemoryIndex(messages_per_thread=len(messages), dimensions=dimensions)
+    m = ConversationMemory("user_bench", "thread_bench")
+    start = time.perf_counter()
+    for i, content in enumerate(messages):
+        await (m.add_user_message if i % 2 == 0 else m.add_assistant_message)(content)
+    index_us = (time.perf_counter() - start) / len(messages) * 1e6
+
+    top1 = top5 = 0
+    for planted, query in PLANTED:
+        found = [r["content"] for r in await m.search(query, 5)]
+        top1 += bool(found) and found[0] == planted
+        top5 += planted in found
+    p50, p99 = await timed(lambda q: m.search(q, 5), searches)
+    print(
+        f"{name:18s} p50 {p50:8.3f} ms  p99 {p99:8.3f} ms  top-1 {top1}/{len(PLANTED)}  top-5 {top5}/{len(PLANTED)}"
+        f"  ({index_us:.1f} us to write+index a message)"
+    )
+
+
+async def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    searches = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rtt = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.05
+    messages = conversation(count)
+    print(f"thread of {count} messages, {searches} searches")
+
+    zep = StandInSearch(rtt)
+    p50, p99 = await timed(lambda q: zep.search("thread_bench", text=q), searches)
+    print(f"{'Zep (round trip)':18s} p50 {p50:8.3f} ms  p99 {p99:8.3f} ms")
+
+    os.environ.pop("ZEP_API_KEY", None)
+    memory.MEMORY_SEARCH = "local"
+    await local("local BM25", messages, searches, 0)
+    await local("local BM25+vectors", messages, searches, 256)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
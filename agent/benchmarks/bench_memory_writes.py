@@ -0,0 +1,128 @@
+"""Benchmark: turn latency and Zep calls with write-behind message batching.
+
+    python benchmarks/bench_memory_writes.py [turns] [rtt_ms]
+
+Zep is replaced by a stand-in client whose calls take rtt_ms, and which
+counts them. The same conversation runs twice: with each message written
+inline as before (provision the thread, then an add call per message,
+awaited by the turn), and through MESSAGE_WRITER.
+
+Then provisioning: sessions re-created on the same threads (as after
+/reset, or on other requests' agents) and a burst of concurrent ones,
+calling ensure_user/ensure_thread every time as before, against
+ConversationMemory.initialize with the process-wide PROVISIONED cache.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+os.environ["ZEP_API_KEY"] = "benchmark-placeholder"
+
+import agent as agent_module  # noqa: E402
+import memory  # noqa: E402
+from memory import ConversationMemory, add_message, ensure_thread, ensure_user  # noqa: E402
+
+MESSAGES = [
+    "We're a B2B SaaS fintech startup called Ledgerly",
+    "We use HubSpot, Salesforce, Clay, Apollo, Gong and Outreach",
+    "thanks",
+    "Budget is around $25k per month, targeting US and UK enterprise buyers",
+]
+
+
+class StandInZep:
+    """Enough of the Zep client for memory.py, with a fixed round trip per call."""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.calls = 0
+        self.messages = 0
+        self.user = self.memory = self
+
+    async def _call(self) -> None:
+        self.calls += 1
+        await asyncio.sleep(self.rtt)
+
+    async def get(self, *args, **kwargs):
+        await self._call()
+
+    async def add(self, thread_id, messages=None, **kwargs):
+        await self._call()
+        self.messages += len(messages or [])
+
+
+async def inline_add(self, role: str, content: str, metadata=None) -> bool:
+    # What ConversationMemory.add_*_message did before: await it all in the turn
+    if not self._initialized:
+        await self.initialize()
+    return await add_message(self.thread_id, role, content, metadata)
+
+
+async def fixed_search(*args, **kwargs):
+    return []
+
+
+async def run(name: str, turns: int, zep: StandInZep) -> None:
+    memory._zep_client = zep
+    memory.PROVISIONED.invalidate()
+    agents = [agent_module.GTMAgent(user_id=f"user_{i}", thread_id=f"thread_{i}") for i in range(8)]
+    latencies = []
+    for i in range(turns):
+        start = time.perf_counter()
+        await agents[i % len(agents)].process_message(MESSAGES[i % len(MESSAGES)])
+        latencies.append(time.perf_counter() - start)
+    await memory.MESSAGE_WRITER.close()
+    latencies.sort()
+    print(
+        f"{name:22s} turn p50 {latencies[len(latencies) // 2] * 1e3:7.2f} ms"
+        f"  p99 {latencies[int(len(latencies) * 0.99)] * 1e3:7.2f} ms"
+        f"  Zep calls {zep.calls:5d} for {zep.messages} messages"
+    )
+
+
+async def main() -> None:
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    rtt = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.03
+    agent_module.find_agencies = fixed_search
+
+    write_user, write_assistant = ConversationMemory.add_user_message, ConversationMemory.add_assistant_message
+    ConversationMemory.add_user_message = lambda self, content, metadata=None: inline_add(self, "user", content, metadata)
+    ConversationMemory.add_assistant_message = (
+        lambda self, content, metadata=None: inline_add(self, "assistant", content, metadata)
+    )
+    await run("inline (before)", turns, StandInZep(rtt))
+
+    ConversationMemory.add_user_message, ConversationMemory.add_assistant_message = write_user, write_assistant
+    await run("write-behind", turns, StandInZep(rtt))
+    print(memory.MESSAGE_WRITER.stats())
+
+    await provisioning(StandInZep(rtt))
+
+
+async def provisioning(zep: StandInZep, sessions: int = 200, threads: int = 10) -> None:
+    memory._zep_client = zep
+    memories = [ConversationMemory(f"user_{i % threads}", f"thread_{i % threads}") for i in range(sessions)]
+
+    async def before(m: ConversationMemory) -> None:
+        await ensure_user(m.user_id)
+        await ensure_thread(m.thread_id, m.user_id)
+
+    for name, init in (("before", before), ("cached", ConversationMemory.initialize)):
+        memory.PROVISIONED.invalidate()
+        for m in memories:
+            m._initialized = False
+        zep.calls = 0
+        start = time.perf_counter()
+        await asyncio.gather(*(init(m) for m in memories))
+        elapsed = time.perf_counter() - start
+        print(f"provisioning {name:7s} {sessions} sessions on {threads} threads (concurrent): "
+              f"{zep.calls:4d} Zep calls, {elapsed * 1e3:7.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,134 @@
+"""Benchmark: response throughput and latency for /process and /state.
+
+    python benchmarks/bench_responses.py [requests]
+
+Drives the app in-process through httpx's ASGI transport, so the numbers
+are the server's own cost (routing, state updates, serialization) without
+socket overhead. The agency search backend is replaced by a fixed result
+list so runs are repeatable and offline.
+
+It also times encoding alone, the stdlib JSONResponse path against the
+orjson one, for a /process result and for a fresh state version.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+os.environ["SESSION_DB_PATH"] = ""
+os.environ["WARMUP_DELAY_SECONDS"] = "3600"
+
+import httpx  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import agent as agent_module  # noqa: E402
+import server  # noqa: E402
+from encoding import FastJSONResponse  # noqa: E402
+from models import AgencyMatch  # noqa: E402
+
+AGENCIES = [
+    AgencyMatch(
+        id=i + 1,
+        name=f"Agency {i}",
+        slug=f"agency-{i}",
+        description="Full-funnel B2B demand generation and ABM programs for SaaS companies. " * 3,
+        headquarters="London, UK",
+        specializations=["Demand Generation", "ABM", "Content Marketing", "Paid Media"],
+        match_score=95 - i,
+        match_reasons=["Specializes in Demand Generation", "Serves North America", "Within budget"],
+    )
+    for i in range(5)
+]
+
+MESSAGES = [
+    "We're a B2B SaaS fintech startup called Ledgerly",
+    "We use HubSpot, Salesforce, Clay, Apollo, Gong and Outreach",
+    "Budget is around $25k per month, targeting US and UK enterprise buyers",
+    "We need demand gen, ABM and content help",
+]
+
+
+async def fixed_search(*args, **kwargs) -> list[AgencyMatch]:
+    return AGENCIES
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run(client: httpx.AsyncClient, name: str, requests: int, send) -> None:
+    latencies = []
+    total_bytes = 0
+    await send(0)  # warm up
+    start = time.perf_counter()
+    for i in range(requests):
+        t0 = time.perf_counter()
+        response = await send(i)
+        latencies.append(time.perf_counter() - t0)
+        total_bytes += len(response.content)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:8s} {requests / elapsed:9.0f} req/s {total_bytes / elapsed / 1e6:8.2f} MB/s"
+        f"  p50 {percentile(latencies, 0.50) * 1e6:7.0f} us  p99 {percentile(latencies, 0.99) * 1e6:7.0f} us"
+        f"  ({total_bytes // requests} B/response)"
+    )
+
+
+def per_call_us(fn, iterations: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def encode_only(session, result: dict, iterations: int) -> None:
+    state = session.state
+
+    def state_before():
+        # What /state did per request before: model_dump everything, stdlib JSON
+        JSONResponse(state.model_dump(exclude={"version"}))
+
+    def state_after():
+        session._view = None  # as for a new version
+        session.state_json()
+
+    rows = [
+        ("/process result", lambda: JSONResponse(result), lambda: FastJSONResponse(result)),
+        ("state, new version", state_before, state_after),
+    ]
+    for name, before, after in rows:
+        before_us, after_us = per_call_us(before, iterations), per_call_us(after, iterations)
+        print(f"encode {name:20s} stdlib {before_us:7.1f} us  orjson {after_us:7.1f} us  ({before_us / after_us:.1f}x)")
+
+
+async def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    agent_module.find_agencies = fixed_search
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # One long-lived session with tools, industry data and agencies
+        for message in MESSAGES:
+            await client.post("/process", json={"message": message, "thread_id": "bench"})
+
+        async def process(i: int) -> httpx.Response:
+            return await client.post("/process", json={"message": MESSAGES[i % len(MESSAGES)], "thread_id": "bench"})
+
+        async def state(i: int) -> httpx.Response:
+            return await client.get("/state", headers={"x-thread-id": "bench"})
+
+        await run(client, "/process", requests, process)
+        await run(client, "/state", requests, state)
+
+        result = (await process(0)).json()
+        encode_only(await server.sessions.get("bench"), result, requests)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
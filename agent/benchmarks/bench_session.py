@@ -0,0 +1,54 @@
+"""Micro-benchmark: what it costs to create a session.
+
+    python benchmarks/bench_session.py [iterations]
+
+Times GTMAgent construction (what the session registry does for every new
+conversation) against building a pydantic-ai Agent with its model client,
+which every GTMAgent used to do.
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from agent import SYSTEM_PROMPT, GTMAgent, get_llm_agent  # noqa: E402
+
+
+def per_call_us(fn, iterations: int) -> float:
+    """Mean wall time of fn() in microseconds."""
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+
+    def new_session():
+        GTMAgent(user_id="user_bench", thread_id="thread_bench")
+
+    def new_llm_agent():
+        from pydantic_ai import Agent
+        Agent("google-gla:gemini-2.0-flash", system_prompt=SYSTEM_PROMPT)
+
+    start = time.perf_counter()
+    get_llm_agent()
+    shared_ms = (time.perf_counter() - start) * 1e3
+
+    session_us = per_call_us(new_session, iterations)
+    llm_us = per_call_us(new_llm_agent, max(1, iterations // 1000))
+
+    print(f"GTMAgent() per session:        {session_us:10.1f} us  ({iterations} runs)")
+    print(f"pydantic-ai Agent per session: {llm_us:10.1f} us  (previous per-session cost)")
+    print(f"shared LLM agent, built once:  {shared_ms:10.1f} ms")
+    print(f"speed-up:                      {llm_us / session_us:10.0f}x")
+
+
+if __name__ == "__main__":
+    main()
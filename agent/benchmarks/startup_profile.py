@@ -0,0 +1,94 @@
+"""Startup profile: import cost of the server and time-to-healthy.
+
+    python benchmarks/startup_profile.py [runs]
+
+Runs `python -X importtime -c "import server"` and lists the heaviest
+top-level imports, then starts uvicorn the way Railway does and times how
+long it takes until /health answers.
+"""
+
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+AGENT_DIR = Path(__file__).parent.parent
+PORT = int(os.getenv("PROFILE_PORT", "8765"))
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _env() -> dict:
+    env = dict(os.environ, SESSION_DB_PATH="")
+    env.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+    return env
+
+
+def import_profile(top: int = 12) -> tuple[float, list[tuple[float, str]]]:
+    """`import server` time (ms) and its heaviest direct imports."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=AGENT_DIR,
+        env=_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # A module's line comes after those of the modules it imported, and
+    # nesting is shown by indentation (1 space top level, then 2 per level)
+    children: list[tuple[float, str]] = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative_ms = int(match.group(2)) / 1000
+        depth = len(match.group(3))
+        if depth == 3:
+            children.append((cumulative_ms, match.group(4)))
+        elif depth == 1:
+            if match.group(4) == "server":
+                return cumulative_ms, sorted(children, reverse=True)[:top]
+            children = []
+    raise RuntimeError("server import not found in -X importtime output")
+
+
+def time_to_healthy(timeout: float = 30.0) -> float:
+    """Seconds from launching uvicorn until /health returns 200."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(PORT), "--log-level", "warning"],
+        cwd=AGENT_DIR,
+        env=_env(),
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{PORT}/health", timeout=0.5).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+        raise TimeoutError(f"/health not ready after {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main() -> None:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    total, heaviest = import_profile()
+    print(f"import server: {total:8.1f} ms")
+    for ms, module in heaviest:
+        print(f"  {ms:8.1f} ms  {module}")
+
+    timings = sorted(time_to_healthy() for _ in range(runs))
+    print(f"time to healthy: {timings[len(timings) // 2] * 1000:8.1f} ms  (median of {runs})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Multi-worker mode - several server processes behind a sticky router.
+
+    python cluster.py
+
+Starts CLUSTER_WORKERS server workers (default: one per CPU) on ports
+WORKER_BASE_PORT+1.. and a small proxy on PORT. Every worker runs with
+SESSION_SHARED=1 against the same SQLite session store, so state is safe
+whichever worker serves a request. The proxy hashes each request's thread
+id to pick a worker, so a conversation normally stays on one worker and its
+session stays warm in that worker's memory.
+"""
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import zlib
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+AGENT_DIR = Path(__file__).parent
+
+# Hop-by-hop headers that must not be forwarded
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "te", "trailer", "upgrade", "host", "content-length"}
+
+
+def thread_id_for(headers, query_params, body: bytes, cookies=None) -> Optional[str]:
+    """Find the thread id the same way server.py does: header, query, JSON body, then the thread cookie."""
+    thread_id = headers.get("x-thread-id") or query_params.get("thread_id") or query_params.get("custom_session_id")
+    if thread_id:
+        return thread_id
+    if body:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            thread_id = data.get("thread_id") or data.get("threadId")
+            if thread_id:
+                return thread_id
+    return (cookies or {}).get("gtm_thread_id")
+
+
+def pick_worker(thread_id: Optional[str], count: int) -> int:
+    """Stable worker index for a thread id (requests without one go to worker 0)."""
+    if not thread_id:
+        return 0
+    return zlib.crc32(thread_id.encode()) % count
+
+
+def start_workers(count: int, base_port: int) -> list[subprocess.Popen]:
+    """Start the server workers, all sharing one session store."""
+    env = dict(os.environ, SESSION_SHARED="1")
+    env.setdefault("SESSION_DB_PATH", str(AGENT_DIR / "sessions.db"))
+    return [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(base_port + i + 1)],
+            cwd=AGENT_DIR,
+            env=env,
+        )
+        for i in range(count)
+    ]
+
+
+def create_router(worker_urls: list[str]) -> FastAPI:
+    """Build the sticky proxy app."""
+    client: Optional[httpx.AsyncClient] = None
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        nonlocal client
+        client = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=5.0))
+        yield
+        await client.aclose()
+
+    router = FastAPI(title="GTM Agent router", lifespan=lifespan)
+
+    @router.get("/health")
+    async def health():
+        """Router health check (ready before the workers are)."""
+        return {"status": "healthy", "agent": "gtm", "workers": len(worker_urls)}
+
+    @router.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
+    async def forward(path: str, request: Request):
+        """Forward a request to the worker that owns its thread."""
+        body = await request.body()
+        index = pick_worker(thread_id_for(request.headers, request.query_params, body, request.cookies), len(worker_urls))
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+        upstream = client.build_request(
+            request.method,
+            f"{worker_urls[index]}/{path}",
+            params=request.query_params,
+            headers=headers,
+            content=body,
+        )
+        try:
+            response = await client.send(upstream, stream=True)
+        except httpx.HTTPError as e:
+            return JSONResponse({"error": f"Worker {index} unavailable: {e}"}, status_code=502)
+
+        return StreamingResponse(
+            response.aiter_raw(),
+            status_code=response.status_code,
+            headers={k: v for k, v in response.headers.items() if k.lower() not in HOP_HEADERS},
+            background=BackgroundTask(response.aclose),
+        )
+
+    return router
+
+
+def main() -> None:
+    count = int(os.getenv("CLUSTER_WORKERS", str(os.cpu_count() or 1)))
+    port = int(os.getenv("PORT", "8000"))
+    base_port = int(os.getenv("WORKER_BASE_PORT", str(port + 100)))
+
+    workers = start_workers(count, base_port)
+    try:
+        router = create_router([f"http://127.0.0.1:{base_port + i + 1}" for i in range(count)])
+        uvicorn.run(router, host="0.0.0.0", port=port)
+    finally:
+        for worker in workers:
+            worker.send_signal(signal.SIGTERM)
+        for worker in workers:
+            worker.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Fast JSON encoding for responses and event streams (orjson)."""
+
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+# Same output as JSONResponse (compact, UTF-8), plus non-str dict keys
+OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content as compact JSON bytes.
+
+    Values that are already encoded can be embedded as orjson.Fragment.
+    """
+    return orjson.dumps(content, option=OPTIONS)
+
+
+def sse_event(event: Any) -> bytes:
+    """Encode one server-sent event carrying event as JSON."""
+    return b"data: " + orjson.dumps(event, option=OPTIONS) + b"\n\n"
+
+
+SSE_DONE = b"data: [DONE]\n\n"
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=OPTIONS)
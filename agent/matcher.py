@@ -0,0 +1,171 @@
+"""Single-pass keyword matching for message extraction.
+
+A small Aho-Corasick automaton over lowercased text. Every keyword carries a
+(category, label) tag so one scan of a message returns hits for all keyword
+tables at once. Matches must sit on word boundaries, so "us" does not match
+inside "business".
+"""
+
+from typing import Iterable, NamedTuple, Optional
+
+
+class KeywordHit(NamedTuple):
+    """A keyword found in the scanned text."""
+    category: str
+    label: str
+    keyword: str
+    start: int
+    end: int
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def group_hits(hits: Iterable[KeywordHit], into: Optional[dict] = None) -> dict[str, set[str]]:
+    """Group hit labels by category, optionally adding to an existing grouping."""
+    found: dict[str, set[str]] = {} if into is None else into
+    for hit in hits:
+        found.setdefault(hit.category, set()).add(hit.label)
+    return found
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton built once from (keyword, category, label) entries."""
+
+    def __init__(self, entries: Iterable[tuple[str, str, str]]):
+        # Node 0 is the root. Each node has a goto table, a failure link and
+        # the ids of the patterns that end there (including via failure links).
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[tuple[int, ...]] = [()]
+        self._patterns: list[tuple[str, str, str]] = []
+
+        seen = set()
+        for keyword, category, label in entries:
+            keyword = keyword.lower().strip()
+            if not keyword or (keyword, category, label) in seen:
+                continue
+            seen.add((keyword, category, label))
+            self._add(keyword, len(self._patterns))
+            self._patterns.append((keyword, category, label))
+
+        self._max_len = max((len(p[0]) for p in self._patterns), default=0)
+        self._build_failure_links()
+
+    def _add(self, keyword: str, pattern_id: int) -> None:
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+        self._out[node] = self._out[node] + (pattern_id,)
+
+    def _build_failure_links(self) -> None:
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def find_all(self, text: str) -> list[KeywordHit]:
+        """Return every word-bounded keyword hit in text, in order of end position."""
+        stream = KeywordStream(self)
+        return stream.feed(text, final=True)
+
+    def scan(self, text: str) -> dict[str, set[str]]:
+        """Return the labels hit in text, grouped by category."""
+        return group_hits(self.find_all(text))
+
+
+class KeywordStream:
+    """Scan state for text that arrives in chunks.
+
+    The automaton node, a short tail of already-seen text and any hits that
+    end exactly at the chunk edge are carried between calls, so keywords
+    split across chunks are still found and each call only costs the size
+    of the new chunk.
+    """
+
+    def __init__(self, matcher: KeywordMatcher):
+        self._matcher = matcher
+        self._node = 0
+        self._tail = ""
+        self._pending: list[int] = []
+        self.offset = 0
+
+    def feed(self, chunk: str, final: bool = False) -> list[KeywordHit]:
+        """Scan the next chunk and return the hits it completes.
+
+        A hit that ends at the end of the chunk is held back until the next
+        character shows whether it sits on a word boundary. With final=True
+        the end of the chunk counts as a boundary and held hits are returned.
+        The scan state is kept either way, so more text can still follow.
+        """
+        matcher = self._matcher
+        goto, fail, out = matcher._goto, matcher._fail, matcher._out
+        lowered = chunk.lower()
+        base = self.offset
+        # Text before this chunk, for start-of-keyword boundary checks
+        window = self._tail + lowered
+        window_start = base - len(self._tail)
+        hits = []
+
+        if self._pending and lowered:
+            if not _is_word_char(lowered[0]):
+                hits.extend(self._hits_at(self._pending, base, window, window_start))
+            self._pending = []
+
+        node = self._node
+        size = len(lowered)
+        for i, ch in enumerate(lowered):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if not out[node]:
+                continue
+            if i + 1 < size:
+                if _is_word_char(lowered[i + 1]):
+                    continue
+                hits.extend(self._hits_at(out[node], base + i + 1, window, window_start))
+            else:
+                self._pending = list(out[node])
+        self._node = node
+
+        self.offset = base + size
+        keep = matcher._max_len + 1
+        self._tail = window[-keep:] if keep else ""
+
+        if final and self._pending:
+            hits.extend(self._hits_at(self._pending, self.offset, window, window_start))
+            self._pending = []
+        return hits
+
+    def _hits_at(self, pattern_ids, end: int, window: str, window_start: int) -> list[KeywordHit]:
+        """Build the word-bounded hits for patterns ending at offset end."""
+        patterns = self._matcher._patterns
+        hits = []
+        for pattern_id in pattern_ids:
+            keyword, category, label = patterns[pattern_id]
+            start = end - len(keyword)
+            before = start - 1 - window_start
+            if before >= 0 and _is_word_char(window[before]):
+                continue
+            hits.append(KeywordHit(category, label, keyword, start, end))
+        return hits
@@ -1,16 +1,28 @@
 """Zep memory integration for GTM Agent."""
 
+import asyncio
 import os
-from typing import Optional
-from zep_cloud.client import Zep
-from zep_cloud.types import Message as ZepMessage
+import time
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Optional
+
+from search_cache import SearchCache
+
+if TYPE_CHECKING:
+    from zep_cloud.client import AsyncZep
+
+    from memory_index import MemoryIndex
 
 # Initialize Zep client (requires ZEP_API_KEY env var)
-_zep_client: Optional[Zep] = None
+_zep_client: Optional["AsyncZep"] = None
 
 
-def get_zep_client() -> Optional[Zep]:
-    """Get the Zep client, initializing if needed."""
+def get_zep_client() -> Optional["AsyncZep"]:
+    """Get the async Zep client, initializing if needed.
+
+    zep_cloud is imported on first use, so it costs nothing without a key.
+    Its calls are awaited on the event loop, never blocking it.
+    """
     global _zep_client
 
     api_key = os.getenv("ZEP_API_KEY")
@@ -18,7 +30,9 @@ def get_zep_client() -> Optional[Zep]:
         return None
 
     if _zep_client is None:
-        _zep_client = Zep(api_key=api_key)
+        from zep_cloud.client import AsyncZep
+
+        _zep_client = AsyncZep(api_key=api_key)
 
     return _zep_client
 
@@ -31,12 +45,12 @@ async def ensure_user(user_id: str) -> bool:
 
     try:
         # Try to get the user first
-        await client.user.get_async(user_id)
+        await client.user.get(user_id)
         return True
     except Exception:
         # Create the user if they don't exist
         try:
-            await client.user.add_async(user_id=user_id)
+            await client.user.add(user_id=user_id)
             return True
         except Exception as e:
             print(f"Error creating Zep user: {e}")
@@ -51,19 +65,74 @@ async def ensure_thread(thread_id: str, user_id: str) -> bool:
 
     try:
         # Try to get the thread first
-        await client.memory.get_async(thread_id)
-        return True
+        memory = await client.memory.get(thread_id)
     except Exception:
         # Create the thread if it doesn't exist
         try:
-            await client.memory.add_session_async(
+            await client.memory.add_session(
                 session_id=thread_id,
                 user_id=user_id
             )
+            # Every message it will have is written here
+            _mark_complete(thread_id)
             return True
         except Exception as e:
             print(f"Error creating Zep thread: {e}")
             return False
+    if not (memory and memory.messages):
+        # Empty so far: nothing to load before serving history from here
+        _mark_complete(thread_id)
+    return True
+
+
+def _mark_complete(thread_id: str) -> None:
+    """Note that this process writes everything the thread holds, for the history buffer and local search."""
+    HISTORY.mark_complete(thread_id)
+    if local_search_enabled():
+        get_memory_index().mark_complete(thread_id)
+
+
+class ProvisioningFailed(Exception):
+    """A Zep user or thread could not be found or created."""
+
+
+# Users and threads known to exist, so each is provisioned at most once per
+# process (ZEP_PROVISION_MAX_ENTRIES ids kept; concurrent requests for one
+# id share a single attempt, and failures aren't kept)
+PROVISIONED: SearchCache[bool] = SearchCache(
+    max_entries=int(os.getenv("ZEP_PROVISION_MAX_ENTRIES", "100000")), ttl_seconds=float("inf"),
+)
+
+# At most this many provisioning round trips at once (ZEP_PROVISION_CONCURRENCY)
+_provision_limit = asyncio.Semaphore(int(os.getenv("ZEP_PROVISION_CONCURRENCY", "8")))
+
+
+async def provision(key: tuple, ensure) -> bool:
+    """Run ensure() (ensure_user / ensure_thread) for key unless it already succeeded here."""
+    async def attempt() -> bool:
+        async with _provision_limit:
+            if not await ensure():
+                raise ProvisioningFailed(key)
+        return True
+
+    try:
+        return await PROVISIONED.get_or_fetch(key, attempt)
+    except ProvisioningFailed:
+        return False
+
+
+def _zep_messages(messages: list[dict]) -> list:
+    from zep_cloud.types import Message as ZepMessage
+
+    return [ZepMessage(role_type=m["role"], content=m["content"], metadata=m["metadata"]) for m in messages]
+
+
+async def add_messages(thread_id: str, messages: list[dict]) -> None:
+    """Add messages ({"role", "content", "metadata"}) to a thread in one call; raises on failure."""
+    client = get_zep_client()
+    if not client:
+        return
+    await client.memory.add(thread_id, messages=_zep_messages(messages))
 
 
 async def add_message(
@@ -73,45 +142,442 @@ async def add_message(
     metadata: Optional[dict] = None
 ) -> bool:
     """Add a message to Zep memory."""
-    client = get_zep_client()
-    if not client:
+    if not get_zep_client():
         return False
 
     try:
-        message = ZepMessage(
-            role_type=role,
-            content=content,
-            metadata=metadata or {}
-        )
-        await client.memory.add_async(thread_id, messages=[message])
+        await add_messages(thread_id, [{"role": role, "content": content, "metadata": metadata or {}}])
         return True
     except Exception as e:
         print(f"Error adding message to Zep: {e}")
         return False
 
 
-async def get_memory_context(thread_id: str, last_n: int = 10) -> str:
-    """Get conversation context from Zep memory."""
+class MessageWriter:
+    """Write-behind queue for Zep messages.
+
+    Messages are queued per thread and sent in batches, one add call per
+    thread, by a background task: when a thread has max_batch messages
+    waiting, else every flush_seconds. A failed batch is retried with
+    exponential backoff (dropped after max_retries), and close() sends
+    whatever is left. Threads are provisioned (ConversationMemory.initialize)
+    before their first batch.
+    """
+
+    def __init__(
+        self,
+        max_batch: int = 20,
+        flush_seconds: float = 0.5,
+        max_retries: int = 5,
+        backoff_seconds: float = 0.5,
+        max_pending: int = 10000,
+    ):
+        self.max_batch = max_batch
+        self.flush_seconds = flush_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_pending = max_pending
+        # thread id -> [owning ConversationMemory, queued messages, failed attempts, retry after,
+        # how many of the queued messages (from the front) are in a call to Zep]
+        self._threads: dict[str, list] = {}
+        self._pending = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.queued = 0
+        self.sent = 0
+        self.batches = 0
+        self.retries = 0
+        self.dropped = 0
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "MessageWriter":
+        """Build a writer set by <prefix>_BATCH / _FLUSH_SECONDS / _RETRIES / _BACKOFF_SECONDS / _MAX_PENDING."""
+        return cls(
+            max_batch=int(os.getenv(f"{prefix}_BATCH", "20")),
+            flush_seconds=float(os.getenv(f"{prefix}_FLUSH_SECONDS", "0.5")),
+            max_retries=int(os.getenv(f"{prefix}_RETRIES", "5")),
+            backoff_seconds=float(os.getenv(f"{prefix}_BACKOFF_SECONDS", "0.5")),
+            max_pending=int(os.getenv(f"{prefix}_MAX_PENDING", "10000")),
+        )
+
+    def enqueue(self, memory: "ConversationMemory", role: str, content: str, metadata: Optional[dict]) -> None:
+        """Queue a message for memory's thread; it is sent in the background."""
+        if self._task is None or self._task.done() or self._task.get_loop() is not asyncio.get_running_loop():
+            self._wake = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.ensure_future(self._run())
+
+        entry = self._threads.get(memory.thread_id)
+        if entry is None:
+            entry = self._threads[memory.thread_id] = [memory, [], 0, 0.0, 0]
+        entry[1].append({"role": role, "content": content, "metadata": metadata or {}})
+        self.queued += 1
+        self._pending += 1
+        if self._pending > self.max_pending:
+            self._drop_oldest()
+        if len(entry[1]) >= self.max_batch:
+            self._wake.set()
+
+    def pending(self, thread_id: str) -> int:
+        """How many of the thread's messages are queued but not yet in Zep."""
+        entry = self._threads.get(thread_id)
+        return len(entry[1]) if entry is not None else 0
+
+    def discard(self, thread_id: str) -> int:
+        """Drop the thread's queued messages (e.g. on /reset); a batch being sent still goes."""
+        entry = self._threads.get(thread_id)
+        if entry is None:
+            return 0
+        count = len(entry[1]) - entry[4]
+        del entry[1][entry[4]:]
+        self._pending -= count
+        if not entry[1]:
+            del self._threads[thread_id]
+        return count
+
+    def _drop_oldest(self) -> None:
+        # Zep has been unreachable for a while: shed the thread with the most
+        # backlog, oldest first, but never a message in a call being made
+        entry = max(self._threads.values(), key=lambda e: len(e[1]) - e[4])
+        if len(entry[1]) == entry[4]:
+            return
+        entry[1].pop(entry[4])
+        self._pending -= 1
+        self.dropped += 1
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self, thread_id: Optional[str] = None, force: bool = False) -> None:
+        """Send the queued messages of one thread, or of all of them.
+
+        Threads waiting out a retry backoff are skipped unless force.
+        """
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            now = time.monotonic()
+            ids = [thread_id] if thread_id is not None else list(self._threads)
+            await asyncio.gather(*(
+                self._send(tid) for tid in ids
+                if tid in self._threads and (force or self._threads[tid][3] <= now)
+            ))
+
+    async def _send(self, thread_id: str) -> None:
+        entry = self._threads[thread_id]
+        memory, messages = entry[0], entry[1]
+        while messages:
+            batch = messages[:self.max_batch]
+            entry[4] = len(batch)
+            try:
+                if not await memory.initialize():
+                    raise RuntimeError("thread not provisioned")
+                await add_messages(thread_id, batch)
+            except Exception as e:
+                entry[4] = 0
+                entry[2] += 1
+                if entry[2] > self.max_retries:
+                    print(f"Error adding messages to Zep, dropping {len(messages)}: {e}")
+                    self.dropped += len(messages)
+                    self._pending -= len(messages)
+                    del self._threads[thread_id]
+                else:
+                    self.retries += 1
+                    entry[3] = time.monotonic() + self.backoff_seconds * 2 ** (entry[2] - 1)
+                return
+            # Messages queued during the call were appended behind the batch,
+            # and overflow drops skip it, so the batch is still the front
+            del messages[:len(batch)]
+            entry[4] = 0
+            self._pending -= len(batch)
+            self.sent += len(batch)
+            self.batches += 1
+            entry[2], entry[3] = 0, 0.0
+        if self._threads.get(thread_id) is entry and not entry[1]:
+            del self._threads[thread_id]
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Stop the background task and send what is still queued (one attempt, within timeout)."""
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await asyncio.wait_for(self.flush(force=True), timeout)
+        except asyncio.TimeoutError:
+            pass
+        if self._pending:
+            print(f"Zep writer closed with {self._pending} messages unsent")
+
+    def stats(self) -> dict:
+        """Counters and current backlog."""
+        return {
+            "pending": self._pending,
+            "threads": len(self._threads),
+            "queued": self.queued,
+            "sent": self.sent,
+            "batches": self.batches,
+            "messages_per_batch": round(self.sent / self.batches, 2) if self.batches else 0.0,
+            "retries": self.retries,
+            "dropped": self.dropped,
+        }
+
+
+# Message writes go through one write-behind queue (ZEP_WRITE_* variables)
+MESSAGE_WRITER = MessageWriter.from_env("ZEP_WRITE")
+
+
+def _context_line(role: Optional[str], content: str) -> str:
+    return f"{role.upper() if role else 'UNKNOWN'}: {content}"
+
+
+async def fetch_messages(thread_id: str, last_n: int = 10) -> Optional[list]:
+    """The thread's last_n messages from Zep, oldest first (None on error)."""
     client = get_zep_client()
     if not client:
-        return ""
+        return []
 
     try:
-        memory = await client.memory.get_async(thread_id, lastn=last_n)
+        memory = await client.memory.get(thread_id, lastn=last_n)
+        return list(memory.messages or []) if memory else []
+    except Exception as e:
+        print(f"Error getting Zep memory: {e}")
+        return None
 
-        if not memory or not memory.messages:
-            return ""
 
-        # Format messages as context
-        context_parts = []
-        for msg in memory.messages:
-            role = msg.role_type.upper() if msg.role_type else "UNKNOWN"
-            context_parts.append(f"{role}: {msg.content}")
+async def fetch_context_lines(thread_id: str, last_n: int = 10) -> Optional[list[str]]:
+    """The thread's last_n messages from Zep, formatted as context lines (None on error)."""
+    messages = await fetch_messages(thread_id, last_n)
+    if messages is None:
+        return None
+    return [_context_line(msg.role_type, msg.content) for msg in messages]
+
+
+class _History:
+    __slots__ = ("lines", "bytes", "complete", "appends")
+
+    def __init__(self, size: int, complete: bool):
+        self.lines: deque[str] = deque(maxlen=size)
+        self.bytes = 0
+        # Whether lines are the thread's true tail (not just what was written here)
+        self.complete = complete
+        self.appends = 0
+
+
+class HistoryCache:
+    """The most recent messages of each thread, held in-process for history reads.
+
+    Each thread keeps a ring buffer of its last messages_per_thread
+    messages as formatted context lines, filled as messages are written.
+    A thread this process didn't start is loaded from Zep on its first
+    read (a cold miss); after that, reads are served locally. Threads are
+    evicted least recently used first to stay within max_bytes and
+    max_threads.
+    """
+
+    # Rough per-line cost beyond its characters (str object, deque slot)
+    LINE_OVERHEAD = 64
+
+    def __init__(self, messages_per_thread: int = 50, max_threads: int = 10000, max_bytes: int = 32 * 1024 * 1024):
+        self.messages_per_thread = messages_per_thread
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self._threads: "OrderedDict[str, _History]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "HistoryCache":
+        """Build a cache sized by <prefix>_MESSAGES (0 disables it) / _MAX_THREADS / _MAX_BYTES."""
+        return cls(
+            messages_per_thread=int(os.getenv(f"{prefix}_MESSAGES", "50")),
+            max_threads=int(os.getenv(f"{prefix}_MAX_THREADS", "10000")),
+            max_bytes=int(os.getenv(f"{prefix}_MAX_BYTES", str(32 * 1024 * 1024))),
+        )
+
+    def _line_bytes(self, line: str) -> int:
+        return len(line) + self.LINE_OVERHEAD
+
+    def append(self, thread_id: str, role: str, content: str) -> None:
+        """Record a message written to the thread."""
+        if self.messages_per_thread <= 0:
+            return
+        entry = self._threads.get(thread_id)
+        if entry is None:
+            # Without Zep this process holds the whole conversation
+            entry = self._threads[thread_id] = _History(self.messages_per_thread, get_zep_client() is None)
+        else:
+            self._threads.move_to_end(thread_id)
+        if len(entry.lines) == entry.lines.maxlen:
+            self._add_bytes(entry, -self._line_bytes(entry.lines[0]))
+        line = _context_line(role, content)
+        entry.lines.append(line)
+        entry.appends += 1
+        self._add_bytes(entry, self._line_bytes(line))
+        self._evict()
+
+    def recent(self, thread_id: str, last_n: int) -> Optional[list[str]]:
+        """The thread's last_n context lines, or None if they have to come from Zep."""
+        entry = self._threads.get(thread_id)
+        if entry is None or not entry.complete or last_n > self.messages_per_thread:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._threads.move_to_end(thread_id)
+        lines = entry.lines
+        return list(lines) if last_n >= len(lines) else [lines[i] for i in range(len(lines) - last_n, len(lines))]
+
+    async def load(self, thread_id: str, last_n: int) -> Optional[list[str]]:
+        """Fill the thread's buffer from Zep (a cold miss) and return its last_n lines."""
+        before = self._threads.get(thread_id)
+        appends = before.appends if before is not None else 0
+        lines = await fetch_context_lines(thread_id, max(last_n, self.messages_per_thread))
+        if lines is None:
+            return None
+
+        entry = self._threads.get(thread_id)
+        # Messages written while Zep was answering, or still queued for it,
+        # may be missing from its answer, and a reset meanwhile makes it
+        # stale, so only a load without any of those is kept
+        if (
+            self.messages_per_thread > 0
+            and entry is before
+            and (entry.appends if entry is not None else 0) == appends
+            and not MESSAGE_WRITER.pending(thread_id)
+        ):
+            if entry is None:
+                entry = self._threads[thread_id] = _History(self.messages_per_thread, True)
+            self._add_bytes(entry, -entry.bytes)
+            entry.lines.clear()
+            entry.lines.extend(lines)
+            self._add_bytes(entry, sum(self._line_bytes(line) for line in entry.lines))
+            entry.complete = True
+            self._threads.move_to_end(thread_id)
+            self._evict()
+        return lines[-last_n:] if last_n else []
+
+    def mark_complete(self, thread_id: str) -> None:
+        """Note that the thread holds nothing beyond what was appended here (e.g. Zep just created it)."""
+        if self.messages_per_thread <= 0:
+            return
+        entry = self._threads.get(thread_id)
+        if entry is None:
+            self._threads[thread_id] = _History(self.messages_per_thread, True)
+            self._evict()
+        else:
+            entry.complete = True
+
+    def reset(self, thread_id: str) -> None:
+        """Start the thread's history over (e.g. on /reset): empty, and served from here.
+
+        The Zep thread keeps its messages; they come back only if the
+        buffer is evicted and reloaded.
+        """
+        entry = self._threads.pop(thread_id, None)
+        if entry is not None:
+            self.total_bytes -= entry.bytes
+        if self.messages_per_thread > 0:
+            self._threads[thread_id] = _History(self.messages_per_thread, True)
+            self._evict()
+
+    def _add_bytes(self, entry: _History, delta: int) -> None:
+        entry.bytes += delta
+        self.total_bytes += delta
+
+    def _evict(self) -> None:
+        while len(self._threads) > 1 and (
+            len(self._threads) > self.max_threads or self.total_bytes > self.max_bytes
+        ):
+            _, entry = self._threads.popitem(last=False)
+            self.total_bytes -= entry.bytes
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Counters and current usage."""
+        reads = self.hits + self.misses
+        return {
+            "threads": len(self._threads),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / reads, 4) if reads else 0.0,
+            "evictions": self.evictions,
+            "messages_per_thread": self.messages_per_thread,
+            "max_threads": self.max_threads,
+            "max_bytes": self.max_bytes,
+        }
+
+
+# Recent messages per thread for history reads (ZEP_HISTORY_* variables)
+HISTORY = HistoryCache.from_env("ZEP_HISTORY")
+
+
+async def _load_memory_context(thread_id: str, last_n: int) -> str:
+    # Read our own writes: send this thread's queued messages first
+    await MESSAGE_WRITER.flush(thread_id)
+    return "\n".join(await HISTORY.load(thread_id, last_n) or [])
+
+
+async def get_memory_context(thread_id: str, last_n: int = 10) -> str:
+    """Get conversation context: from HISTORY, or from Zep memory on a cold miss."""
+    lines = HISTORY.recent(thread_id, last_n)
+    if lines is None:
+        return await _load_memory_context(thread_id, last_n)
+    return "\n".join(lines)
 
-        return "\n".join(context_parts)
-    except Exception as e:
-        print(f"Error getting Zep memory: {e}")
-        return ""
+
+# Where search_memory looks: "zep" (Zep's search), "local" (MEMORY_INDEX), or
+# "auto" (local when Zep isn't configured)
+MEMORY_SEARCH = os.getenv("MEMORY_SEARCH", "auto").lower()
+
+_memory_index: Optional["MemoryIndex"] = None
+
+
+def local_search_enabled() -> bool:
+    """Whether memory searches are answered by the in-process index."""
+    return MEMORY_SEARCH == "local" or (MEMORY_SEARCH == "auto" and get_zep_client() is None)
+
+
+def get_memory_index() -> "MemoryIndex":
+    """The in-process memory index (MEMORY_INDEX_* variables), created on first use."""
+    global _memory_index
+
+    if _memory_index is None:
+        from memory_index import MemoryIndex
+
+        _memory_index = MemoryIndex.from_env("MEMORY_INDEX")
+    return _memory_index
+
+
+async def search_local(thread_id: str, query: str, limit: int = 5) -> list[dict]:
+    """Search the thread in MEMORY_INDEX, first indexing its tail from Zep if this process didn't write it all."""
+    index = get_memory_index()
+    thread = index.thread(thread_id)
+    if get_zep_client() and (thread is None or not thread.complete):
+        # Read our own writes: send this thread's queued messages first
+        await MESSAGE_WRITER.flush(thread_id)
+        before = thread
+        appends = thread.appends if thread is not None else 0
+        messages = await fetch_messages(thread_id, index.messages_per_thread)
+        thread = index.thread(thread_id)
+        # As HistoryCache.load: keep the tail only if nothing was written or reset meanwhile
+        if (
+            messages is not None
+            and thread is before
+            and (thread.appends if thread is not None else 0) == appends
+            and not MESSAGE_WRITER.pending(thread_id)
+        ):
+            index.replace(thread_id, [(msg.content, msg.metadata or {}) for msg in messages])
+    return index.search(thread_id, query, limit)
 
 
 async def search_memory(
@@ -119,13 +585,16 @@ async def search_memory(
     query: str,
     limit: int = 5
 ) -> list[dict]:
-    """Search through conversation memory."""
+    """Search through conversation memory (see MEMORY_SEARCH)."""
+    if local_search_enabled():
+        return await search_local(thread_id, query, limit)
+
     client = get_zep_client()
     if not client:
         return []
 
     try:
-        results = await client.memory.search_async(
+        results = await client.memory.search(
             thread_id,
             text=query,
             limit=limit
@@ -157,11 +626,11 @@ class ConversationMemory:
         if self._initialized:
             return True
 
-        user_ok = await ensure_user(self.user_id)
+        user_ok = await provision(("user", self.user_id), lambda: ensure_user(self.user_id))
         if not user_ok:
             return False
 
-        thread_ok = await ensure_thread(self.thread_id, self.user_id)
+        thread_ok = await provision(("thread", self.thread_id), lambda: ensure_thread(self.thread_id, self.user_id))
         if not thread_ok:
             return False
 
@@ -169,25 +638,37 @@ class ConversationMemory:
         return True
 
     async def add_user_message(self, content: str, metadata: Optional[dict] = None) -> bool:
-        """Add a user message."""
-        if not self._initialized:
-            await self.initialize()
-        return await add_message(self.thread_id, "user", content, metadata)
+        """Queue a user message (see MESSAGE_WRITER); False if there is no Zep."""
+        return self._queue("user", content, metadata)
 
     async def add_assistant_message(self, content: str, metadata: Optional[dict] = None) -> bool:
-        """Add an assistant message."""
-        if not self._initialized:
-            await self.initialize()
-        return await add_message(self.thread_id, "assistant", content, metadata)
+        """Queue an assistant message (see MESSAGE_WRITER); False if there is no Zep."""
+        return self._queue("assistant", content, metadata)
+
+    def _queue(self, role: str, content: str, metadata: Optional[dict]) -> bool:
+        HISTORY.append(self.thread_id, role, content)
+        if local_search_enabled():
+            get_memory_index().add(self.thread_id, content, metadata)
+        if not get_zep_client():
+            return False
+        MESSAGE_WRITER.enqueue(self, role, content, metadata)
+        return True
 
     async def get_context(self, last_n: int = 10) -> str:
-        """Get recent conversation context."""
+        """Get recent conversation context (see HISTORY)."""
+        # Provisioning first tells HISTORY whether a new thread needs loading at all
         if not self._initialized:
             await self.initialize()
-        return await get_memory_context(self.thread_id, last_n)
+        lines = HISTORY.recent(self.thread_id, last_n)
+        if lines is not None:
+            return "\n".join(lines)
+        return await _load_memory_context(self.thread_id, last_n)
 
     async def search(self, query: str, limit: int = 5) -> list[dict]:
         """Search conversation history."""
         if not self._initialized:
             await self.initialize()
+        if local_search_enabled():
+            return await search_local(self.thread_id, query, limit)
+        await MESSAGE_WRITER.flush(self.thread_id)
         return await search_memory(self.thread_id, query, limit)
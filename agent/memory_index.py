@@ -0,0 +1,325 @@
+"""In-process search over each thread's messages: BM25, optionally blended with hashed embeddings.
+
+Each thread gets an inverted index (term -> {message: term count}),
+updated as messages are written, so a search only touches the postings
+of its own terms and ranks them with BM25. With embeddings on, every
+message is also a hashed bag-of-words vector (words, word pairs and
+character trigrams hashed into a fixed number of signed dimensions, no
+model involved) in a NumPy matrix, and a search blends BM25 with cosine similarity over the
+whole thread, so messages that share words with the query without an
+exact term match can still rank.
+
+Results have the shape of Zep's memory search: content, score (0-1,
+higher is better) and metadata. NumPy is only imported with embeddings on.
+"""
+
+import heapq
+import math
+import os
+import re
+import zlib
+from collections import Counter, OrderedDict
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
+
+_TOKEN = re.compile(r"[a-z0-9$%]+(?:['.-][a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by do for from has have i if in is it its me my of on or our so that the "
+    "their them they this to us was we were what with you your".split()
+)
+
+
+def stem(token: str) -> str:
+    """A light suffix strip, so "prices", "priced" and "pricing" index as one term."""
+    if token.endswith("ss"):
+        return token
+    for suffix in ("ing", "ed", "es", "s"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[: -len(suffix)]
+            break
+    return token[:-1] if token.endswith("e") and len(token) > 3 else token
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased, stemmed word tokens, without stopwords."""
+    return [stem(t) for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class ThreadIndex:
+    """One thread's messages: postings for BM25 and, optionally, hashed embedding rows.
+
+    Holds at most max_messages; past that the oldest message is dropped.
+    Message ids increase by one per message, so a message's embedding row
+    is its id modulo max_messages, and a new message takes the row of the
+    one it pushes out: every filled row is a live message.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    # Rough memory per message beyond its text, and per distinct term in it
+    # (message tuple and Counter, posting entries)
+    MESSAGE_OVERHEAD = 200
+    TERM_OVERHEAD = 100
+
+    def __init__(self, max_messages: int, dimensions: int = 0):
+        self.max_messages = max_messages
+        self.dimensions = dimensions
+        # id -> (content, metadata, token count, term counts)
+        self.messages: "OrderedDict[int, tuple[str, dict, int, Counter]]" = OrderedDict()
+        self.postings: dict[str, dict[int, int]] = {}
+        self.total_tokens = 0
+        self.next_id = 0
+        # Whether the messages are the thread's true tail (not just what was written here)
+        self.complete = False
+        self.appends = 0
+        # Estimated footprint
+        self.bytes = 0
+        self._vectors: Optional["np.ndarray"] = None
+        self._row_ids: Optional["np.ndarray"] = None
+        if dimensions:
+            import numpy as np
+
+            self._vectors = np.zeros((min(64, max_messages), dimensions), dtype=np.float32)
+            self._row_ids = np.zeros(len(self._vectors), dtype=np.int64)
+            self.bytes = self._vectors.nbytes + self._row_ids.nbytes
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def add(self, content: str, metadata: Optional[dict] = None) -> None:
+        tokens = tokenize(content)
+        counts = Counter(tokens)
+        message_id = self.next_id
+        self.next_id += 1
+        self.messages[message_id] = (content, metadata or {}, len(tokens), counts)
+        self.total_tokens += len(tokens)
+        self.bytes += self._message_bytes(content, counts)
+        for term, count in counts.items():
+            self.postings.setdefault(term, {})[message_id] = count
+        if self._vectors is not None:
+            self._set_vector(message_id, tokens)
+        if len(self.messages) > self.max_messages:
+            self._drop_oldest()
+
+    def _drop_oldest(self) -> None:
+        message_id, (content, _, length, counts) = self.messages.popitem(last=False)
+        self.total_tokens -= length
+        self.bytes -= self._message_bytes(content, counts)
+        for term in counts:
+            posting = self.postings[term]
+            del posting[message_id]
+            if not posting:
+                del self.postings[term]
+
+    def _message_bytes(self, content: str, counts: Counter) -> int:
+        return len(content) + self.MESSAGE_OVERHEAD + self.TERM_OVERHEAD * len(counts)
+
+    def _set_vector(self, message_id: int, tokens: list[str]) -> None:
+        import numpy as np
+
+        if message_id >= len(self._vectors) and len(self._vectors) < self.max_messages:
+            grown = np.zeros((min(2 * len(self._vectors), self.max_messages), self.dimensions), dtype=np.float32)
+            grown[: len(self._vectors)] = self._vectors
+            self.bytes -= self._vectors.nbytes + self._row_ids.nbytes
+            self._vectors = grown
+            self._row_ids = np.resize(self._row_ids, len(grown))
+            self.bytes += self._vectors.nbytes + self._row_ids.nbytes
+        row = message_id % self.max_messages
+        self._vectors[row] = embed(tokens, self.dimensions)
+        self._row_ids[row] = message_id
+
+    def bm25(self, terms: list[str]) -> dict[int, float]:
+        """BM25 score of every message containing a query term."""
+        count = len(self.messages)
+        if not count:
+            return {}
+        average = self.total_tokens / count or 1.0
+        scores: dict[int, float] = {}
+        for term in set(terms):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for message_id, tf in posting.items():
+                norm = self.K1 * (1 - self.B + self.B * self.messages[message_id][2] / average)
+                scores[message_id] = scores.get(message_id, 0.0) + idf * tf * (self.K1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str, limit: int = 5) -> list[dict]:
+        """The limit best messages for query, best first."""
+        terms = tokenize(query)
+        if not terms or not self.messages or limit <= 0:
+            return []
+        scores = self.bm25(terms)
+        best = max(scores.values(), default=0.0)
+
+        if self._vectors is None:
+            top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+            return [self._result(message_id, score / best) for message_id, score in top]
+
+        import numpy as np
+
+        # Blend, per row: BM25 relative to the best match, and cosine over every message
+        filled = len(self.messages)
+        ids = self._row_ids[:filled]
+        blended = self._vectors[:filled] @ embed(terms, self.dimensions)
+        if best:
+            lexical = np.zeros(filled, dtype=np.float32)
+            for message_id, score in scores.items():
+                lexical[message_id % self.max_messages] = score / best
+            blended = 0.5 * blended + 0.5 * lexical
+        k = min(limit, filled)
+        top = np.argpartition(-blended, k - 1)[:k]
+        top = top[np.lexsort((-ids[top], -blended[top]))]
+        return [self._result(int(ids[i]), float(blended[i])) for i in top if blended[i] > 0]
+
+    def _result(self, message_id: int, score: float) -> dict:
+        content, metadata, _, _ = self.messages[message_id]
+        return {"content": content, "score": round(score, 4), "metadata": metadata}
+
+
+def embed(tokens: list[str], dimensions: int) -> "np.ndarray":
+    """A unit-length hashed bag of words, word pairs and character trigrams (zeros for no tokens).
+
+    The trigrams (at half weight) let related word forms that stemming
+    misses, like "conversion" and "convert", still count as similar.
+    """
+    import numpy as np
+
+    vector = np.zeros(dimensions, dtype=np.float32)
+    features = Counter(tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])])
+    trigrams = Counter(f"#{t[i:i + 3]}" for token in tokens for t in [f"<{token}>"] for i in range(len(t) - 2))
+    for feature, count in [*features.items(), *trigrams.items()]:
+        h = zlib.crc32(feature.encode())
+        weight = (1.0 + math.log(count)) * (0.5 if feature[0] == "#" else 1.0)
+        vector[h % dimensions] += weight if h & 0x80000000 else -weight
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class MemoryIndex:
+    """ThreadIndexes by thread id.
+
+    Least recently used threads are evicted to stay within max_threads
+    and max_bytes (estimated: text, postings and embedding rows).
+    """
+
+    def __init__(
+        self,
+        messages_per_thread: int = 1000,
+        max_threads: int = 1000,
+        dimensions: int = 0,
+        max_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.messages_per_thread = messages_per_thread
+        self.max_threads = max_threads
+        self.dimensions = dimensions
+        self.max_bytes = max_bytes
+        self._threads: "OrderedDict[str, ThreadIndex]" = OrderedDict()
+        self.total_bytes = 0
+        self.searches = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "MemoryIndex":
+        """Build an index sized by <prefix>_MESSAGES / _MAX_THREADS / _MAX_BYTES, with <prefix>_EMBEDDINGS=1 to add vectors.
+
+        <prefix>_DIMENSIONS sets the embedding size (default 256).
+        """
+        embeddings = os.getenv(f"{prefix}_EMBEDDINGS", "0").lower() in ("1", "true", "yes")
+        return cls(
+            messages_per_thread=int(os.getenv(f"{prefix}_MESSAGES", "1000")),
+            max_threads=int(os.getenv(f"{prefix}_MAX_THREADS", "1000")),
+            dimensions=int(os.getenv(f"{prefix}_DIMENSIONS", "256")) if embeddings else 0,
+            max_bytes=int(os.getenv(f"{prefix}_MAX_BYTES", str(64 * 1024 * 1024))),
+        )
+
+    def thread(self, thread_id: str) -> Optional[ThreadIndex]:
+        return self._threads.get(thread_id)
+
+    def _new(self, thread_id: str) -> ThreadIndex:
+        self._pop(thread_id)
+        index = self._threads[thread_id] = ThreadIndex(self.messages_per_thread, self.dimensions)
+        self.total_bytes += index.bytes
+        return index
+
+    def _pop(self, thread_id: str) -> None:
+        index = self._threads.pop(thread_id, None)
+        if index is not None:
+            self.total_bytes -= index.bytes
+
+    def _evict(self) -> None:
+        while len(self._threads) > 1 and (
+            len(self._threads) > self.max_threads or self.total_bytes > self.max_bytes
+        ):
+            _, index = self._threads.popitem(last=False)
+            self.total_bytes -= index.bytes
+            self.evictions += 1
+
+    def add(self, thread_id: str, content: str, metadata: Optional[dict] = None) -> None:
+        """Index a message written to the thread."""
+        index = self._threads.get(thread_id)
+        if index is None:
+            index = self._new(thread_id)
+        else:
+            self._threads.move_to_end(thread_id)
+        before = index.bytes
+        index.add(content, metadata)
+        index.appends += 1
+        self.total_bytes += index.bytes - before
+        self._evict()
+
+    def replace(self, thread_id: str, messages: list[tuple[str, dict]]) -> None:
+        """Re-index the thread from its full tail, as (content, metadata) oldest first."""
+        index = self._new(thread_id)
+        before = index.bytes
+        for content, metadata in messages:
+            index.add(content, metadata)
+        index.complete = True
+        self.total_bytes += index.bytes - before
+        self._evict()
+
+    def mark_complete(self, thread_id: str) -> None:
+        """Note that the thread holds nothing beyond what was indexed here (e.g. Zep just created it)."""
+        index = self._threads.get(thread_id)
+        if index is None:
+            index = self._new(thread_id)
+            self._evict()
+        index.complete = True
+
+    def discard(self, thread_id: str) -> None:
+        """Drop the thread's messages (e.g. on /reset).
+
+        It starts over empty and complete, so its old messages aren't
+        re-indexed from Zep.
+        """
+        self._new(thread_id).complete = True
+        self._evict()
+
+    def search(self, thread_id: str, query: str, limit: int = 5) -> list[dict]:
+        """Search one thread's indexed messages."""
+        self.searches += 1
+        index = self._threads.get(thread_id)
+        if index is None:
+            return []
+        self._threads.move_to_end(thread_id)
+        return index.search(query, limit)
+
+    def stats(self) -> dict:
+        """Threads and messages indexed, footprint, and searches served."""
+        return {
+            "threads": len(self._threads),
+            "messages": sum(len(index) for index in self._threads.values()),
+            "terms": sum(len(index.postings) for index in self._threads.values()),
+            "bytes": self.total_bytes,
+            "searches": self.searches,
+            "evictions": self.evictions,
+            "embeddings": bool(self.dimensions),
+            "dimensions": self.dimensions,
+            "messages_per_thread": self.messages_per_thread,
+            "max_threads": self.max_threads,
+            "max_bytes": self.max_bytes,
+        }
@@ -1,12 +1,35 @@
-"""Pydantic models for GTM requirements validation."""
+"""Models for GTM requirements validation.
 
-from typing import Optional, Literal
-from pydantic import BaseModel, Field
+GTMRequirements and GTMState are pydantic models - the schema for what
+clients see and what the session store keeps. The records a session holds
+many of (tools, industry data, agencies, confirmations) are slotted
+dataclasses: code that builds them from trusted data just calls the
+constructor, and pydantic validates them only where outside data comes in
+(agency search results, stored snapshots).
+"""
+
+from dataclasses import dataclass
+from typing import Any, Optional, Literal
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class Record:
+    """Base for the compact state records."""
+
+    __slots__ = ()
+
+    def to_dict(self) -> dict[str, Any]:
+        """Plain-dict form for responses and the journal (shares the record's lists)."""
+        return {name: getattr(self, name) for name in self.__slots__}
 
 
 class GTMRequirements(BaseModel):
     """Validated GTM requirements - the structured state we're building."""
 
+    # Values set after construction (corrections, LLM tool calls) are
+    # validated too, so nothing invalid reaches a stored snapshot
+    model_config = ConfigDict(validate_assignment=True)
+
     # Company Profile
     company_name: Optional[str] = Field(None, description="Company or product name")
     company_size: Optional[Literal["solo", "small", "medium", "large", "enterprise"]] = None
@@ -35,7 +58,8 @@ class GTMRequirements(BaseModel):
     tech_stack: Optional[list[str]] = Field(default_factory=list, description="Tools they use: HubSpot, Clay, etc.")
 
 
-class IndustryData(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class IndustryData(Record):
     """Market data for an industry."""
     industry: str
     market_size: str
@@ -44,7 +68,8 @@ class IndustryData(BaseModel):
     top_players: list[str]
 
 
-class ToolInfo(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class ToolInfo(Record):
     """Information about a recognized tool/brand."""
     name: str
     category: str  # CRM, Sales, Marketing, etc.
@@ -52,7 +77,8 @@ class ToolInfo(BaseModel):
     logo_url: Optional[str] = None
 
 
-class AgencyMatch(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class AgencyMatch(Record):
     """A matched agency from our database."""
     id: int
     name: str
@@ -66,7 +92,8 @@ class AgencyMatch(BaseModel):
     website: Optional[str] = None
 
 
-class ConfirmationRequest(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class ConfirmationRequest(Record):
     """HITL confirmation request for the user."""
     field: str
     value: str
@@ -83,3 +110,4 @@ class GTMState(BaseModel):
     industry_data: Optional[IndustryData] = None
     recognized_tools: list[ToolInfo] = Field(default_factory=list)
     progress_percent: int = 0
+    version: int = Field(0, description="Bumped on every state change")
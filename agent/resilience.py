@@ -0,0 +1,236 @@
+"""Guards for calls to an upstream service: circuit breaker, latency window, hedging."""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class CircuitOpen(Exception):
+    """The circuit is open: the upstream is failing, so the call was not made."""
+
+
+class CircuitBreaker:
+    """Fails calls fast while an upstream is unhealthy.
+
+    Closed: calls go through. After failure_threshold failures in a row
+    (errors, or calls slower than slow_seconds) it opens, and calls fail
+    at once with CircuitOpen. After reset_seconds it is half-open: one
+    probe call goes through, and its outcome closes the circuit or opens
+    it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+        slow_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.slow_seconds = slow_seconds
+        self._clock = clock
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.consecutive_failures = 0
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+
+    @classmethod
+    def from_env(cls, name: str, prefix: str) -> "CircuitBreaker":
+        """Build a breaker set by <prefix>_FAILURES / _RESET_SECONDS / _SLOW_SECONDS (0 = no slow limit)."""
+        slow = float(os.getenv(f"{prefix}_SLOW_SECONDS", "5"))
+        return cls(
+            name,
+            failure_threshold=int(os.getenv(f"{prefix}_FAILURES", "5")),
+            reset_seconds=float(os.getenv(f"{prefix}_RESET_SECONDS", "30")),
+            slow_seconds=slow or None,
+        )
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn through the breaker, raising CircuitOpen instead while it is open."""
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._probing):
+            self.rejected += 1
+            raise CircuitOpen(f"{self.name} circuit open")
+
+        probe = state == self.HALF_OPEN
+        self._probing = probe
+        self.calls += 1
+        start = self._clock()
+        try:
+            result = await fn()
+        except Exception:
+            self._failure()
+            raise
+        finally:
+            if probe:
+                self._probing = False
+
+        if self.slow_seconds is not None and self._clock() - start > self.slow_seconds:
+            self._failure()
+        else:
+            self._success()
+        return result
+
+    def _success(self) -> None:
+        if self._state != self.CLOSED:
+            print(f"{self.name} circuit closed")
+        self._state = self.CLOSED
+        self.consecutive_failures = 0
+
+    def _failure(self) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self._state == self.HALF_OPEN or (
+            self._state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            print(f"{self.name} circuit open after {self.consecutive_failures} failures")
+            self._state = self.OPEN
+            self._opened_at = self._clock()
+            self.opened += 1
+
+    def stats(self) -> dict:
+        """State and counters."""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "opened": self.opened,
+            "failure_threshold": self.failure_threshold,
+            "reset_seconds": self.reset_seconds,
+            "slow_seconds": self.slow_seconds,
+        }
+
+
+class LatencyWindow:
+    """Latencies of the last `size` successful calls, for percentiles."""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """The pct (0-1) latency in seconds, or None with no samples."""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def hedged(fn: Callable[[], Awaitable[T]], delay: Optional[float]) -> tuple[T, bool]:
+    """Call fn, and call it again if the first call hasn't finished after delay.
+
+    Returns the first successful result (the other call is cancelled) and
+    whether a hedge was sent. Raises only if every call sent fails.
+    """
+    tasks = [asyncio.ensure_future(fn())]
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                tasks.append(asyncio.ensure_future(fn()))
+
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), len(tasks) > 1
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+class Hedger:
+    """Hedges calls that run past a percentile of recent latency.
+
+    Latencies of successful calls go into a window. Once it holds
+    min_samples, a call still running at the percentile latency gets a
+    second copy sent, and the first to succeed wins.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        percentile: float = 0.95,
+        min_samples: int = 20,
+        window: int = 200,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.latency = LatencyWindow(window)
+        self._clock = clock
+        self.calls = 0
+        self.hedged = 0
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "Hedger":
+        """Build a hedger set by <prefix>_HEDGE (1 to enable) and <prefix>_HEDGE_PERCENTILE."""
+        return cls(
+            enabled=os.getenv(f"{prefix}_HEDGE", "0").lower() in ("1", "true", "yes"),
+            percentile=float(os.getenv(f"{prefix}_HEDGE_PERCENTILE", "0.95")),
+        )
+
+    def delay(self) -> Optional[float]:
+        """How long a call may run before it is hedged (None: not hedged)."""
+        if not self.enabled or len(self.latency) < self.min_samples:
+            return None
+        return self.latency.percentile(self.percentile)
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn, hedging it if it is slow."""
+        self.calls += 1
+        start = self._clock()
+        result, was_hedged = await hedged(fn, self.delay())
+        self.latency.add(self._clock() - start)
+        if was_hedged:
+            self.hedged += 1
+        return result
+
+    def stats(self) -> dict:
+        """Hedge counters and recent latency percentiles (ms)."""
+        def ms(pct: float) -> Optional[float]:
+            value = self.latency.percentile(pct)
+            return round(value * 1e3, 2) if value is not None else None
+
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "p50_ms": ms(0.50),
+            "p95_ms": ms(0.95),
+            "hedge_after_ms": round(self.delay() * 1e3, 2) if self.delay() is not None else None,
+        }
@@ -0,0 +1,124 @@
+"""In-process result cache for upstream searches, with request coalescing."""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def _retrieve_exception(task: asyncio.Future) -> None:
+    # Mark a failed fetch's exception as seen even if every caller gave up
+    if not task.cancelled():
+        task.exception()
+
+
+class SearchCache(Generic[T]):
+    """Caches search results by canonical query key, with TTL and LRU eviction.
+
+    Concurrent lookups of a key that is not cached share one upstream call.
+    Only successful results are cached; if the fetch raises, every waiting
+    caller gets the exception and the next lookup tries again.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._entries: "OrderedDict[Hashable, tuple[float, T]]" = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self._clock = clock
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "SearchCache":
+        """Build a cache sized by <prefix>_MAX_ENTRIES / <prefix>_TTL_SECONDS (TTL 0 disables it)."""
+        return cls(
+            max_entries=int(os.getenv(f"{prefix}_MAX_ENTRIES", "1024")),
+            ttl_seconds=float(os.getenv(f"{prefix}_TTL_SECONDS", "300")),
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[T]]) -> T:
+        """Return the cached result for key, or fetch it (once, however many callers ask)."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if self._clock() < entry[0]:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[1]
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # The fetch runs as its own task, so a caller that gives up
+            # (e.g. its request was cancelled) doesn't fail the others
+            task = asyncio.ensure_future(self._fetch(key, fetch, self.invalidations))
+            task.add_done_callback(_retrieve_exception)
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: Hashable, fetch: Callable[[], Awaitable[T]], generation: int) -> T:
+        try:
+            result = await fetch()
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+        # A result fetched across an invalidation may be stale: share it, don't keep it
+        if self.ttl_seconds > 0 and generation == self.invalidations:
+            self._store(key, result)
+        return result
+
+    def _store(self, key: Hashable, result: T) -> None:
+        self._entries[key] = (self._clock() + self.ttl_seconds, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Optional[Hashable] = None) -> int:
+        """Drop one cached result, or all of them. Returns how many were dropped.
+
+        Call when the data behind the searches changes. Fetches already in
+        flight still answer their callers, but are not cached or joined by
+        later lookups.
+        """
+        self.invalidations += 1
+        if key is not None:
+            self._inflight.pop(key, None)
+            return 1 if self._entries.pop(key, None) is not None else 0
+        self._inflight.clear()
+        count = len(self._entries)
+        self._entries.clear()
+        return count
+
+    def stats(self) -> dict:
+        """Counters and current usage."""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
@@ -10,22 +10,109 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import Response, StreamingResponse
 from dotenv import load_dotenv
 import json
 import asyncio
-
-# CopilotKit SDK imports
-from copilotkit.integrations.fastapi import add_fastapi_endpoint
-from copilotkit import CopilotKitRemoteEndpoint, Action as CopilotAction
-
-from agent import gtm_agent
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+from agent import (
+    AGENCY_SEARCH_BUDGET_SECONDS,
+    AGENCY_SEARCHES,
+    GTMAgent,
+    close_extract_pool,
+    get_llm_agent,
+    open_extract_pool,
+)
 from models import GTMState
-from tools import search_agencies as search_agencies_db
+from tools import (
+    AGENCY_BREAKER,
+    AGENCY_CACHE,
+    AGENCY_HEDGER,
+    AGENCY_INDEX_PATH,
+    AgencySearchUnavailable,
+    close_http_client,
+    find_agencies,
+    get_agency_index,
+    load_agency_index,
+    open_http_client,
+    refresh_agency_index,
+)
+from sessions import DEFAULT_THREAD_ID, SessionRegistry
+from store import SessionStore
+from encoding import SSE_DONE, FastJSONResponse, sse_event
+from memory import (
+    HISTORY,
+    MEMORY_SEARCH,
+    MESSAGE_WRITER,
+    PROVISIONED,
+    get_memory_index,
+    get_zep_client,
+    local_search_enabled,
+)
 
 load_dotenv()
 
-app = FastAPI(title="GTM Agent")
+
+def warm_up() -> None:
+    """Load the heavy subsystems (CopilotKit, pydantic-ai, Zep) ahead of first use."""
+    get_copilotkit_sdk()
+    try:
+        get_llm_agent()
+    except ValueError as e:
+        print(f"LLM agent unavailable: {e}")
+    get_zep_client()
+
+
+async def warm_up_later(delay: float) -> None:
+    """Run warm_up off the event loop once the server has had time to report healthy."""
+    await asyncio.sleep(delay)
+    await asyncio.to_thread(warm_up)
+    # The pooled agency search client (cheap now that httpx is loaded)
+    open_http_client()
+    await load_agency_index_at_start()
+
+
+async def load_agency_index_at_start() -> None:
+    """Load the local agency index: fetched fresh with AGENCY_INDEX_FETCH=1, else from the snapshot."""
+    if os.getenv("AGENCY_INDEX_FETCH", "0").lower() in ("1", "true", "yes"):
+        try:
+            index = await refresh_agency_index()
+            print(f"Agency index: {len(index)} agencies fetched")
+            return
+        except Exception as e:
+            print(f"Agency index fetch failed: {e}")
+    if AGENCY_INDEX_PATH and os.path.exists(AGENCY_INDEX_PATH):
+        try:
+            index = await asyncio.to_thread(load_agency_index)
+            print(f"Agency index: {len(index)} agencies from {AGENCY_INDEX_PATH}")
+        except Exception as e:
+            print(f"Agency index load failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start-up and shutdown hooks."""
+    # Imports hold the GIL, so give the first health checks a head start
+    warm_up_task = asyncio.create_task(warm_up_later(float(os.getenv("WARMUP_DELAY_SECONDS", "1.0"))))
+    # Batch extraction's worker processes (started when a batch first needs them)
+    open_extract_pool()
+    yield
+    warm_up_task.cancel()
+    await close_http_client()
+    await asyncio.to_thread(close_extract_pool)
+    # Send the Zep messages still queued
+    await MESSAGE_WRITER.close(float(os.getenv("ZEP_WRITE_DRAIN_SECONDS", "5")))
+    # Commit any queued session writes before the process exits
+    if session_store is not None:
+        await asyncio.to_thread(session_store.close)
+
+
+app = FastAPI(title="GTM Agent", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # CORS for CopilotKit
 app.add_middleware(
@@ -34,8 +121,97 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Thread-Id", "ETag"],
+)
+
+
+# ============================================
+# Sessions
+# ============================================
+
+# Durable session state (set SESSION_DB_PATH="" to keep sessions in memory only)
+session_store = SessionStore.from_env()
+
+
+async def create_session(thread_id: str, user_id: Optional[str]) -> GTMAgent:
+    """Create a session agent, restoring its saved state (in a worker thread) if there is any."""
+    agent = GTMAgent(user_id=user_id, thread_id=thread_id)
+    if session_store is not None:
+        agent.journal = await asyncio.to_thread(session_store.restore, agent)
+    return agent
+
+
+# One GTMAgent per conversation, keyed by thread id. With several workers
+# sharing the store, sessions catch up on other workers' changes on access.
+sessions = SessionRegistry.from_env(
+    create_session,
+    shared_store=session_store if session_store is not None and session_store.shared else None,
 )
 
+# Ids for the current request, for handlers that don't see the request
+# (CopilotKit actions). Set from X-Thread-Id / X-User-Id headers, the
+# thread_id / user_id query params (custom_session_id from Hume), or the
+# thread cookie.
+current_thread_id: ContextVar[Optional[str]] = ContextVar("current_thread_id", default=None)
+current_user_id: ContextVar[Optional[str]] = ContextVar("current_user_id", default=None)
+
+# Holds the thread id issued to a caller that didn't send one
+THREAD_COOKIE = "gtm_thread_id"
+
+
+@app.middleware("http")
+async def bind_session_ids(request: Request, call_next):
+    """Make the request's thread/user ids available to handlers.
+
+    A browser that sends no thread id gets a new one of its own, returned
+    in X-Thread-Id and a cookie it sends back. Other callers without one
+    (Hume's custom language model calls when no custom_session_id is set,
+    scripts) can't keep a cookie, so they stay on the default thread and
+    their turns still build up one session.
+    """
+    params = request.query_params
+    thread_id = (
+        request.headers.get("x-thread-id")
+        or params.get("thread_id")
+        or params.get("custom_session_id")  # Hume EVI custom language model
+        or request.cookies.get(THREAD_COOKIE)
+    )
+    issued = None
+    if not thread_id:
+        if request.headers.get("origin"):
+            thread_id = issued = uuid.uuid4().hex
+        else:
+            thread_id = DEFAULT_THREAD_ID
+    thread_token = current_thread_id.set(thread_id)
+    user_token = current_user_id.set(request.headers.get("x-user-id") or params.get("user_id"))
+    try:
+        response = await call_next(request)
+    finally:
+        current_thread_id.reset(thread_token)
+        current_user_id.reset(user_token)
+    if issued is not None:
+        response.headers["X-Thread-Id"] = issued
+        response.set_cookie(THREAD_COOKIE, issued, httponly=True, samesite="lax")
+    return response
+
+
+def _session_ids(body: Optional[dict] = None) -> tuple[Optional[str], Optional[str]]:
+    """Get (thread_id, user_id) from the request body, falling back to headers/query."""
+    body = body if isinstance(body, dict) else {}
+    thread_id = body.get("thread_id") or body.get("threadId") or current_thread_id.get()
+    user_id = body.get("user_id") or body.get("userId") or current_user_id.get()
+    return thread_id, user_id
+
+
+async def get_session(body: Optional[dict] = None) -> GTMAgent:
+    """Get the agent for the current request's conversation, for reads."""
+    return await sessions.get(*_session_ids(body))
+
+
+def locked_session(body: Optional[dict] = None):
+    """Exclusive access to the current request's agent, for changes to its state."""
+    return sessions.session(*_session_ids(body))
+
 
 # ============================================
 # CopilotKit Action Handlers
@@ -81,14 +257,15 @@ async def update_requirements_handler(
         extracted["tech_stack"] = tech_stack
 
     # Update the agent state
-    confirmations = gtm_agent.update_requirements(extracted)
+    async with locked_session() as gtm_agent:
+        confirmations = gtm_agent.update_requirements(extracted)
 
-    return {
-        "status": "updated",
-        "progress_percent": gtm_agent.state.progress_percent,
-        "requirements": gtm_agent.state.requirements.model_dump(),
-        "confirmations": [c.model_dump() for c in confirmations],
-    }
+        return {
+            "status": "updated",
+            "progress_percent": gtm_agent.state.progress_percent,
+            "requirements": gtm_agent.state.requirements.model_dump(),
+            "confirmations": [c.to_dict() for c in confirmations],
+        }
 
 
 async def search_agencies_handler(
@@ -98,88 +275,112 @@ async def search_agencies_handler(
     max_budget: Optional[int] = None,
 ):
     """Search for matching agencies based on requirements."""
-    agencies = await search_agencies_db(
-        specializations=specializations or [],
-        category_tags=category_tags or [],
-        service_areas=service_areas or [],
-        max_budget=max_budget,
-        limit=5,
-    )
-
-    # Update agent state with matched agencies
-    gtm_agent.state.matched_agencies = agencies
+    async with locked_session() as gtm_agent:
+        try:
+            agencies = await find_agencies(
+                specializations=specializations or [],
+                category_tags=category_tags or [],
+                service_areas=service_areas or [],
+                max_budget=max_budget,
+                limit=5,
+                deadline=time.monotonic() + AGENCY_SEARCH_BUDGET_SECONDS,
+            )
+        except AgencySearchUnavailable:
+            # Keep the session's last good matches
+            agencies = gtm_agent.state.matched_agencies
+            status = "unavailable"
+        else:
+            # Update agent state with matched agencies (a background search would overwrite them)
+            gtm_agent.cancel_agency_search()
+            gtm_agent.set_matched_agencies(agencies)
+            status = "found"
 
     return {
-        "status": "found",
+        "status": status,
         "count": len(agencies),
-        "agencies": [a.model_dump() for a in agencies],
+        "agencies": [a.to_dict() for a in agencies],
     }
 
 
 async def get_state_handler():
     """Get the current GTM state."""
-    state = gtm_agent.state
-    return {
-        "requirements": state.requirements.model_dump(),
-        "progress_percent": state.progress_percent,
-        "industry_data": state.industry_data.model_dump() if state.industry_data else None,
-        "recognized_tools": [t.model_dump() for t in state.recognized_tools],
-        "matched_agencies": [a.model_dump() for a in state.matched_agencies],
-        "pending_confirmations": [c.model_dump() for c in state.pending_confirmations],
-        "confirmed_fields": state.confirmed_fields,
-    }
+    return (await get_session()).state_snapshot()
+
+
+# CopilotKit pulls in langgraph/langchain, so the SDK is built on first use
+# (or by warm_up) rather than at import time
+_copilotkit_sdk = None
+_copilotkit_lock = threading.Lock()
+
+
+def get_copilotkit_sdk():
+    """Get the CopilotKit SDK, importing and building it on first use."""
+    global _copilotkit_sdk
+
+    with _copilotkit_lock:
+        if _copilotkit_sdk is None:
+            _copilotkit_sdk = _build_copilotkit_sdk()
+    return _copilotkit_sdk
+
+
+def _build_copilotkit_sdk():
+    from copilotkit import CopilotKitRemoteEndpoint, Action as CopilotAction
+
+    # Define CopilotKit actions
+    update_requirements_action = CopilotAction(
+        name="update_requirements",
+        description="Update GTM requirements. Call this after EVERY user message to extract and save their information.",
+        parameters=[
+            {"name": "company_name", "type": "string", "description": "Company or product name"},
+            {"name": "industry", "type": "string", "description": "Industry vertical (gaming, fintech, healthcare, etc.)"},
+            {"name": "category", "type": "string", "description": "Business category: b2b_saas, dtc, enterprise, marketplace, consumer"},
+            {"name": "maturity", "type": "string", "description": "Company stage: idea, pre_launch, early, growth, scale"},
+            {"name": "target_market", "type": "string", "description": "Target customer description"},
+            {"name": "target_regions", "type": "array", "description": "Target regions: US, UK, Europe, APAC, Global"},
+            {"name": "strategy_type", "type": "string", "description": "GTM strategy: plg, sales_led, hybrid"},
+            {"name": "budget", "type": "number", "description": "Monthly marketing budget in USD"},
+            {"name": "primary_goal", "type": "string", "description": "Main goal: awareness, leads, revenue, expansion"},
+            {"name": "needed_specializations", "type": "array", "description": "What help they need: demand_gen, abm, content, plg, brand, seo, paid"},
+            {"name": "tech_stack", "type": "array", "description": "Tools they use: HubSpot, Clay, Salesforce, etc."},
+        ],
+        handler=update_requirements_handler
+    )
 
+    search_agencies_action = CopilotAction(
+        name="search_agencies",
+        description="Search for matching GTM agencies. Call when you have gathered enough requirements (industry, budget, or specializations).",
+        parameters=[
+            {"name": "specializations", "type": "array", "description": "Required specializations: Demand Generation, ABM, Content Marketing, etc."},
+            {"name": "category_tags", "type": "array", "description": "Category tags: B2B Marketing Agency, GTM Agency, etc."},
+            {"name": "service_areas", "type": "array", "description": "Service areas: North America, Europe, APAC, etc."},
+            {"name": "max_budget", "type": "number", "description": "Maximum monthly budget in USD"},
+        ],
+        handler=search_agencies_handler
+    )
 
-# Define CopilotKit actions
-update_requirements_action = CopilotAction(
-    name="update_requirements",
-    description="Update GTM requirements. Call this after EVERY user message to extract and save their information.",
-    parameters=[
-        {"name": "company_name", "type": "string", "description": "Company or product name"},
-        {"name": "industry", "type": "string", "description": "Industry vertical (gaming, fintech, healthcare, etc.)"},
-        {"name": "category", "type": "string", "description": "Business category: b2b_saas, dtc, enterprise, marketplace, consumer"},
-        {"name": "maturity", "type": "string", "description": "Company stage: idea, pre_launch, early, growth, scale"},
-        {"name": "target_market", "type": "string", "description": "Target customer description"},
-        {"name": "target_regions", "type": "array", "description": "Target regions: US, UK, Europe, APAC, Global"},
-        {"name": "strategy_type", "type": "string", "description": "GTM strategy: plg, sales_led, hybrid"},
-        {"name": "budget", "type": "number", "description": "Monthly marketing budget in USD"},
-        {"name": "primary_goal", "type": "string", "description": "Main goal: awareness, leads, revenue, expansion"},
-        {"name": "needed_specializations", "type": "array", "description": "What help they need: demand_gen, abm, content, plg, brand, seo, paid"},
-        {"name": "tech_stack", "type": "array", "description": "Tools they use: HubSpot, Clay, Salesforce, etc."},
-    ],
-    handler=update_requirements_handler
-)
+    get_state_action = CopilotAction(
+        name="get_state",
+        description="Get the current GTM planning state including requirements, progress, and matched agencies.",
+        parameters=[],
+        handler=get_state_handler
+    )
 
-search_agencies_action = CopilotAction(
-    name="search_agencies",
-    description="Search for matching GTM agencies. Call when you have gathered enough requirements (industry, budget, or specializations).",
-    parameters=[
-        {"name": "specializations", "type": "array", "description": "Required specializations: Demand Generation, ABM, Content Marketing, etc."},
-        {"name": "category_tags", "type": "array", "description": "Category tags: B2B Marketing Agency, GTM Agency, etc."},
-        {"name": "service_areas", "type": "array", "description": "Service areas: North America, Europe, APAC, etc."},
-        {"name": "max_budget", "type": "number", "description": "Maximum monthly budget in USD"},
-    ],
-    handler=search_agencies_handler
-)
+    return CopilotKitRemoteEndpoint(
+        actions=[
+            update_requirements_action,
+            search_agencies_action,
+            get_state_action,
+        ]
+    )
 
-get_state_action = CopilotAction(
-    name="get_state",
-    description="Get the current GTM planning state including requirements, progress, and matched agencies.",
-    parameters=[],
-    handler=get_state_handler
-)
 
-# Initialize CopilotKit SDK
-copilotkit_sdk = CopilotKitRemoteEndpoint(
-    actions=[
-        update_requirements_action,
-        search_agencies_action,
-        get_state_action,
-    ]
-)
+@app.api_route("/copilotkit/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
+async def copilotkit_endpoint(request: Request):
+    """CopilotKit endpoint (what add_fastapi_endpoint registers, built lazily)."""
+    sdk = _copilotkit_sdk or await asyncio.to_thread(get_copilotkit_sdk)
+    from copilotkit.integrations.fastapi import handler
 
-# Add CopilotKit endpoint at /copilotkit
-add_fastapi_endpoint(app, copilotkit_sdk, "/copilotkit")
+    return await handler(request, sdk)
 
 
 @app.get("/health")
@@ -212,10 +413,75 @@ async def process_message(request: Request):
     message = body.get("message", "")
 
     if not message:
-        return JSONResponse({"error": "No message provided"}, status_code=400)
+        return FastJSONResponse({"error": "No message provided"}, status_code=400)
+
+    async with locked_session(body) as gtm_agent:
+        result = await gtm_agent.process_message(message)
+    return FastJSONResponse(result)
+
+
+def _user_messages(conversation) -> list[str]:
+    """Get the user message texts from a conversation.
+
+    Accepts a single string, a list of strings, or a list of
+    {"role", "content"} messages (only user messages are kept).
+    """
+    if isinstance(conversation, str):
+        return [conversation]
+
+    texts = []
+    for msg in conversation or []:
+        if isinstance(msg, str):
+            texts.append(msg)
+        elif isinstance(msg, dict) and msg.get("role", "user") == "user":
+            content = msg.get("content", "")
+            if isinstance(content, str):
+                texts.append(content)
+            elif isinstance(content, list):
+                texts.extend(
+                    part.get("text", "") for part in content
+                    if isinstance(part, dict) and part.get("type") == "text"
+                )
+    return texts
+
 
-    result = await gtm_agent.process_message(message)
-    return JSONResponse(result)
+@app.post("/process/batch")
+async def process_batch(request: Request):
+    """Extract requirements for many messages or conversations in one call.
+
+    Body: {"conversations": [[...], ...]} or {"messages": [...]} (each message
+    is its own conversation), plus an optional "workers" count. Nothing is
+    written to Zep and no agency search is run.
+    """
+    body = await request.json()
+    conversations = body.get("conversations")
+    if conversations is None:
+        messages = body.get("messages", [])
+        if not isinstance(messages, list) or not all(isinstance(m, (str, dict)) for m in messages):
+            return FastJSONResponse(
+                {"error": "messages must be a list of strings or {role, content} messages"}, status_code=400
+            )
+        conversations = [[m] for m in messages]
+    elif not isinstance(conversations, list) or not all(isinstance(c, (str, list)) for c in conversations):
+        return FastJSONResponse(
+            {"error": "conversations must be a list of conversations (strings or lists of messages)"}, status_code=400
+        )
+
+    if not conversations:
+        return FastJSONResponse({"error": "No conversations provided"}, status_code=400)
+
+    try:
+        workers = int(body.get("workers", 1))
+    except (TypeError, ValueError):
+        return FastJSONResponse({"error": "workers must be an integer"}, status_code=400)
+    workers = max(1, min(workers, os.cpu_count() or 1))
+    conversations = [_user_messages(c) for c in conversations]
+
+    results = await asyncio.to_thread(GTMAgent.extract_batch, conversations, workers)
+    return FastJSONResponse({
+        "count": len(results),
+        "results": [{"requirements": r.model_dump()} for r in results],
+    })
 
 
 @app.post("/confirm")
@@ -225,10 +491,11 @@ async def confirm_field(request: Request):
     field = body.get("field")
 
     if not field:
-        return JSONResponse({"error": "No field specified"}, status_code=400)
+        return FastJSONResponse({"error": "No field specified"}, status_code=400)
 
-    gtm_agent.confirm_field(field)
-    return JSONResponse({"status": "confirmed", "field": field})
+    async with locked_session(body) as gtm_agent:
+        gtm_agent.confirm_field(field)
+    return FastJSONResponse({"status": "confirmed", "field": field})
 
 
 @app.post("/correct")
@@ -239,47 +506,148 @@ async def correct_field(request: Request):
     value = body.get("value")
 
     if not field or not value:
-        return JSONResponse({"error": "Field and value required"}, status_code=400)
+        return FastJSONResponse({"error": "Field and value required"}, status_code=400)
+
+    async with locked_session(body) as gtm_agent:
+        try:
+            gtm_agent.correct_field(field, value)
+        except ValueError as e:
+            return FastJSONResponse({"error": f"Invalid value for {field}: {e}"}, status_code=400)
+    return FastJSONResponse({"status": "corrected", "field": field, "value": value})
+
 
-    gtm_agent.correct_field(field, value)
-    return JSONResponse({"status": "corrected", "field": field, "value": value})
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers etag (weak comparison)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag.removeprefix("W/") for tag in tags)
 
 
 @app.get("/state")
-async def get_state():
-    """Get current GTM state."""
-    state = gtm_agent.state
-    return JSONResponse({
-        "requirements": state.requirements.model_dump(),
-        "progress_percent": state.progress_percent,
-        "industry_data": state.industry_data.model_dump() if state.industry_data else None,
-        "recognized_tools": [t.model_dump() for t in state.recognized_tools],
-        "matched_agencies": [a.model_dump() for a in state.matched_agencies],
-        "pending_confirmations": [c.model_dump() for c in state.pending_confirmations],
-        "confirmed_fields": state.confirmed_fields,
-    })
+async def get_state(request: Request):
+    """Get current GTM state.
+
+    The response carries an ETag that changes with the state, so pollers
+    can send If-None-Match and get a 304 while nothing has changed.
+    """
+    body, etag = (await get_session()).state_json()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 
 @app.post("/reset")
-async def reset_state():
-    """Reset the agent state."""
-    global gtm_agent
-    from agent import GTMAgent
-    gtm_agent = GTMAgent()
-    return JSONResponse({"status": "reset"})
+async def reset_state(request: Request):
+    """Reset the agent state for this conversation."""
+    body = await request.body()
+    try:
+        thread_id, _ = _session_ids(json.loads(body) if body else None)
+    except ValueError:  # JSONDecodeError, or a body that isn't valid UTF-8
+        return FastJSONResponse({"error": "Invalid JSON body"}, status_code=400)
+    # Holding the session, the stored state is deleted before the session
+    # is dropped: a request arriving meanwhile gets the live session, never
+    # the old state restored from the store
+    async with sessions.session(thread_id):
+        if session_store is not None:
+            await asyncio.to_thread(session_store.delete, thread_id)
+        sessions.discard(thread_id)
+    # Forget the old conversation's messages: unsent ones, the history buffer and search index
+    MESSAGE_WRITER.discard(thread_id)
+    HISTORY.reset(thread_id)
+    if local_search_enabled():
+        get_memory_index().discard(thread_id)
+    return FastJSONResponse({"status": "reset"})
+
+
+@app.get("/sessions/stats")
+async def session_stats():
+    """Session registry counters (hits, misses, evictions) and usage, plus agency searches skipped."""
+    stats = sessions.stats()
+    stats["agency_searches"] = AGENCY_SEARCHES.stats()
+    if session_store is not None:
+        stats["store"] = session_store.stats()
+    return FastJSONResponse(stats)
+
+
+@app.get("/agencies/cache/stats")
+async def agency_cache_stats():
+    """Agency search cache counters (hits, misses, coalesced lookups) and usage."""
+    return FastJSONResponse(AGENCY_CACHE.stats())
+
+
+@app.post("/agencies/cache/invalidate")
+async def invalidate_agency_cache():
+    """Drop cached agency search results (call when the agency table changes).
+
+    Each server process has its own cache; in multi-worker mode entries on
+    other workers still expire after AGENCY_CACHE_TTL_SECONDS.
+    """
+    return FastJSONResponse({"status": "invalidated", "dropped": AGENCY_CACHE.invalidate()})
+
+
+@app.get("/agencies/upstream/stats")
+async def agency_upstream_stats():
+    """Search API health: circuit breaker state and counters, hedging and latency."""
+    return FastJSONResponse({"breaker": AGENCY_BREAKER.stats(), "hedging": AGENCY_HEDGER.stats()})
+
+
+@app.get("/agencies/index/stats")
+async def agency_index_stats():
+    """Local agency index size and searches served ({"loaded": false} when searches go to the API)."""
+    index = get_agency_index()
+    if index is None:
+        return FastJSONResponse({"loaded": False})
+    return FastJSONResponse({"loaded": True, **index.stats()})
+
+
+@app.post("/agencies/index/refresh")
+async def refresh_agency_index_endpoint():
+    """Rebuild the local agency index from the search API (call when the agency table changes)."""
+    try:
+        index = await refresh_agency_index()
+    except Exception as e:
+        return FastJSONResponse({"error": f"Agency catalog fetch failed: {e}"}, status_code=502)
+    return FastJSONResponse({"status": "refreshed", "agencies": len(index)})
 
 
 @app.get("/memory/history")
 async def get_memory_history(last_n: int = 10):
-    """Get conversation history from Zep memory."""
+    """Get conversation history (recent messages held in-process, else Zep memory)."""
+    gtm_agent = await get_session()
     history = await gtm_agent.get_conversation_history(last_n)
-    return JSONResponse({
+    return FastJSONResponse({
         "history": history,
         "user_id": gtm_agent.user_id,
         "thread_id": gtm_agent.thread_id,
     })
 
 
+@app.get("/memory/writes/stats")
+async def memory_write_stats():
+    """Zep write-behind queue: backlog, batches sent, retries and drops."""
+    return FastJSONResponse(MESSAGE_WRITER.stats())
+
+
+@app.get("/memory/history/stats")
+async def memory_history_stats():
+    """In-process history buffers: threads held, footprint, and how often reads skipped Zep."""
+    return FastJSONResponse(HISTORY.stats())
+
+
+@app.get("/memory/provisioning/stats")
+async def memory_provisioning_stats():
+    """Zep users/threads known to exist in this process, and how often that saved a round trip."""
+    return FastJSONResponse(PROVISIONED.stats())
+
+
+@app.get("/memory/search/stats")
+async def memory_search_stats():
+    """Where memory searches go (MEMORY_SEARCH) and what the local index holds."""
+    return FastJSONResponse({"mode": MEMORY_SEARCH, "local": local_search_enabled(), **get_memory_index().stats()})
+
+
 @app.post("/memory/search")
 async def search_memory(request: Request):
     """Search conversation memory."""
@@ -288,16 +656,87 @@ async def search_memory(request: Request):
     limit = body.get("limit", 5)
 
     if not query:
-        return JSONResponse({"error": "Query required"}, status_code=400)
+        return FastJSONResponse({"error": "Query required"}, status_code=400)
 
+    gtm_agent = await get_session(body)
     results = await gtm_agent.search_history(query, limit)
-    return JSONResponse({"results": results})
+    return FastJSONResponse({"results": results})
 
 
 # AG-UI Protocol endpoint for CopilotKit
+def _state_event(gtm_agent: GTMAgent, cursor: Optional[str]) -> dict:
+    """The state event for a client whose copy of the state is at cursor.
+
+    A JSON Patch against the client's copy when the session can produce
+    one, otherwise (no cursor, a reset or restored session, or a cursor
+    older than the session's change log) a full snapshot to resync from.
+    Either way the event carries the cursor to send with the next request.
+    """
+    delta = gtm_agent.state_delta(cursor)
+    if delta is None:
+        return {
+            "type": "state_snapshot",
+            "cursor": gtm_agent.state_cursor(),
+            "version": gtm_agent.state.version,
+            "state": gtm_agent.state_snapshot(),
+        }
+    return {
+        "type": "state_delta",
+        "cursor": gtm_agent.state_cursor(),
+        "version": gtm_agent.state.version,
+        "patch": delta,
+    }
+
+
+async def agency_update_events(search: asyncio.Task, body: dict, cursor: str):
+    """SSE events for a background agency search once it finishes.
+
+    An agencies_update with the matches, then the state event that brings
+    the client's copy (at cursor) up to date, then a line of text. If the
+    search was unavailable the update has status "unavailable" and the
+    session's last good matches. Nothing if a newer message superseded
+    the search.
+    """
+    try:
+        # Shielded: if the client goes away the search still lands in the session
+        outcome = await asyncio.shield(search)
+    except asyncio.CancelledError:
+        if not search.cancelled():
+            raise
+        return
+    if outcome is None:
+        return
+    status, agencies = outcome
+
+    async with locked_session(body) as gtm_agent:
+        state_event = _state_event(gtm_agent, cursor)
+    yield sse_event({
+        "type": "agencies_update",
+        "status": status,
+        "count": len(agencies),
+        "agencies": [a.to_dict() for a in agencies],
+    })
+    yield sse_event(state_event)
+    if status == "unavailable":
+        yield sse_event({"type": "text", "content": "Agency matching is slow right now - I'll refresh matches shortly."})
+    elif agencies:
+        yield sse_event({"type": "text", "content": f"Found {len(agencies)} agencies that could help."})
+
+
 @app.post("/")
 async def ag_ui_endpoint(request: Request):
-    """AG-UI protocol endpoint for CopilotKit integration."""
+    """AG-UI protocol endpoint for CopilotKit integration.
+
+    State is streamed as a state_snapshot the first time and as
+    state_delta JSON Patches after that: send back the cursor of the last
+    state event applied as "state_cursor" (in the body or its
+    forwardedProps). Omit it to get a fresh snapshot.
+
+    The agency search doesn't hold up the response: when one is needed the
+    stream sends everything else first, then an agencies_update event (and
+    the state change) when the matches arrive. A newer message for the
+    same thread cancels a search it supersedes.
+    """
     try:
         body = await request.json()
         messages = body.get("messages", [])
@@ -320,21 +759,27 @@ async def ag_ui_endpoint(request: Request):
         if not user_message:
             # Return a greeting if no user message
             async def stream_greeting():
-                yield 'data: {"type":"text","content":"Hello! I\'m your GTM strategist. Tell me about what you\'re building."}\n\n'
-                yield 'data: [DONE]\n\n'
+                yield sse_event({
+                    "type": "text",
+                    "content": "Hello! I'm your GTM strategist. Tell me about what you're building.",
+                })
+                yield SSE_DONE
             return StreamingResponse(stream_greeting(), media_type="text/event-stream")
 
-        # Process the message
-        result = await gtm_agent.process_message(user_message)
+        forwarded = body.get("forwardedProps")
+        cursor = body.get("state_cursor") or (forwarded.get("state_cursor") if isinstance(forwarded, dict) else None)
+
+        # Process the message; a needed agency search carries on in the
+        # background and its matches follow as an agencies_update event
+        async with locked_session(body) as gtm_agent:
+            result = await gtm_agent.process_message(user_message, session=lambda: locked_session(body))
+            state_event = _state_event(gtm_agent, cursor)
+            agency_search = gtm_agent.agency_search if result.get("agency_search") == "pending" else None
 
         # Build response with state updates
         async def stream_response():
-            # Send state update event
-            state_event = {
-                "type": "state_update",
-                "state": result["state"]
-            }
-            yield f'data: {json.dumps(state_event)}\n\n'
+            # Send the state as a snapshot or a patch
+            yield sse_event(state_event)
 
             # Send confirmations if any
             if result["confirmations"]:
@@ -342,7 +787,7 @@ async def ag_ui_endpoint(request: Request):
                     "type": "confirmations",
                     "items": result["confirmations"]
                 }
-                yield f'data: {json.dumps(confirm_event)}\n\n'
+                yield sse_event(confirm_event)
 
             # Generate text response based on what was extracted
             extracted = result["extracted"]
@@ -367,7 +812,9 @@ async def ag_ui_endpoint(request: Request):
 
             # Acknowledge agencies found
             agencies = state.get("matched_agencies", [])
-            if agencies:
+            if agency_search is not None:
+                response_parts.append("Looking for agencies that could help...")
+            elif agencies:
                 response_parts.append(f"Found {len(agencies)} agencies that could help.")
 
             # Progress update
@@ -390,8 +837,12 @@ async def ag_ui_endpoint(request: Request):
                 "type": "text",
                 "content": response_text
             }
-            yield f'data: {json.dumps(text_event)}\n\n'
-            yield 'data: [DONE]\n\n'
+            yield sse_event(text_event)
+
+            if agency_search is not None:
+                async for event in agency_update_events(agency_search, body, state_event["cursor"]):
+                    yield event
+            yield SSE_DONE
 
         return StreamingResponse(stream_response(), media_type="text/event-stream")
 
@@ -401,8 +852,8 @@ async def ag_ui_endpoint(request: Request):
         traceback.print_exc()
 
         async def error_stream():
-            yield f'data: {{"type":"error","message":"{str(e)}"}}\n\n'
-            yield 'data: [DONE]\n\n'
+            yield sse_event({"type": "error", "message": str(e)})
+            yield SSE_DONE
         return StreamingResponse(error_stream(), media_type="text/event-stream")
 
 
@@ -432,8 +883,13 @@ async def chat_completions(request: Request):
         if not user_message:
             user_message = "Hello"
 
-        # Process the message through our agent
-        result = await gtm_agent.process_message(user_message)
+        # Hume re-sends the whole history and the last user message may still
+        # be growing, so only the newly appended text is extracted. Final
+        # transcripts end in punctuation; until then a word at the end may
+        # still be cut off.
+        final = user_message.rstrip().endswith((".", "!", "?"))
+        async with locked_session(body) as gtm_agent:
+            result = await gtm_agent.process_utterance(user_message, final=final)
 
         # Build response based on extracted data
         extracted = result.get("extracted", {})
@@ -487,7 +943,7 @@ async def chat_completions(request: Request):
                         "finish_reason": None
                     }]
                 }
-                yield f"data: {json.dumps(chunk)}\n\n"
+                yield sse_event(chunk)
 
                 # Send done marker
                 done_chunk = {
@@ -501,13 +957,13 @@ async def chat_completions(request: Request):
                         "finish_reason": "stop"
                     }]
                 }
-                yield f"data: {json.dumps(done_chunk)}\n\n"
-                yield "data: [DONE]\n\n"
+                yield sse_event(done_chunk)
+                yield SSE_DONE
 
             return StreamingResponse(stream_response(), media_type="text/event-stream")
         else:
             # Non-streaming response
-            return JSONResponse({
+            return FastJSONResponse({
                 "id": "chatcmpl-gtm",
                 "object": "chat.completion",
                 "created": int(__import__('time').time()),
@@ -531,7 +987,7 @@ async def chat_completions(request: Request):
         print(f"Chat completions error: {e}")
         import traceback
         traceback.print_exc()
-        return JSONResponse({
+        return FastJSONResponse({
             "error": {
                 "message": str(e),
                 "type": "internal_error"
@@ -0,0 +1,249 @@
+"""Per-session agent registry with LRU and TTL eviction."""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Optional
+
+from agent import GTMAgent
+
+if TYPE_CHECKING:
+    from store import SessionStore
+
+DEFAULT_THREAD_ID = "default"
+
+
+@dataclass
+class _Entry:
+    agent: GTMAgent
+    last_access: float
+    size: int = 0
+    # State version size was measured at (-1: never)
+    measured_version: int = -1
+    # Serializes mutations of this session; users counts holders and waiters
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    users: int = 0
+
+
+# Per-session memory beyond the serialized state's size (agent, records,
+# cached client view, change log), measured with benchmarks/bench_memory.py
+SESSION_OVERHEAD_BYTES = 5 * 1024
+
+
+def estimate_session_bytes(agent: GTMAgent) -> int:
+    """Rough memory footprint of a session, from the size of its serialized state."""
+    return SESSION_OVERHEAD_BYTES + len(agent.state.model_dump_json())
+
+
+class SessionRegistry:
+    """Creates GTMAgent instances on demand, keyed by thread id.
+
+    The factory is a coroutine function, so it can restore a session from
+    the store without blocking the event loop; concurrent requests for a
+    thread that isn't loaded yet share one load. Sessions idle for longer
+    than ttl_seconds are dropped, and the least recently used ones are
+    evicted once there are more than max_entries or their estimated total
+    size exceeds max_bytes. Sessions in use through session() are never
+    evicted. If a shared store is given (multi-worker mode), sessions catch
+    up on changes made by other processes before they are handed out, and
+    a session() block's changes are committed to it when the block ends.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str, Optional[str]], Awaitable[GTMAgent]],
+        max_entries: int = 10_000,
+        ttl_seconds: float = 3600.0,
+        max_bytes: int = 256 * 1024 * 1024,
+        clock: Callable[[], float] = time.monotonic,
+        shared_store: Optional["SessionStore"] = None,
+    ):
+        self._factory = factory
+        self._shared_store = shared_store
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Loads in progress, by thread id
+        self._loading: dict[str, asyncio.Future] = {}
+        self._clock = clock
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(
+        cls,
+        factory: Callable[[str, Optional[str]], Awaitable[GTMAgent]],
+        shared_store: Optional["SessionStore"] = None,
+    ) -> "SessionRegistry":
+        """Build a registry with limits from SESSION_* environment variables."""
+        return cls(
+            factory,
+            shared_store=shared_store,
+            max_entries=int(os.getenv("SESSION_MAX_ENTRIES", "10000")),
+            ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", "3600")),
+            max_bytes=int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024))),
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, thread_id: str) -> bool:
+        return thread_id in self._entries
+
+    async def get(self, thread_id: Optional[str] = None, user_id: Optional[str] = None) -> GTMAgent:
+        """Get the agent for a thread, creating it if needed.
+
+        For reads. Anything that changes the session's state should go
+        through session() instead. In shared mode a session no request
+        holds catches up first, held the way session() holds it.
+        """
+        thread_id = thread_id or DEFAULT_THREAD_ID
+        entry = await self._entry(thread_id, user_id)
+        if self._shared_store is None or entry.users:
+            return entry.agent
+        async with self._hold(thread_id, entry) as agent:
+            return agent
+
+    @asynccontextmanager
+    async def session(
+        self, thread_id: Optional[str] = None, user_id: Optional[str] = None
+    ) -> AsyncIterator[GTMAgent]:
+        """Get a thread's agent with exclusive access for the block.
+
+        Requests for the same thread run one at a time in arrival order;
+        different threads never wait on each other.
+        """
+        thread_id = thread_id or DEFAULT_THREAD_ID
+        entry = await self._entry(thread_id, user_id)
+        async with self._hold(thread_id, entry) as agent:
+            yield agent
+
+    @asynccontextmanager
+    async def _hold(self, thread_id: str, entry: _Entry) -> AsyncIterator[GTMAgent]:
+        entry.users += 1
+        try:
+            async with entry.lock:
+                store = self._shared_store
+                if store is None:
+                    yield entry.agent
+                else:
+                    await store.refresh(entry.agent)
+                    try:
+                        yield entry.agent
+                    finally:
+                        await store.commit(entry.agent)
+        finally:
+            entry.users -= 1
+            entry.last_access = self._clock()
+            if self._entries.get(thread_id) is entry:
+                # Re-measure if the block changed the state
+                self._entries.move_to_end(thread_id)
+                self._resize(entry)
+
+    async def _entry(self, thread_id: str, user_id: Optional[str]) -> _Entry:
+        now = self._clock()
+        self._expire(now)
+
+        entry = self._entries.get(thread_id)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(thread_id)
+            entry.last_access = now
+        else:
+            self.misses += 1
+            # Loop in case the loaded session is dropped again before this request gets to it
+            while entry is None:
+                loading = self._loading.get(thread_id)
+                if loading is None:
+                    loading = self._loading[thread_id] = asyncio.ensure_future(self._load(thread_id, user_id))
+                # Shielded: a caller going away doesn't cancel the load for the others
+                await asyncio.shield(loading)
+                entry = self._entries.get(thread_id)
+
+        self._enforce_limits(keep=thread_id)
+        return entry
+
+    async def _load(self, thread_id: str, user_id: Optional[str]) -> None:
+        try:
+            agent = await self._factory(thread_id, user_id)
+        finally:
+            del self._loading[thread_id]
+        entry = _Entry(agent, self._clock())
+        self._entries[thread_id] = entry
+        self._resize(entry)
+        self._enforce_limits(keep=thread_id)
+
+    def discard(self, thread_id: Optional[str] = None) -> bool:
+        """Drop a session (e.g. on reset). The next get() starts it fresh."""
+        entry = self._entries.pop(thread_id or DEFAULT_THREAD_ID, None)
+        if entry is None:
+            return False
+        self._drop(entry)
+        return True
+
+    def stats(self) -> dict:
+        """Counters and current usage."""
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self._entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+    def _drop(self, entry: _Entry) -> None:
+        # A request may still hold the agent: stop its background search and
+        # detach its journal, so nothing it does reaches the store any more
+        self.total_bytes -= entry.size
+        entry.agent.cancel_agency_search()
+        entry.agent.journal = None
+
+    def _resize(self, entry: _Entry) -> None:
+        version = entry.agent.state.version
+        if version == entry.measured_version:
+            return
+        entry.measured_version = version
+        size = estimate_session_bytes(entry.agent)
+        self.total_bytes += size - entry.size
+        entry.size = size
+
+    def _expire(self, now: float) -> None:
+        # Entries are in access order, so expired ones are all at the front
+        expired = []
+        for thread_id, entry in self._entries.items():
+            if now - entry.last_access <= self.ttl_seconds:
+                break
+            if not entry.users:
+                expired.append(thread_id)
+        for thread_id in expired:
+            self._drop(self._entries.pop(thread_id))
+            self.expirations += 1
+
+    def _over_limits(self) -> bool:
+        return len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes
+
+    def _enforce_limits(self, keep: str) -> None:
+        if not self._over_limits():
+            return
+        for thread_id in list(self._entries):
+            if not self._over_limits():
+                break
+            entry = self._entries[thread_id]
+            if thread_id == keep or entry.users:
+                continue
+            del self._entries[thread_id]
+            self._drop(entry)
+            self.evictions += 1
@@ -0,0 +1,442 @@
+"""Durable session store - SQLite event log plus periodic snapshots.
+
+Every change to a session's state is appended to an event log, keyed by the
+state version it produced. Writes are queued and group-committed by a
+background thread, so requests never wait on disk. Sessions are restored
+lazily: only when a thread is first accessed is its latest snapshot loaded
+and the events after it replayed. The events a snapshot covers are kept, so
+a thread whose snapshot no longer loads is rebuilt from its whole log.
+
+In shared mode (several worker processes on one database) a request's
+writes are committed together when it is done with the session, in a
+worker thread, with an optimistic version check against the thread's head:
+a worker holding a stale state loses, catches up from the store, re-applies
+its changes and tries again.
+"""
+
+import asyncio
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from models import GTMState
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    thread_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (thread_id, seq)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    thread_id TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS heads (
+    thread_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+# Sentinels for the writer thread: stop, or commit what it has gathered now
+_STOP = object()
+_FLUSH = object()
+
+# Attempts at re-applying a change on top of another worker's newer state
+MAX_REBASES = 5
+
+
+class SessionJournal:
+    """Records one session's changes into the store.
+
+    In shared mode the changes are held in pending until SessionStore.commit
+    writes them, when the session() block that made them ends.
+    """
+
+    def __init__(self, store: "SessionStore", thread_id: str):
+        self._store = store
+        self.thread_id = thread_id
+        # (kind, payload, version, statements) per change not yet committed
+        self.pending: list[tuple[str, dict, int, list[tuple]]] = []
+
+    def _statements(self, kind: str, payload: dict, state: GTMState) -> list[tuple]:
+        store = self._store
+        statements = [store._event_statement(self.thread_id, kind, payload, state)]
+        # Also snapshot the state every snapshot_every versions
+        if state.version % store.snapshot_every == 0:
+            statements += store._snapshot_statements(self.thread_id, state.version, state)
+        return statements
+
+    def record(self, kind: str, payload: dict, agent) -> None:
+        """Append an event for a change already applied to agent.state."""
+        statements = self._statements(kind, payload, agent.state)
+        if self._store.shared:
+            self.pending.append((kind, payload, agent.state.version, statements))
+            return
+        for statement in statements:
+            self._store._enqueue(statement)
+
+    def commit(self, pending: list[tuple[str, dict, int, list[tuple]]], agent_type) -> Optional[GTMState]:
+        """Write pending changes in one transaction (shared mode; blocks, so run it in a thread).
+
+        If another worker changed the session first, its state is loaded
+        into a scratch agent of agent_type and the changes are re-applied
+        on top. Returns that rebased state for the session to adopt, or
+        None if the changes went in as made.
+        """
+        store = self._store
+        rebased = None
+        for _ in range(MAX_REBASES):
+            base, head = pending[0][2] - 1, pending[-1][2]
+            statements = [s for *_, group in pending for s in group]
+            if store._execute(statements, thread_id=self.thread_id, expect_head=base, new_head=head):
+                return rebased
+            scratch = agent_type.offline()
+            scratch.thread_id = self.thread_id
+            store.restore(scratch)
+            rebuilt = []
+            for kind, payload, _, _ in pending:
+                version = scratch.state.version
+                scratch.apply_event(kind, payload)
+                # A change the other worker already made is a no-op now
+                if scratch.state.version != version:
+                    rebuilt.append((kind, payload, scratch.state.version, self._statements(kind, payload, scratch.state)))
+            if not rebuilt:
+                return scratch.state
+            pending, rebased = rebuilt, scratch.state
+        raise VersionConflict(f"Could not record {pending[-1][0]} for {self.thread_id} after {MAX_REBASES} attempts")
+
+
+class VersionConflict(Exception):
+    """A change kept losing the race against other workers' writes."""
+
+
+class SessionStore:
+    """SQLite-backed event log and snapshots for GTMState, with group commit."""
+
+    def __init__(
+        self,
+        path: str,
+        snapshot_every: int = 50,
+        flush_interval: float = 0.05,
+        max_batch: int = 500,
+        shared: bool = False,
+        head_ttl: float = 1.0,
+    ):
+        self.path = path
+        self.shared = shared
+        self.snapshot_every = snapshot_every
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.head_ttl = head_ttl
+        # thread id -> (stored head, when it was read), shared mode
+        self._heads: dict[str, tuple[int, float]] = {}
+        self.head_reads = 0
+        self.commits = 0
+        self.writes = 0
+        self.conflicts = 0
+
+        self._queue: "queue.Queue" = queue.Queue()
+        # Queued, uncommitted statements per thread id
+        self._pending: dict[str, int] = {}
+        self._committed = threading.Condition()
+        self._writer = self._connect()
+        self._writer.executescript(SCHEMA)
+        self._writer.commit()
+        self._conn = self._connect()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="session-store", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls) -> Optional["SessionStore"]:
+        """Open the store at SESSION_DB_PATH (default sessions.db); empty disables it.
+
+        SESSION_SHARED=1 turns on shared mode for multi-worker deployments;
+        SESSION_HEAD_TTL_SECONDS sets how long a thread's head is trusted
+        before it is read again.
+        """
+        path = os.getenv("SESSION_DB_PATH", os.path.join(os.path.dirname(__file__), "sessions.db"))
+        if not path:
+            return None
+        return cls(
+            path,
+            snapshot_every=int(os.getenv("SESSION_SNAPSHOT_EVERY", "50")),
+            shared=os.getenv("SESSION_SHARED", "").lower() in ("1", "true", "yes"),
+            head_ttl=float(os.getenv("SESSION_HEAD_TTL_SECONDS", "1")),
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ---- writes ----
+
+    def _event_statement(self, thread_id: str, kind: str, payload: dict, state: GTMState) -> tuple:
+        return (
+            "INSERT OR REPLACE INTO events (thread_id, seq, kind, payload) VALUES (?, ?, ?, ?)",
+            (thread_id, state.version, kind, json.dumps(payload)),
+        )
+
+    def _snapshot_statements(self, thread_id: str, seq: int, state: GTMState) -> list[tuple]:
+        return [
+            (
+                "INSERT OR REPLACE INTO snapshots (thread_id, seq, state) VALUES (?, ?, ?)",
+                (thread_id, seq, state.model_dump_json()),
+            ),
+        ]
+
+    def _enqueue(self, statement: tuple) -> None:
+        # Every statement's first parameter is its thread id
+        thread_id = statement[1][0]
+        with self._committed:
+            self._pending[thread_id] = self._pending.get(thread_id, 0) + 1
+        self._queue.put(statement)
+
+    def _execute(
+        self,
+        statements: list[tuple],
+        thread_id: Optional[str] = None,
+        expect_head: Optional[int] = None,
+        new_head: Optional[int] = None,
+    ) -> bool:
+        """Commit statements now, in one transaction (shared mode; blocks).
+
+        With expect_head, the thread's stored head must still be at that
+        version; it is then advanced to new_head (default: by one).
+        Returns False if it was not.
+        """
+        with self._lock:
+            conn = self._conn
+            # IMMEDIATE takes the write lock up front, so the head check and
+            # the writes are atomic across processes
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if expect_head is not None:
+                    row = conn.execute("SELECT version FROM heads WHERE thread_id = ?", (thread_id,)).fetchone()
+                    if (row[0] if row else 0) != expect_head:
+                        conn.execute("ROLLBACK")
+                        self.conflicts += 1
+                        return False
+                    new_head = expect_head + 1 if new_head is None else new_head
+                    conn.execute(
+                        "INSERT OR REPLACE INTO heads (thread_id, version) VALUES (?, ?)",
+                        (thread_id, new_head),
+                    )
+                for sql, params in statements:
+                    conn.execute(sql, params)
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+            self.commits += 1
+            self.writes += len(statements)
+            if expect_head is not None:
+                self._cache_head(thread_id, new_head)
+            return True
+
+    def _write(self, statements: list[tuple]) -> None:
+        if self.shared:
+            self._execute(statements)
+        else:
+            for statement in statements:
+                self._enqueue(statement)
+
+    def snapshot(self, thread_id: str, seq: int, state: GTMState) -> None:
+        """Save a snapshot of state as of version seq."""
+        self._write(self._snapshot_statements(thread_id, seq, state))
+
+    def delete(self, thread_id: str) -> None:
+        """Remove everything stored for a thread."""
+        self._write([
+            ("DELETE FROM events WHERE thread_id = ?", (thread_id,)),
+            ("DELETE FROM snapshots WHERE thread_id = ?", (thread_id,)),
+            ("DELETE FROM heads WHERE thread_id = ?", (thread_id,)),
+        ])
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            if item is not _STOP:
+                # Gather whatever else arrives within the flush interval
+                try:
+                    while len(batch) < self.max_batch and batch[-1] is not _FLUSH:
+                        batch.append(self._queue.get(timeout=self.flush_interval))
+                        if batch[-1] is _STOP:
+                            break
+                except queue.Empty:
+                    pass
+
+            statements = [s for s in batch if s is not _STOP and s is not _FLUSH]
+            if statements:
+                try:
+                    self._writer.execute("BEGIN")
+                    for sql, params in statements:
+                        self._writer.execute(sql, params)
+                    self._writer.execute("COMMIT")
+                    self.commits += 1
+                    self.writes += len(statements)
+                except sqlite3.Error as e:
+                    print(f"Session store write error: {e}")
+                    self._writer.execute("ROLLBACK")
+                with self._committed:
+                    for _, params in statements:
+                        left = self._pending[params[0]] - 1
+                        if left:
+                            self._pending[params[0]] = left
+                        else:
+                            del self._pending[params[0]]
+                    self._committed.notify_all()
+            for _ in batch:
+                self._queue.task_done()
+            if any(item is _STOP for item in batch):
+                return
+
+    def flush(self) -> None:
+        """Block until every queued write is committed."""
+        self._queue.join()
+
+    def flush_thread(self, thread_id: str) -> None:
+        """Block until the thread's queued writes are committed (no wait if it has none)."""
+        with self._committed:
+            if not self._pending.get(thread_id):
+                return
+            # Have the writer commit its batch now, not at the end of the flush interval
+            self._queue.put(_FLUSH)
+            self._committed.wait_for(lambda: not self._pending.get(thread_id))
+
+    def close(self) -> None:
+        """Commit pending writes and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._writer.close()
+        self._conn.close()
+
+    # ---- reads ----
+
+    def load(self, thread_id: str, after: int = 0) -> tuple[Optional[GTMState], list[tuple[int, str, dict]]]:
+        """Load what is needed to bring a thread from version `after` up to date.
+
+        Returns the latest snapshot if it is newer than `after` (else None)
+        and the events past both, as (version, kind, payload). A snapshot
+        that doesn't validate is skipped: the events past `after` rebuild it.
+        """
+        # Writes for this thread may still be queued (e.g. it was just evicted)
+        if not self.shared:
+            self.flush_thread(thread_id)
+
+        with self._lock:
+            state = None
+            row = self._conn.execute(
+                "SELECT seq, state FROM snapshots WHERE thread_id = ? AND seq > ?", (thread_id, after)
+            ).fetchone()
+            if row:
+                try:
+                    state = GTMState.model_validate_json(row[1])
+                    after = row[0]
+                except ValueError as e:
+                    # Written before its values were validated: rebuild from the events instead
+                    print(f"Session store: snapshot {row[0]} of {thread_id} is invalid, replaying events: {e}")
+
+            events = [
+                (seq, kind, json.loads(payload))
+                for seq, kind, payload in self._conn.execute(
+                    "SELECT seq, kind, payload FROM events WHERE thread_id = ? AND seq > ? ORDER BY seq",
+                    (thread_id, after),
+                )
+            ]
+        return state, events
+
+    def head(self, thread_id: str) -> int:
+        """The latest stored version of a thread (0 if there is none; shared mode)."""
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM heads WHERE thread_id = ?", (thread_id,)).fetchone()
+        self.head_reads += 1
+        head = row[0] if row else 0
+        self._cache_head(thread_id, head)
+        return head
+
+    def _cache_head(self, thread_id: str, head: int) -> None:
+        if len(self._heads) >= 100_000 and thread_id not in self._heads:
+            self._heads.clear()
+        self._heads[thread_id] = (head, time.monotonic())
+
+    def _cached_head(self, thread_id: str) -> Optional[int]:
+        """The thread's head as read within the last head_ttl seconds, if it was."""
+        cached = self._heads.get(thread_id)
+        if cached is None or time.monotonic() - cached[1] >= self.head_ttl:
+            return None
+        return cached[0]
+
+    def catch_up(self, agent, after: Optional[int] = None) -> None:
+        """Apply changes other workers stored since the agent's version."""
+        after = agent.state.version if after is None else after
+        self._apply(agent, *self.load(agent.thread_id, after=after))
+
+    def _apply(self, agent, state: Optional[GTMState], events: list[tuple[int, str, dict]]) -> None:
+        if state is not None:
+            agent.state = state
+        for seq, kind, payload in events:
+            try:
+                agent.apply_event(kind, payload)
+            except ValueError as e:
+                # A change with an invalid value, recorded before values were validated
+                print(f"Session store: skipping {kind} event {seq} of {agent.thread_id}: {e}")
+            agent.state.version = seq
+
+    async def refresh(self, agent) -> None:
+        """Catch the agent up if another worker has changed its session (shared mode).
+
+        The SQLite reads run in a worker thread. The cached head is used
+        while it is fresh, so a session another worker just changed may be
+        up to head_ttl seconds behind.
+        """
+        if not self.shared:
+            return
+        head = self._cached_head(agent.thread_id)
+        if head is None:
+            head = await asyncio.to_thread(self.head, agent.thread_id)
+        if head > agent.state.version:
+            self._apply(agent, *await asyncio.to_thread(self.load, agent.thread_id, agent.state.version))
+
+    async def commit(self, agent) -> None:
+        """Write the changes a session() block made (shared mode), in a worker thread.
+
+        A stale state loses to another worker's newer one: the session then
+        adopts that state with its changes re-applied on top.
+        """
+        journal = agent.journal
+        if journal is None or not journal.pending:
+            return
+        pending, journal.pending = journal.pending, []
+        state = await asyncio.to_thread(journal.commit, pending, type(agent))
+        if state is not None:
+            agent.state = state
+
+    def restore(self, agent) -> SessionJournal:
+        """Restore a GTMAgent's state from the store and return its journal."""
+        agent.state = GTMState()
+        self.catch_up(agent, after=0)
+        return SessionJournal(self, agent.thread_id)
+
+    def stats(self) -> dict:
+        """Write counters."""
+        return {
+            "path": self.path,
+            "queued": self._queue.qsize(),
+            "shared": self.shared,
+            "commits": self.commits,
+            "writes": self.writes,
+            "conflicts": self.conflicts,
+            "head_reads": self.head_reads,
+        }
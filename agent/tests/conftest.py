@@ -0,0 +1,17 @@
+"""Test setup: pip install -r agent/requirements-dev.txt, then python -m pytest agent/tests
+
+Tests run offline: a placeholder model key, no Zep, and sessions kept in
+memory unless a test opens its own store.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-placeholder")
+os.environ["ZEP_API_KEY"] = ""
+os.environ["SESSION_DB_PATH"] = ""
+os.environ["SESSION_SHARED"] = ""
+os.environ["WARMUP_DELAY_SECONDS"] = "3600"
@@ -0,0 +1,43 @@
+"""Keyword extraction: growing utterances and industry lookups."""
+
+from agent import UtteranceExtractor
+from tools import INDUSTRY_INDEX
+
+
+def test_keyword_at_the_end_of_a_fragment_waits_for_the_next():
+    utterance = UtteranceExtractor()
+    assert utterance.update("We sell to us") == {}
+    assert utterance.update("We sell to users in the UK") == {}
+    assert utterance.update("We sell to users in the UK.", final=True) == {"target_regions": ["UK"]}
+
+
+def test_finish_counts_what_was_held_back():
+    utterance = UtteranceExtractor()
+    utterance.update("We sell to the US")
+    assert utterance.finish() == {"target_regions": ["US"]}
+
+
+def test_keyword_split_across_fragments():
+    utterance = UtteranceExtractor()
+    utterance.update("We use Hub")
+    assert utterance.update("We use HubSpot", final=True) == {"tech_stack": ["HubSpot"]}
+
+
+def test_utterance_text_is_recorded_once():
+    utterance = UtteranceExtractor()
+    utterance.update("We're in fin")
+    utterance.update("We're in fintech.", final=True)
+    assert utterance.unrecorded() == "We're in fintech."
+    assert utterance.unrecorded() == ""
+
+
+def test_industry_lookup():
+    assert INDUSTRY_INDEX.resolve("fintech") == "fintech"
+    assert INDUSTRY_INDEX.resolve("Financial Technology") == "fintech"
+    # Typos still resolve
+    assert INDUSTRY_INDEX.resolve("fintec") == "fintech"
+    assert INDUSTRY_INDEX.resolve("helthcare") == "healthcare"
+    # A different word one edit away does not
+    assert INDUSTRY_INDEX.resolve("adtech") is None
+    assert INDUSTRY_INDEX.resolve("ai") == "ai"
+    assert INDUSTRY_INDEX.resolve("aj") is None
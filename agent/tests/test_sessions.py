@@ -0,0 +1,150 @@
+"""Sessions through the server: restore after eviction, /reset, ETags and thread ids."""
+
+import asyncio
+
+import httpx
+import pytest
+
+import server
+from sessions import SessionRegistry
+from store import SessionStore
+
+THREAD = {"x-thread-id": "thread"}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A fresh session store and registry behind the app."""
+    store = SessionStore(str(tmp_path / "sessions.db"), snapshot_every=5)
+    monkeypatch.setattr(server, "session_store", store)
+    monkeypatch.setattr(server, "sessions", SessionRegistry(server.create_session))
+    yield store
+    store.close()
+
+
+def run(test):
+    """Run test(client) against the app."""
+    async def main():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await test(client)
+    return asyncio.run(main())
+
+
+async def process(client: httpx.AsyncClient, message: str) -> dict:
+    response = await client.post("/process", json={"message": message}, headers=THREAD)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_session_is_restored_after_eviction(store):
+    async def test(client):
+        await process(client, "We're a fintech b2b saas startup")
+        await process(client, "We use HubSpot, budget is $20k per month")
+        before = (await client.get("/state", headers=THREAD)).json()
+        server.sessions.discard("thread")
+        after = (await client.get("/state", headers=THREAD)).json()
+        assert after == before
+        assert after["requirements"]["budget"] == 20000
+
+    run(test)
+
+
+def test_concurrent_misses_share_one_load(store, monkeypatch):
+    loads = []
+
+    async def counting(thread_id, user_id):
+        loads.append(thread_id)
+        return await server.create_session(thread_id, user_id)
+
+    monkeypatch.setattr(server, "sessions", SessionRegistry(counting))
+
+    async def test(client):
+        responses = await asyncio.gather(*[client.get("/state", headers=THREAD) for _ in range(5)])
+        assert {r.status_code for r in responses} == {200}
+        assert loads == ["thread"]
+
+    run(test)
+
+
+def test_state_etag(store):
+    async def test(client):
+        first = await client.get("/state", headers=THREAD)
+        etag = first.headers["etag"]
+        unchanged = await client.get("/state", headers={**THREAD, "if-none-match": etag})
+        assert unchanged.status_code == 304
+        await process(client, "We're in fintech")
+        changed = await client.get("/state", headers={**THREAD, "if-none-match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+
+    run(test)
+
+
+def test_reset_while_polling(store):
+    async def test(client):
+        await process(client, "We're a fintech b2b saas startup in the US")
+
+        async def poll():
+            versions = []
+            for _ in range(20):
+                response = await client.get("/state", headers=THREAD)
+                versions.append(response.json()["version"])
+                await asyncio.sleep(0)
+            return versions
+
+        reset, versions = await asyncio.gather(client.post("/reset", headers=THREAD), poll())
+        assert reset.json() == {"status": "reset"}
+        # Polls see the old state until the reset, then only the new one
+        if 0 in versions:
+            assert set(versions[versions.index(0):]) == {0}
+        assert (await client.get("/state", headers=THREAD)).json()["version"] == 0
+
+        # Changes after the reset start from nothing, in memory and in the store
+        await process(client, "We use HubSpot")
+        live = (await client.get("/state", headers=THREAD)).json()
+        server.sessions.discard("thread")
+        stored = (await client.get("/state", headers=THREAD)).json()
+        assert stored == live
+        assert stored["requirements"]["industry"] is None
+        assert stored["requirements"]["tech_stack"] == ["HubSpot"]
+
+    run(test)
+
+
+def test_reset_rejects_invalid_json(store):
+    async def test(client):
+        response = await client.post("/reset", content=b"{not json", headers=THREAD)
+        assert response.status_code == 400
+
+    run(test)
+
+
+def test_correct_rejects_invalid_value(store):
+    async def test(client):
+        response = await client.post("/correct", json={"field": "category", "value": "B2B software"}, headers=THREAD)
+        assert response.status_code == 400
+        response = await client.post("/correct", json={"field": "category", "value": "dtc"}, headers=THREAD)
+        assert response.status_code == 200
+
+    run(test)
+
+
+def test_thread_ids(store):
+    async def test(client):
+        # A browser without an id gets one of its own, with a cookie
+        browser = await client.get("/state", headers={"origin": "http://localhost:3000"})
+        issued = browser.headers["x-thread-id"]
+        assert browser.cookies.get(server.THREAD_COOKIE) == issued
+
+        # Callers that can't keep a cookie share the default thread
+        client.cookies.clear()
+        for message in ("We're in fintech.", "We sell to the US."):
+            response = await client.post("/chat/completions", json={"messages": [{"role": "user", "content": message}]})
+            assert response.status_code == 200
+            assert "x-thread-id" not in response.headers
+        state = (await server.sessions.get("default")).state
+        assert state.requirements.industry == "fintech"
+        assert state.requirements.target_regions == ["US"]
+
+    run(test)
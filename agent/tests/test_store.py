@@ -0,0 +1,149 @@
+"""Session store: what is written comes back on restore."""
+
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+from agent import GTMAgent
+from models import AgencyMatch
+from store import SessionStore
+
+MESSAGES = [
+    "We're a fintech b2b saas startup selling in the US",
+    "We use HubSpot and Clay",
+    "Our budget is $20k per month",
+    "We need demand gen and ABM",
+]
+
+AGENCY = AgencyMatch(
+    id=1, name="Pipeline Co", slug="pipeline-co", description="B2B demand gen", headquarters="London",
+    specializations=["Demand Generation"], min_budget=10000, match_score=80, match_reasons=["Budget fits"],
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.db"), snapshot_every=5)
+    yield store
+    store.close()
+
+
+def restored(store: SessionStore, thread_id: str = "thread") -> GTMAgent:
+    agent = GTMAgent.offline()
+    agent.thread_id = thread_id
+    agent.journal = store.restore(agent)
+    return agent
+
+
+def converse(agent: GTMAgent) -> None:
+    """Make one change of every kind the journal records."""
+    for message in MESSAGES:
+        agent.set_pending_confirmations(agent.update_requirements(agent.extract_from_message(message)))
+    agent.set_matched_agencies([AGENCY])
+    agent.confirm_field("industry")
+    agent.correct_field("budget", 25000)
+
+
+@pytest.mark.parametrize("snapshot_every", [1, 5, 1000])
+def test_restore_round_trip(tmp_path, snapshot_every):
+    store = SessionStore(str(tmp_path / "sessions.db"), snapshot_every=snapshot_every)
+    try:
+        agent = restored(store)
+        converse(agent)
+        # Queued writes are committed before the thread is read back
+        again = restored(store)
+        assert again.state == agent.state
+        assert again.state.version == agent.state.version > 5
+    finally:
+        store.close()
+
+
+def test_restore_survives_reopening(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = SessionStore(path, snapshot_every=5)
+    agent = restored(store)
+    converse(agent)
+    store.close()
+
+    store = SessionStore(path, snapshot_every=5)
+    try:
+        assert restored(store).state == agent.state
+    finally:
+        store.close()
+
+
+def test_invalid_correction_is_rejected_and_not_stored(store):
+    agent = restored(store)
+    converse(agent)
+    version = agent.state.version
+
+    with pytest.raises(ValueError):
+        agent.correct_field("category", "B2B software")
+    assert agent.state.version == version
+    assert agent.state.requirements.category == "b2b_saas"
+    assert restored(store).state == agent.state
+
+
+def test_invalid_update_fields_are_left_out(store):
+    agent = restored(store)
+    agent.update_requirements({"budget": "about 5k", "category": "dtc", "target_regions": "US"})
+    assert agent.state.requirements.budget is None
+    assert agent.state.requirements.category == "dtc"
+    assert agent.state.requirements.target_regions == []
+    assert restored(store).state == agent.state
+
+
+def test_invalid_snapshot_is_rebuilt_from_events(store):
+    agent = restored(store)
+    converse(agent)
+    store.flush()
+
+    # A snapshot written before values were validated
+    with sqlite3.connect(store.path) as conn:
+        seq, state = conn.execute("SELECT seq, state FROM snapshots WHERE thread_id = 'thread'").fetchone()
+        data = json.loads(state)
+        data["requirements"]["category"] = "B2B software"
+        conn.execute("UPDATE snapshots SET state = ? WHERE thread_id = 'thread'", (json.dumps(data),))
+        conn.execute(
+            "INSERT INTO events (thread_id, seq, kind, payload) VALUES ('thread', ?, 'correct', ?)",
+            (agent.state.version + 1, json.dumps({"field": "budget", "value": "about 5k"})),
+        )
+
+    again = restored(store)
+    assert again.state.requirements == agent.state.requirements
+    assert again.state.version == agent.state.version + 1
+
+
+def test_delete_forgets_thread(store):
+    agent = restored(store)
+    converse(agent)
+    other = restored(store, "other")
+    converse(other)
+
+    store.delete("thread")
+    assert restored(store).state.version == 0
+    assert restored(store, "other").state == other.state
+
+
+def test_shared_mode_rebases_on_a_newer_state(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    first = SessionStore(path, snapshot_every=5, shared=True)
+    second = SessionStore(path, snapshot_every=5, shared=True)
+    try:
+        a, b = restored(first), restored(second)
+        a.update_requirements(a.extract_from_message(MESSAGES[0]))
+        asyncio.run(first.commit(a))
+        # b still holds version 0: its change goes on top of a's
+        b.update_requirements(b.extract_from_message(MESSAGES[1]))
+        asyncio.run(second.commit(b))
+
+        assert first.conflicts + second.conflicts == 1
+        state = restored(first).state
+        assert state == b.state
+        assert state.requirements.industry == "fintech"
+        assert state.requirements.tech_stack and set(state.requirements.tech_stack) == {"HubSpot", "Clay"}
+    finally:
+        first.close()
+        second.close()
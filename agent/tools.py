@@ -1,136 +1,490 @@
 """Tools for the GTM agent - search agencies, fetch market data, recognize tools."""
 
+import asyncio
 import os
-import httpx
-from typing import Optional
-from models import AgencyMatch, IndustryData, ToolInfo
-
-# Known tools/brands database
-KNOWN_TOOLS = {
-    # CRM
-    "hubspot": ToolInfo(name="HubSpot", category="CRM", description="All-in-one CRM, marketing, sales platform"),
-    "salesforce": ToolInfo(name="Salesforce", category="CRM", description="Enterprise CRM and sales cloud"),
-    "pipedrive": ToolInfo(name="Pipedrive", category="CRM", description="Sales-focused CRM for small teams"),
-
-    # Sales Tools
-    "clay": ToolInfo(name="Clay", category="Sales Intelligence", description="Data enrichment and outbound automation"),
-    "apollo": ToolInfo(name="Apollo.io", category="Sales Intelligence", description="B2B database and engagement platform"),
-    "zoominfo": ToolInfo(name="ZoomInfo", category="Sales Intelligence", description="B2B contact and company data"),
-    "linkedin": ToolInfo(name="LinkedIn Sales Navigator", category="Sales Intelligence", description="LinkedIn's premium sales tool"),
-
-    # Outbound
-    "instantly": ToolInfo(name="Instantly", category="Email Outreach", description="Cold email automation at scale"),
-    "lemlist": ToolInfo(name="Lemlist", category="Email Outreach", description="Personalized cold outreach"),
-    "outreach": ToolInfo(name="Outreach", category="Sales Engagement", description="Enterprise sales engagement platform"),
-    "salesloft": ToolInfo(name="SalesLoft", category="Sales Engagement", description="Revenue workflow platform"),
-
-    # Marketing
-    "mailchimp": ToolInfo(name="Mailchimp", category="Email Marketing", description="Email marketing and automation"),
-    "klaviyo": ToolInfo(name="Klaviyo", category="Email Marketing", description="E-commerce email and SMS"),
-    "marketo": ToolInfo(name="Marketo", category="Marketing Automation", description="Enterprise marketing automation"),
-    "pardot": ToolInfo(name="Pardot", category="Marketing Automation", description="Salesforce B2B marketing automation"),
-
-    # Analytics
-    "mixpanel": ToolInfo(name="Mixpanel", category="Product Analytics", description="Product and user analytics"),
-    "amplitude": ToolInfo(name="Amplitude", category="Product Analytics", description="Digital analytics platform"),
-    "segment": ToolInfo(name="Segment", category="CDP", description="Customer data platform"),
-    "heap": ToolInfo(name="Heap", category="Product Analytics", description="Auto-capture product analytics"),
-
-    # ABM
-    "6sense": ToolInfo(name="6sense", category="ABM", description="Account-based marketing platform"),
-    "demandbase": ToolInfo(name="Demandbase", category="ABM", description="ABM and B2B advertising"),
-    "terminus": ToolInfo(name="Terminus", category="ABM", description="ABM platform for B2B"),
-}
-
-# Industry market data (could be enhanced with real API calls)
-INDUSTRY_DATA = {
-    "gaming": IndustryData(
-        industry="Gaming",
-        market_size="$200B+ globally",
-        growth_rate="8.4% CAGR",
-        key_segments=["Mobile Gaming", "Console", "PC", "Cloud Gaming"],
-        top_players=["Tencent", "Sony", "Microsoft", "Nintendo", "Activision"]
-    ),
-    "games": IndustryData(  # Alias
-        industry="Gaming",
-        market_size="$200B+ globally",
-        growth_rate="8.4% CAGR",
-        key_segments=["Mobile Gaming", "Console", "PC", "Cloud Gaming"],
-        top_players=["Tencent", "Sony", "Microsoft", "Nintendo", "Activision"]
-    ),
-    "fintech": IndustryData(
-        industry="FinTech",
-        market_size="$310B globally",
-        growth_rate="25% CAGR",
-        key_segments=["Payments", "Lending", "InsurTech", "WealthTech", "RegTech"],
-        top_players=["Stripe", "Square", "PayPal", "Plaid", "Revolut"]
-    ),
-    "healthcare": IndustryData(
-        industry="Healthcare Tech",
-        market_size="$350B globally",
-        growth_rate="15% CAGR",
-        key_segments=["Telehealth", "EHR", "Medical Devices", "Digital Therapeutics"],
-        top_players=["Epic", "Cerner", "Teladoc", "Veeva", "Doximity"]
-    ),
-    "healthtech": IndustryData(
-        industry="Healthcare Tech",
-        market_size="$350B globally",
-        growth_rate="15% CAGR",
-        key_segments=["Telehealth", "EHR", "Medical Devices", "Digital Therapeutics"],
-        top_players=["Epic", "Cerner", "Teladoc", "Veeva", "Doximity"]
-    ),
-    "edtech": IndustryData(
-        industry="EdTech",
-        market_size="$250B globally",
-        growth_rate="16% CAGR",
-        key_segments=["K-12", "Higher Ed", "Corporate Training", "Language Learning"],
-        top_players=["Coursera", "Duolingo", "Byju's", "2U", "Udemy"]
-    ),
-    "saas": IndustryData(
-        industry="SaaS",
-        market_size="$200B globally",
-        growth_rate="18% CAGR",
-        key_segments=["Horizontal SaaS", "Vertical SaaS", "Infrastructure", "Security"],
-        top_players=["Salesforce", "Microsoft", "Adobe", "ServiceNow", "Workday"]
-    ),
-    "b2b saas": IndustryData(
-        industry="B2B SaaS",
-        market_size="$150B globally",
-        growth_rate="18% CAGR",
-        key_segments=["Sales Tech", "Marketing Tech", "HR Tech", "FinOps"],
-        top_players=["Salesforce", "HubSpot", "Slack", "Zoom", "Atlassian"]
-    ),
-    "ecommerce": IndustryData(
-        industry="E-commerce",
-        market_size="$6T globally",
-        growth_rate="10% CAGR",
-        key_segments=["B2C", "B2B", "D2C", "Marketplaces"],
-        top_players=["Amazon", "Alibaba", "Shopify", "eBay", "Etsy"]
-    ),
-    "ai": IndustryData(
-        industry="Artificial Intelligence",
-        market_size="$150B globally",
-        growth_rate="38% CAGR",
-        key_segments=["GenAI", "ML Ops", "Computer Vision", "NLP", "Robotics"],
-        top_players=["OpenAI", "Google", "Microsoft", "Anthropic", "NVIDIA"]
-    ),
-}
+import json
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, Optional, Union
+
+import orjson
+from pydantic import TypeAdapter
+
+from models import AgencyMatch, IndustryData, Record, ToolInfo
+from matcher import KeywordHit, KeywordMatcher
+from resilience import CircuitBreaker, CircuitOpen, Hedger
+from search_cache import SearchCache
+
+if TYPE_CHECKING:
+    import httpx
+
+    from agency_index import AgencyIndex
+
+# Known tools/brands catalog, loaded from a data file
+TOOL_CATALOG_PATH = Path(os.getenv("TOOL_CATALOG_PATH", Path(__file__).parent / "data" / "tools.json"))
+
+
+class ToolMention(NamedTuple):
+    """A tool mentioned in text, with its span for highlighting."""
+    key: str
+    tool: ToolInfo
+    alias: str
+    start: int
+    end: int
+
+
+class ToolRegistry:
+    """Catalog of known tools with an alias index for recognition.
+
+    Every alias (plus each tool's key and name) goes into one keyword
+    automaton, so recognizing tools in a message costs about the same
+    whatever the catalog size, and only whole words match.
+    """
+
+    def __init__(self, records: list[dict]):
+        self.tools: dict[str, ToolInfo] = {}
+        self._aliases: dict[str, list[str]] = {}
+        self._position: dict[str, int] = {}
+        self._by_name: dict[str, ToolInfo] = {}
+
+        for record in records:
+            key = record["key"].lower()
+            tool = ToolInfo(
+                name=record["name"],
+                category=record["category"],
+                description=record["description"],
+                logo_url=record.get("logo_url"),
+            )
+            self._position.setdefault(key, len(self._position))
+            self.tools[key] = tool
+            self._by_name[tool.name.lower()] = tool
+            self._aliases[key] = [key, tool.name.lower()] + [a.lower() for a in record.get("aliases", [])]
+
+        self._matcher = KeywordMatcher(self.alias_entries("tool"))
+
+    @classmethod
+    def from_file(cls, path: Path) -> "ToolRegistry":
+        """Load a registry from a JSON list of tool records."""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self.tools)
+
+    def alias_entries(self, category: str) -> list[tuple[str, str, str]]:
+        """(alias, category, key) entries for building a keyword automaton."""
+        return [(alias, category, key) for key, aliases in self._aliases.items() for alias in aliases]
+
+    def get_by_name(self, name: str) -> Optional[ToolInfo]:
+        """Get a tool by its display name (case-insensitive)."""
+        return self._by_name.get(name.lower())
+
+    def ordered(self, keys) -> list[ToolInfo]:
+        """Tools for the given keys, in catalog order."""
+        keys = [key for key in keys if key in self.tools]
+        return [self.tools[key] for key in sorted(keys, key=self._position.__getitem__)]
+
+    def mentions_from_hits(self, hits: list[KeywordHit], category: str = "tool") -> list[ToolMention]:
+        """Turn keyword hits for tool aliases into non-overlapping tool mentions.
+
+        Where aliases overlap ("outreach" inside "outreach.io") the longest wins.
+        """
+        mentions = sorted(
+            (
+                ToolMention(hit.label, self.tools[hit.label], hit.keyword, hit.start, hit.end)
+                for hit in hits
+                if hit.category == category and hit.label in self.tools
+            ),
+            key=lambda m: (m.start, -m.end),
+        )
+        kept = []
+        for mention in mentions:
+            if not kept or mention.start >= kept[-1].end:
+                kept.append(mention)
+        return kept
+
+    def find(self, text: str) -> list[ToolMention]:
+        """Find every tool mention in text, with character spans."""
+        return self.mentions_from_hits(self._matcher.find_all(text))
+
+    def recognize(self, text: str) -> list[ToolInfo]:
+        """Recognize the distinct tools mentioned in text, in catalog order."""
+        return self.ordered({hit.label for hit in self._matcher.find_all(text)})
+
+
+TOOL_REGISTRY = ToolRegistry.from_file(TOOL_CATALOG_PATH)
+
+# Tool key -> info, kept for callers that look tools up directly
+KNOWN_TOOLS = TOOL_REGISTRY.tools
+
+# Industry market data (could be enhanced with real API calls), loaded from a data file
+INDUSTRY_CATALOG_PATH = Path(os.getenv("INDUSTRY_CATALOG_PATH", Path(__file__).parent / "data" / "industries.json"))
+
+
+def _compact(text: str) -> str:
+    """Lowercase and drop everything but letters and digits ("E-Commerce" -> "ecommerce")."""
+    return "".join(ch for ch in text.lower() if ch.isalnum())
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Damerau-Levenshtein (optimal string alignment) distance, capped at limit + 1."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: list[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+        prev2, prev = prev, row
+    return prev[-1]
+
+
+class IndustryIndex:
+    """Canonical industry records with an alias table and a fuzzy lookup index.
+
+    Each industry has one shared IndustryData record. Aliases map to it
+    through a compacted-name table, and a trigram index narrows typo-tolerant
+    lookups down to a few candidates before any edit distance is computed.
+    """
+
+    # Queries shorter than this only match exactly ("ai" should not fuzz to "saas")
+    MIN_FUZZY_LENGTH = 4
+    # Below this a near miss must keep the first letter: one edit there makes
+    # another word ("adtech" is not a typo of "edtech")
+    SHORT_QUERY_LENGTH = 8
+
+    def __init__(self, records: list[dict]):
+        self.records: dict[str, IndustryData] = {}
+        self._position: dict[str, int] = {}
+        self._aliases: dict[str, list[str]] = {}
+        self._alias_keys: dict[str, str] = {}
+        self._trigram_postings: dict[str, list[str]] = {}
+
+        for record in records:
+            key = record["key"].lower()
+            self.records[key] = IndustryData(
+                industry=record["industry"],
+                market_size=record["market_size"],
+                growth_rate=record["growth_rate"],
+                key_segments=record["key_segments"],
+                top_players=record["top_players"],
+            )
+            self._position.setdefault(key, len(self._position))
+            aliases = [key] + [a.lower() for a in record.get("aliases", [])]
+            self._aliases[key] = aliases
+            for alias in aliases:
+                self._alias_keys.setdefault(_compact(alias), key)
+
+        for alias in self._alias_keys:
+            for gram in _trigrams(alias):
+                self._trigram_postings.setdefault(gram, []).append(alias)
+
+    @classmethod
+    def from_file(cls, path: Path) -> "IndustryIndex":
+        """Load an index from a JSON list of industry records."""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def alias_entries(self, category: str) -> list[tuple[str, str, str]]:
+        """(alias, category, key) entries for building a keyword automaton."""
+        return [(alias, category, key) for key, aliases in self._aliases.items() for alias in aliases]
+
+    def first(self, keys) -> Optional[str]:
+        """The highest-priority key of those given (catalog order)."""
+        keys = [key for key in keys if key in self._position]
+        return min(keys, key=self._position.__getitem__) if keys else None
+
+    def resolve(self, name: str, fuzzy: bool = True) -> Optional[str]:
+        """Resolve a name, alias or near-miss spelling to a canonical key."""
+        query = _compact(name)
+        if not query:
+            return None
+        key = self._alias_keys.get(query)
+        if key or not fuzzy or len(query) < self.MIN_FUZZY_LENGTH:
+            return key
+
+        # Candidate aliases share enough trigrams with the query
+        grams = _trigrams(query)
+        counts: dict[str, int] = {}
+        for gram in grams:
+            for alias in self._trigram_postings.get(gram, ()):
+                counts[alias] = counts.get(alias, 0) + 1
+        limit = max(1, len(query) // 4)
+        min_shared = max(1, len(grams) - 3 * limit)
+
+        short = len(query) < self.SHORT_QUERY_LENGTH
+
+        best, best_distance, tied = None, limit + 1, False
+        for alias, shared in sorted(counts.items(), key=lambda item: -item[1]):
+            if shared < min_shared:
+                break
+            if short and alias[0] != query[0]:
+                continue
+            distance = _edit_distance(query, alias, limit)
+            if distance < best_distance:
+                best, best_distance, tied = alias, distance, False
+            elif best and distance == best_distance and self._alias_keys[alias] != self._alias_keys[best]:
+                tied = True
+        # Equally near to two industries: no telling which was meant
+        return self._alias_keys[best] if best and not tied else None
+
+    def get(self, name: str, fuzzy: bool = True) -> Optional[IndustryData]:
+        """Get the industry record for a name, alias or near-miss spelling."""
+        key = self.resolve(name, fuzzy=fuzzy)
+        return self.records[key] if key else None
+
+
+INDUSTRY_INDEX = IndustryIndex.from_file(INDUSTRY_CATALOG_PATH)
+
+# Canonical industry key -> market data
+INDUSTRY_DATA = INDUSTRY_INDEX.records
+
+
+class ReferencePayloads:
+    """Serialized forms of the static reference records, computed once.
+
+    Sessions hold the registry's own ToolInfo/IndustryData objects, so
+    they are looked up by identity. Any other record (e.g. one restored
+    from the session store) is simply serialized on demand.
+    """
+
+    def __init__(self, records):
+        # id -> (record, to_dict() dict, pre-encoded JSON); holding the
+        # record keeps its id from being reused
+        self._payloads: dict[int, tuple[Record, dict, orjson.Fragment]] = {}
+        for record in records:
+            payload = record.to_dict()
+            self._payloads[id(record)] = (record, payload, orjson.Fragment(orjson.dumps(payload)))
+
+    def dump(self, record: Record) -> dict:
+        """record.to_dict(), shared for reference records (don't modify it)."""
+        entry = self._payloads.get(id(record))
+        return entry[1] if entry is not None and entry[0] is record else record.to_dict()
+
+    def encoded(self, record: Record) -> Union[orjson.Fragment, dict]:
+        """The record's JSON, ready to embed in an orjson document."""
+        entry = self._payloads.get(id(record))
+        return entry[2] if entry is not None and entry[0] is record else record.to_dict()
+
+
+REFERENCE_PAYLOADS = ReferencePayloads([*TOOL_REGISTRY.tools.values(), *INDUSTRY_INDEX.records.values()])
 
 
 def recognize_tools(text: str) -> list[ToolInfo]:
     """Recognize tools/brands mentioned in text."""
-    text_lower = text.lower()
-    found = []
-    for key, tool in KNOWN_TOOLS.items():
-        if key in text_lower or tool.name.lower() in text_lower:
-            found.append(tool)
-    return found
+    return TOOL_REGISTRY.recognize(text)
+
+
+def find_tool_mentions(text: str) -> list[ToolMention]:
+    """Find tool/brand mentions in text with their character spans."""
+    return TOOL_REGISTRY.find(text)
+
+
+def get_industry_data(industry: str, fuzzy: bool = True) -> Optional[IndustryData]:
+    """Get market data for an industry, by name, alias or a near-miss spelling."""
+    return INDUSTRY_INDEX.get(industry, fuzzy=fuzzy)
+
+
+# Agency search results come from another service, so they are validated
+_AGENCY_LIST = TypeAdapter(list[AgencyMatch])
+
+
+def parse_agencies(rows) -> list[AgencyMatch]:
+    """Validate agency records from outside (e.g. the search API) into AgencyMatch."""
+    return _AGENCY_LIST.validate_python(rows)
+
+
+# Agency search API (the Next.js app)
+AGENCY_SEARCH_URL = os.getenv("AGENCY_SEARCH_URL", "http://localhost:3001").rstrip("/")
+
+# Pooled client shared by every search (see open_http_client)
+_http_client: Optional["httpx.AsyncClient"] = None
+
+
+def open_http_client() -> "httpx.AsyncClient":
+    """Create the shared keep-alive client for agency searches.
+
+    Pool size, keep-alive and timeout come from AGENCY_HTTP_* variables.
+    HTTP/2 is used when the h2 package is installed (AGENCY_HTTP2=0 turns
+    it off). The server opens it at start-up and closes it at shutdown;
+    anything else gets one on first use.
+    """
+    global _http_client
+
+    import httpx  # loaded when the client is first needed, not at import
+
+    if _http_client is None:
+        try:
+            import h2  # noqa: F401
+            http2 = os.getenv("AGENCY_HTTP2", "1").lower() not in ("0", "false", "no")
+        except ImportError:
+            http2 = False
+
+        _http_client = httpx.AsyncClient(
+            base_url=AGENCY_SEARCH_URL,
+            http2=http2,
+            timeout=float(os.getenv("AGENCY_HTTP_TIMEOUT", "10")),
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("AGENCY_HTTP_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(os.getenv("AGENCY_HTTP_MAX_KEEPALIVE", "20")),
+                keepalive_expiry=float(os.getenv("AGENCY_HTTP_KEEPALIVE_EXPIRY", "30")),
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared client and its pooled connections."""
+    global _http_client
+
+    client, _http_client = _http_client, None
+    if client is not None:
+        await client.aclose()
+
+
+# Search results by canonical query (AGENCY_CACHE_TTL_SECONDS / _MAX_ENTRIES).
+# Call AGENCY_CACHE.invalidate() when the agency table changes.
+AGENCY_CACHE: SearchCache[list[AgencyMatch]] = SearchCache.from_env("AGENCY_CACHE")
+
+
+# Fail fast while the search API is failing (AGENCY_BREAKER_FAILURES / _RESET_SECONDS /
+# _SLOW_SECONDS), and optionally hedge slow searches (AGENCY_HEDGE=1)
+AGENCY_BREAKER = CircuitBreaker.from_env("Agency search", "AGENCY_BREAKER")
+AGENCY_HEDGER = Hedger.from_env("AGENCY")
+
+
+class AgencySearchUnavailable(Exception):
+    """The agency search could not answer: circuit open, deadline passed, or an error."""
+
 
+def _terms(values: Optional[list[str]]) -> tuple[str, ...]:
+    # The search API matches terms as a set, so order and repeats don't matter
+    return tuple(sorted({value.strip() for value in values or []}))
 
-def get_industry_data(industry: str) -> Optional[IndustryData]:
-    """Get market data for an industry."""
-    industry_lower = industry.lower().strip()
-    return INDUSTRY_DATA.get(industry_lower)
+
+def agency_query_key(
+    specializations: Optional[list[str]],
+    category_tags: Optional[list[str]] = None,
+    service_areas: Optional[list[str]] = None,
+    max_budget: Optional[int] = None,
+    limit: int = 5,
+) -> tuple:
+    """Canonical form of an agency search; equal keys get the same results."""
+    return (_terms(specializations), _terms(category_tags), _terms(service_areas), max_budget, limit)
+
+
+async def _fetch_agencies(key: tuple) -> list[AgencyMatch]:
+    specializations, category_tags, service_areas, max_budget, limit = key
+    response = await open_http_client().post(
+        "/api/agencies/search",
+        json={
+            "specializations": list(specializations),
+            "category_tags": list(category_tags),
+            "service_areas": list(service_areas),
+            "max_budget": max_budget,
+            "limit": limit,
+        },
+    )
+    response.raise_for_status()
+    return parse_agencies(response.json())
+
+
+# Local agency index (see agency_index.py). While one is loaded, searches are
+# answered in-process and keep working when the Next.js app is down.
+AGENCY_INDEX_PATH = os.getenv("AGENCY_INDEX_PATH", "")
+AGENCY_INDEX_FETCH_LIMIT = int(os.getenv("AGENCY_INDEX_FETCH_LIMIT", "10000"))
+_agency_index: Optional["AgencyIndex"] = None
+
+
+def get_agency_index() -> Optional["AgencyIndex"]:
+    """The loaded local agency index, if any."""
+    return _agency_index
+
+
+def load_agency_index(rows: Optional[list[dict]] = None) -> "AgencyIndex":
+    """Build the local index from agency rows, or from the AGENCY_INDEX_PATH snapshot.
+
+    Loads numpy, so call it off the event loop.
+    """
+    global _agency_index
+
+    from agency_index import AgencyIndex
+
+    _agency_index = AgencyIndex(rows) if rows is not None else AgencyIndex.from_file(Path(AGENCY_INDEX_PATH))
+    return _agency_index
+
+
+async def fetch_agency_catalog() -> list[dict]:
+    """Fetch the whole agency catalog in one request (an unfiltered search)."""
+    response = await open_http_client().post("/api/agencies/search", json={"limit": AGENCY_INDEX_FETCH_LIMIT})
+    response.raise_for_status()
+    return response.json()
+
+
+async def refresh_agency_index() -> "AgencyIndex":
+    """Rebuild the local index from a fresh catalog fetch.
+
+    The catalog is saved to AGENCY_INDEX_PATH (when set), so a restart
+    can load the index even if the web app is down.
+    """
+    rows = await fetch_agency_catalog()
+    index = await asyncio.to_thread(load_agency_index, rows)
+    if AGENCY_INDEX_PATH:
+        await asyncio.to_thread(Path(AGENCY_INDEX_PATH).write_bytes, orjson.dumps(rows))
+    AGENCY_CACHE.invalidate()
+    return index
+
+
+async def find_agencies(
+    specializations: list[str],
+    category_tags: Optional[list[str]] = None,
+    service_areas: Optional[list[str]] = None,
+    max_budget: Optional[int] = None,
+    limit: int = 5,
+    deadline: Optional[float] = None,
+) -> list[AgencyMatch]:
+    """Search agencies, raising AgencySearchUnavailable if they can't be had by deadline.
+
+    Uses the local index when one is loaded. Otherwise the search goes to
+    the Next.js API through AGENCY_CACHE, AGENCY_BREAKER and AGENCY_HEDGER.
+    deadline is a time.monotonic() time. A search still running when it
+    passes carries on in the background and its result is cached.
+    """
+    if _agency_index is not None:
+        return _agency_index.search(specializations, category_tags, service_areas, max_budget, limit)
+
+    key = agency_query_key(specializations, category_tags, service_areas, max_budget, limit)
+    timeout = None
+    if deadline is not None:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            raise AgencySearchUnavailable("deadline passed")
+
+    def fetch():
+        return AGENCY_BREAKER.call(lambda: AGENCY_HEDGER.call(lambda: _fetch_agencies(key)))
+
+    try:
+        return list(await asyncio.wait_for(AGENCY_CACHE.get_or_fetch(key, fetch), timeout))
+    except asyncio.TimeoutError:
+        raise AgencySearchUnavailable("deadline passed") from None
+    except CircuitOpen as e:
+        raise AgencySearchUnavailable(str(e)) from None
+    except Exception as e:
+        raise AgencySearchUnavailable(f"search failed: {e}") from e
 
 
 async def search_agencies(
@@ -140,23 +494,9 @@ async def search_agencies(
     max_budget: int = None,
     limit: int = 5
 ) -> list[AgencyMatch]:
-    """Search agencies from the Next.js API."""
+    """Search agencies (see find_agencies), with no results if the search is unavailable."""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "http://localhost:3001/api/agencies/search",
-                json={
-                    "specializations": specializations,
-                    "category_tags": category_tags or [],
-                    "service_areas": service_areas or [],
-                    "max_budget": max_budget,
-                    "limit": limit,
-                },
-                timeout=10.0
-            )
-            if response.status_code == 200:
-                data = response.json()
-                return [AgencyMatch(**a) for a in data]
-    except Exception as e:
+        return await find_agencies(specializations, category_tags, service_areas, max_budget, limit)
+    except AgencySearchUnavailable as e:
         print(f"Agency search error: {e}")
     return []
@@ -17,6 +17,11 @@ const runtime = new CopilotRuntime({
   remoteEndpoints: [
     {
       url: AGENT_URL,
+      // Pass the browser tab's conversation id through to the agent
+      onBeforeRequest: ({ ctx }) => {
+        const threadId = ctx.request.headers.get('x-thread-id');
+        return { headers: threadId ? { 'X-Thread-Id': threadId } : {} };
+      },
     },
   ],
 });
@@ -14,6 +14,7 @@ import { SuccessCelebration } from '@/components/ui/Confetti';
 import { CompactVoiceButton } from '@/components/voice/CompactVoiceButton';
 import { useZepMemory } from '@/hooks/useZepMemory';
 import { authClient } from '@/lib/auth';
+import { agentHeaders } from '@/lib/agentThread';
 
 // Backend agent URL - only set in development or when explicitly configured
 const AGENT_URL = process.env.NEXT_PUBLIC_AGENT_URL;
@@ -460,7 +461,7 @@ export function DashboardClient() {
   const syncWithBackend = useCallback(async () => {
     if (!isAgentConfigured) return;
     try {
-      const response = await fetch(`${AGENT_URL}/state`);
+      const response = await fetch(`${AGENT_URL}/state`, { headers: agentHeaders() });
       if (response.ok) {
         const data = await response.json();
         setGtmState(prev => ({
@@ -557,7 +558,7 @@ export function DashboardClient() {
         try {
           await fetch(`${AGENT_URL}/process`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: agentHeaders({ 'Content-Type': 'application/json' }),
             body: JSON.stringify({ message: actualUserMessage }),
           });
           await syncWithBackend();
@@ -638,7 +639,7 @@ export function DashboardClient() {
       try {
         await fetch(`${AGENT_URL}/confirm`, {
           method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
+          headers: agentHeaders({ 'Content-Type': 'application/json' }),
           body: JSON.stringify({ field }),
         });
       } catch {
@@ -1,13 +1,18 @@
 'use client';
 
+import { useMemo } from 'react';
 import { CopilotKit } from '@copilotkit/react-core';
+import { agentHeaders } from '@/lib/agentThread';
 
 // CopilotKit is only loaded on the dashboard page, not globally
 // This reduces bundle size on other pages
 
 export function DashboardProvider({ children }: { children: React.ReactNode }) {
+  // Forwarded to the agent by /api/copilotkit, so actions run on this tab's session
+  const headers = useMemo(() => agentHeaders(), []);
+
   return (
-    <CopilotKit runtimeUrl="/api/copilotkit">
+    <CopilotKit runtimeUrl="/api/copilotkit" headers={headers}>
       {children}
     </CopilotKit>
   );
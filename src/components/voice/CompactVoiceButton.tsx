@@ -2,6 +2,7 @@
 
 import { useState, useEffect, useCallback } from 'react';
 import { VoiceProvider, useVoice } from '@humeai/voice-react';
+import { getAgentThreadId } from '@/lib/agentThread';
 
 const CONFIG_ID = process.env.NEXT_PUBLIC_HUME_CONFIG_ID || '';
 
@@ -20,6 +21,9 @@ function VoiceButton({ accessToken }: { accessToken: string }) {
       await connect({
         auth: { type: 'accessToken', value: accessToken },
         configId: CONFIG_ID,
+        // Hume passes this to the agent as custom_session_id, so voice
+        // turns build up this tab's session
+        sessionSettings: { type: 'session_settings', customSessionId: getAgentThreadId() },
       });
     } catch (e) {
       console.error('[Voice] Connect error:', e);
@@ -0,0 +1,35 @@
+// Per-tab conversation id for the Python agent. Sent as X-Thread-Id so each
+// browser tab gets its own session, saved state and Zep thread on the agent.
+
+const STORAGE_KEY = 'gtm-agent-thread-id';
+
+let fallbackThreadId: string | null = null;
+
+function newThreadId(): string {
+  if (typeof crypto !== 'undefined' && 'randomUUID' in crypto) {
+    return crypto.randomUUID();
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+export function getAgentThreadId(): string {
+  if (typeof window === 'undefined') {
+    return '';
+  }
+  try {
+    let threadId = window.sessionStorage.getItem(STORAGE_KEY);
+    if (!threadId) {
+      threadId = newThreadId();
+      window.sessionStorage.setItem(STORAGE_KEY, threadId);
+    }
+    return threadId;
+  } catch {
+    // sessionStorage unavailable (e.g. privacy mode): one id per page load
+    fallbackThreadId ??= newThreadId();
+    return fallbackThreadId;
+  }
+}
+
+export function agentHeaders(headers: Record<string, string> = {}): Record<string, string> {
+  return { ...headers, 'X-Thread-Id': getAgentThreadId() };
+}